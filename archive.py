@@ -0,0 +1,193 @@
+# Import Necessary Libraries
+import gzip
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime as time
+
+import pytz
+
+
+class MonthlyArchive:
+    """
+    Immutable, compressed per-month partitions of closed flight hour periods.
+    A small index records which partitions each member appears in so that
+    per-member and per-month queries only read the partitions they need.
+    """
+
+    def __init__(self, root="/data/flight_hours/archive", cache_size=12):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self.cache_size = cache_size  # Number of decoded partitions kept in memory
+
+        self._index = None
+        self._cache = OrderedDict()  # Key: Partition ID (str) | Value: Partition (dict)
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        """The archive index (loaded on first use)"""
+        if self._index is None:
+            if os.path.exists(self.index_path):
+                with open(self.index_path, "r") as file:
+                    self._index = json.load(file)
+            else:
+                self._index = {"partitions": {}, "members": {}}
+        return self._index
+
+    def seal(self, state):
+        """
+        Write a closed period (FlightHours.snapshot_state()) to a new partition
+        and return its partition ID. Existing partitions are never modified.
+        """
+        with self._lock:
+            index = self.index
+            period = state.get("period") or time.now(pytz.utc).strftime("%Y-%m")
+
+            # A period sealed twice (e.g. a mid-month clear) gets a new partition
+            partition_id = period
+            suffix = 2
+            while partition_id in index["partitions"]:
+                partition_id = f"{period}.{suffix}"
+                suffix += 1
+
+            # Compact layout: members are stored once and referenced by position
+            flight_hours = state.get("flight_hours", {})
+            event_history = state.get("event_history", {})
+            member_ids = list(flight_hours)
+            for attendees in event_history.values():
+                member_ids.extend(attendees)
+            member_ids = list(dict.fromkeys(member_ids))
+            position = {member_id: i for i, member_id in enumerate(member_ids)}
+            partition = {
+                "period": period,
+                "sealed_at": int(time.now(pytz.utc).timestamp()),
+                "members": [int(member_id) for member_id in member_ids],
+                "minutes": [flight_hours.get(m, 0) for m in member_ids],
+                "events": list(event_history),
+                "attendance": [
+                    sorted(position[m] for m in attendees)
+                    for attendees in event_history.values()
+                ],
+            }
+
+            file_name = f"{partition_id}.json.gz"
+            self._write_atomic(
+                os.path.join(self.root, file_name),
+                gzip.compress(
+                    json.dumps(partition, separators=(",", ":")).encode("utf-8")
+                ),
+            )
+
+            # Record the partition in the index only once it is safely on disk
+            index["partitions"][partition_id] = {
+                "file": file_name,
+                "period": period,
+                "sealed_at": partition["sealed_at"],
+                "members": len(member_ids),
+                "events": len(partition["events"]),
+                "minutes": sum(partition["minutes"]),
+            }
+            for member_id in member_ids:
+                index["members"].setdefault(member_id, []).append(partition_id)
+            self._write_atomic(
+                self.index_path,
+                json.dumps(index, separators=(",", ":")).encode("utf-8"),
+            )
+            return partition_id
+
+    def periods(self):
+        """Return every sealed period (YYYY-MM) from oldest to newest"""
+        return sorted({p["period"] for p in self.index["partitions"].values()})
+
+    def partition_ids(self, period=None):
+        """Return the partition IDs, optionally only those of one period"""
+        return [
+            partition_id
+            for partition_id, partition in self.index["partitions"].items()
+            if period is None or partition["period"] == period
+        ]
+
+    def read(self, partition_id):
+        """Return a decoded partition (cached, since partitions never change)"""
+        with self._lock:
+            if partition_id in self._cache:
+                self._cache.move_to_end(partition_id)
+                return self._cache[partition_id]
+
+            file_name = self.index["partitions"][partition_id]["file"]
+            with open(os.path.join(self.root, file_name), "rb") as file:
+                partition = json.loads(gzip.decompress(file.read()))
+            partition["position"] = {
+                member_id: i for i, member_id in enumerate(partition["members"])
+            }
+
+            self._cache[partition_id] = partition
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return partition
+
+    def member_minutes(self, member_id):
+        """Return the archived minutes of a member per period"""
+        member_id = int(member_id)
+        minutes = {}
+        for partition_id in self.index["members"].get(str(member_id), []):
+            partition = self.read(partition_id)
+            position = partition["position"][member_id]
+            period = partition["period"]
+            minutes[period] = minutes.get(period, 0) + partition["minutes"][position]
+        return minutes
+
+    def member_events(self, member_id):
+        """Return the archived events a member attended per period"""
+        member_id = int(member_id)
+        events = {}
+        for partition_id in self.index["members"].get(str(member_id), []):
+            partition = self.read(partition_id)
+            position = partition["position"][member_id]
+            attended = [
+                event_name
+                for event_name, attendees in zip(
+                    partition["events"], partition["attendance"]
+                )
+                if position in attendees
+            ]
+            events.setdefault(partition["period"], []).extend(attended)
+        return events
+
+    def period_summary(self, period, limit=10):
+        """Return the top members and the event attendance of one period"""
+        minutes = {}
+        events = OrderedDict()
+        for partition_id in self.partition_ids(period):
+            partition = self.read(partition_id)
+            for member_id, member_minutes in zip(
+                partition["members"], partition["minutes"]
+            ):
+                minutes[str(member_id)] = minutes.get(str(member_id), 0) + member_minutes
+            for event_name, attendees in zip(
+                partition["events"], partition["attendance"]
+            ):
+                events[event_name] = events.get(event_name, 0) + len(attendees)
+
+        top_members = sorted(minutes.items(), key=lambda item: item[1], reverse=True)
+        return {
+            "members": len(minutes),
+            "minutes": sum(minutes.values()),
+            "top_members": top_members[:limit],
+            "events": events,
+        }
+
+    def _write_atomic(self, file_path, data):
+        """Write bytes to a file with an atomic rename"""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(file_path), delete=False
+        ) as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+            temp_path = temp_file.name
+        os.replace(temp_path, file_path)
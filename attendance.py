@@ -0,0 +1,243 @@
+# Import Necessary Libraries
+from collections.abc import Mapping
+
+
+def _ordinals(bits):
+    """Yield the positions of the set bits of an integer, lowest first"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class AttendanceMatrix:
+    """
+    Event attendance for the current month. Event names and member IDs are
+    interned once and given integer ordinals; each event keeps a bitset of
+    the members who attended it and each member a bitset of the events they
+    attended, so both directions and set queries are bitwise operations.
+    """
+
+    def __init__(self):
+        self._events = {}  # Key: Event Name (str) | Value: Event Ordinal (int), in event order
+        self._event_bits = {}  # Key: Event Ordinal (int) | Value: Bitset of Member Ordinals (int)
+        self._next_event = 0  # Ordinals are never reused, so they follow the event order
+
+        self._members = {}  # Key: Member ID (str) | Value: Member Ordinal (int)
+        self._member_ids = []  # Index: Member Ordinal | Value: Member ID (str)
+        self._member_bits = []  # Index: Member Ordinal | Value: Bitset of Event Ordinals (int)
+
+    def _event(self, event_name):
+        """Return the ordinal of an event, adding the event if it is new"""
+        ordinal = self._events.get(event_name)
+        if ordinal is None:
+            ordinal = self._next_event
+            self._next_event += 1
+            self._events[event_name] = ordinal
+            self._event_bits[ordinal] = 0
+        return ordinal
+
+    def _member(self, member_id):
+        """Return the ordinal of a member, interning the ID if it is new"""
+        ordinal = self._members.get(member_id)
+        if ordinal is None:
+            ordinal = len(self._member_ids)
+            self._members[member_id] = ordinal
+            self._member_ids.append(member_id)
+            self._member_bits.append(0)
+        return ordinal
+
+    def _member_list(self, bits):
+        return [self._member_ids[ordinal] for ordinal in _ordinals(bits)]
+
+    def _event_list(self, bits):
+        return [name for name, ordinal in self._events.items() if bits >> ordinal & 1]
+
+    # Mutations
+
+    def add_event(self, event_name):
+        """Add an event with no attendance (existing events are left as they are)"""
+        self._event(event_name)
+
+    def reset_event(self, event_name):
+        """Clear the attendance of an event, adding the event if it is new"""
+        ordinal = self._event(event_name)
+        self._drop_event_bits(ordinal)
+        self._event_bits[ordinal] = 0
+
+    def remove_event(self, event_name):
+        """Remove an event and its attendance"""
+        ordinal = self._events.pop(event_name, None)
+        if ordinal is not None:
+            self._drop_event_bits(ordinal)
+            del self._event_bits[ordinal]
+
+    def add(self, event_name, member_id):
+        """Record a member as having attended an event"""
+        event = self._event(event_name)
+        member = self._member(str(member_id))
+        self._event_bits[event] |= 1 << member
+        self._member_bits[member] |= 1 << event
+
+    def discard(self, event_name, member_id):
+        """Remove a member from the attendance of an event"""
+        event = self._events.get(event_name)
+        member = self._members.get(str(member_id))
+        if event is None or member is None:
+            return
+        self._event_bits[event] &= ~(1 << member)
+        self._member_bits[member] &= ~(1 << event)
+
+    def clear(self):
+        """Remove every event and member"""
+        self.__init__()
+
+    def copy(self):
+        """Return an independent copy (bitsets are immutable ints and are shared)"""
+        matrix = AttendanceMatrix.__new__(AttendanceMatrix)
+        matrix._events = self._events.copy()
+        matrix._event_bits = self._event_bits.copy()
+        matrix._next_event = self._next_event
+        matrix._members = self._members.copy()
+        matrix._member_ids = self._member_ids.copy()
+        matrix._member_bits = self._member_bits.copy()
+        return matrix
+
+    def _drop_event_bits(self, event):
+        """Clear an event's bit from every member who attended it"""
+        mask = ~(1 << event)
+        for member in _ordinals(self._event_bits[event]):
+            self._member_bits[member] &= mask
+
+    # Queries
+
+    def events(self):
+        """Return the event names in the order they were added"""
+        return list(self._events)
+
+    def has_event(self, event_name):
+        return event_name in self._events
+
+    def attended(self, event_name, member_id):
+        """Return whether a member attended an event"""
+        event = self._events.get(event_name)
+        member = self._members.get(str(member_id))
+        if event is None or member is None:
+            return False
+        return bool(self._event_bits[event] >> member & 1)
+
+    def members(self, event_name):
+        """Return the IDs of the members who attended an event"""
+        event = self._events.get(event_name)
+        return self._member_list(self._event_bits[event]) if event is not None else []
+
+    def member_events(self, member_id):
+        """Return the events a member attended in event order"""
+        member = self._members.get(str(member_id))
+        return self._event_list(self._member_bits[member]) if member is not None else []
+
+    def event_count(self, event_name):
+        """Return the number of members who attended an event"""
+        event = self._events.get(event_name)
+        return self._event_bits[event].bit_count() if event is not None else 0
+
+    def member_count(self, member_id):
+        """Return the number of events a member attended"""
+        member = self._members.get(str(member_id))
+        return self._member_bits[member].bit_count() if member is not None else 0
+
+    def attendance_counts(self):
+        """Return the number of events attended per member (members with none are left out)"""
+        return {
+            member_id: bits.bit_count()
+            for member_id, bits in zip(self._member_ids, self._member_bits)
+            if bits
+        }
+
+    def frequent_members(self, k, n):
+        """Return the members who attended at least k of the last n events"""
+        mask = 0
+        for ordinal in (list(self._events.values())[-n:] if n > 0 else []):
+            mask |= 1 << ordinal
+        return [
+            member_id
+            for member_id, bits in zip(self._member_ids, self._member_bits)
+            if (bits & mask).bit_count() >= k
+        ]
+
+    def overlap(self, *event_names):
+        """Return the members who attended every one of the given events"""
+        bits = -1
+        for event_name in event_names:
+            event = self._events.get(event_name)
+            if event is None:
+                return []
+            bits &= self._event_bits[event]
+        return self._member_list(bits) if event_names else []
+
+    def __len__(self):
+        return len(self._events)
+
+    # Read-only views in the shape of the old event_history / member_history dictionaries
+
+    @property
+    def by_event(self):
+        """Event name -> frozenset of member IDs, in event order"""
+        return _EventView(self)
+
+    @property
+    def by_member(self):
+        """Member ID -> frozenset of event names, for members with any attendance"""
+        return _MemberView(self)
+
+    def to_dict(self):
+        """Return the attendance as {event name: [member IDs]} in event order"""
+        return {
+            event_name: self._member_list(self._event_bits[ordinal])
+            for event_name, ordinal in self._events.items()
+        }
+
+    @classmethod
+    def from_dict(cls, event_history):
+        """Build a matrix from {event name: [member IDs]}"""
+        matrix = cls()
+        for event_name, member_ids in event_history.items():
+            matrix.add_event(event_name)
+            for member_id in member_ids:
+                matrix.add(event_name, member_id)
+        return matrix
+
+
+class _EventView(Mapping):
+    def __init__(self, matrix):
+        self._matrix = matrix
+
+    def __getitem__(self, event_name):
+        if not self._matrix.has_event(event_name):
+            raise KeyError(event_name)
+        return frozenset(self._matrix.members(event_name))
+
+    def __iter__(self):
+        return iter(self._matrix.events())
+
+    def __len__(self):
+        return len(self._matrix)
+
+    def __contains__(self, event_name):
+        return self._matrix.has_event(event_name)
+
+
+class _MemberView(Mapping):
+    def __init__(self, matrix):
+        self._matrix = matrix
+
+    def __getitem__(self, member_id):
+        if not self._matrix.member_count(member_id):
+            raise KeyError(member_id)
+        return frozenset(self._matrix.member_events(member_id))
+
+    def __iter__(self):
+        return iter(self._matrix.attendance_counts())
+
+    def __len__(self):
+        return len(self._matrix.attendance_counts())
@@ -0,0 +1,182 @@
+# Import Necessary Libraries
+import gzip
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime as time
+from datetime import timedelta
+
+import pytz
+
+# Forwarded to the bot's logger once it is loaded
+log = logging.getLogger("eventsbot.backups")
+
+
+def rotate(file_path):
+    """Keep the current version of a file as file_path.backup before it is replaced"""
+    if not os.path.exists(file_path):
+        return
+
+    # A hard link shares the data with the current file, so nothing is copied
+    backup_path = f"{file_path}.backup"
+    link_path = f"{backup_path}.tmp"
+    try:
+        if os.path.exists(link_path):
+            os.unlink(link_path)
+        os.link(file_path, link_path)
+    except OSError:
+        # Filesystems without hard links fall back to a copy
+        shutil.copy2(file_path, link_path)
+    os.replace(link_path, backup_path)
+
+
+def read_json(file_path):
+    """Read a JSON file (gzip-compressed if its name ends in .gz)"""
+    opener = gzip.open if file_path.endswith(".gz") else open
+    with opener(file_path, "rt") as file:
+        return json.load(file)
+
+
+def recover(paths, read):
+    """Return (path, data) of the first path that can be read, or (None, None)"""
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        try:
+            return path, read(path)
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            log.warning(f"Skipping damaged file {path}: {e}")
+    return None, None
+
+
+def sqlite_intact(file_path):
+    """Return whether a SQLite database passes PRAGMA quick_check"""
+    try:
+        conn = sqlite3.connect(file_path)
+        try:
+            return conn.execute("PRAGMA quick_check").fetchall() == [("ok",)]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return False
+
+
+class BackupManager:
+    """
+    Timestamped, gzip-compressed snapshots in one directory. The retention
+    policy keeps the newest snapshot of each of the last `hourly` hours and
+    of each of the last `daily` days and deletes everything else.
+    """
+
+    def __init__(self, backup_dir="/data/backups", prefix="flight_hours", hourly=24, daily=30):
+        self.backup_dir = backup_dir
+        self.prefix = prefix
+        self.hourly = hourly  # Hours that keep one snapshot each
+        self.daily = daily  # Days that keep one snapshot each
+        self._pattern = re.compile(
+            rf"^{re.escape(prefix)}_(\d{{8}}_\d{{6}})(\.\w+)\.gz$"
+        )
+
+    def create(self, write_copy, extension):
+        """
+        Compress the copy that write_copy(path) writes into a new snapshot and
+        apply the retention policy. Returns the snapshot path (None if there was
+        nothing to copy).
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+        taken = time.now(pytz.utc)
+        name = f"{self.prefix}_{taken:%Y%m%d_%H%M%S}{extension}.gz"
+        snapshot_path = os.path.join(self.backup_dir, name)
+
+        with tempfile.TemporaryDirectory(dir=self.backup_dir) as temp_dir:
+            copy_path = os.path.join(temp_dir, f"copy{extension}")
+            if write_copy(copy_path) is None:
+                return None
+
+            temp_path = os.path.join(temp_dir, name)
+            with open(copy_path, "rb") as source, gzip.open(temp_path, "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.replace(temp_path, snapshot_path)
+
+        self.prune()
+        return snapshot_path
+
+    def snapshots(self, extension=None):
+        """Return the snapshot paths, newest first (optionally of one file type)"""
+        return [path for _, path in self._list(extension)]
+
+    def prune(self, now=None):
+        """Delete the snapshots the retention policy does not keep and return them"""
+        now = now or time.now(pytz.utc)
+        kept_hours, kept_days = set(), set()
+        deleted = []
+
+        for index, (taken, path) in enumerate(self._list()):
+            hour, day = taken.strftime("%Y%m%d%H"), taken.strftime("%Y%m%d")
+            keep = index == 0  # The newest snapshot is always kept
+            if now - taken <= timedelta(hours=self.hourly) and hour not in kept_hours:
+                kept_hours.add(hour)
+                keep = True
+            if now - taken <= timedelta(days=self.daily) and day not in kept_days:
+                kept_days.add(day)
+                keep = True
+
+            if not keep:
+                os.remove(path)
+                deleted.append(path)
+        return deleted
+
+    def verify(self, snapshot_path):
+        """Return whether a snapshot decompresses completely (gzip checks its CRC)"""
+        try:
+            with gzip.open(snapshot_path, "rb") as file:
+                while file.read(1024 * 1024):
+                    pass
+            return True
+        except (OSError, EOFError):
+            return False
+
+    def restore(self, snapshot_path, target_path, check=None):
+        """Replace target_path with a decompressed snapshot if it passes check(path)"""
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(target_path), delete=False
+        ) as temp_file:
+            temp_path = temp_file.name
+
+        try:
+            with gzip.open(snapshot_path, "rb") as source, open(temp_path, "wb") as target:
+                shutil.copyfileobj(source, target)
+            if check is not None and not check(temp_path):
+                raise ValueError("snapshot failed its integrity check")
+        except (OSError, EOFError, ValueError) as e:
+            log.warning(f"Cannot restore from {snapshot_path}: {e}")
+            os.unlink(temp_path)
+            return False
+
+        os.replace(temp_path, target_path)
+        return True
+
+    def restore_latest(self, target_path, extension, check=None):
+        """Restore the newest intact snapshot of a file type and return its path"""
+        for snapshot_path in self.snapshots(extension):
+            if self.restore(snapshot_path, target_path, check):
+                return snapshot_path
+        return None
+
+    def _list(self, extension=None):
+        """Return (time taken, path) of every snapshot, newest first"""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        found = []
+        for name in os.listdir(self.backup_dir):
+            match = self._pattern.match(name)
+            if match is None or (extension and match.group(2) != extension):
+                continue
+            taken = time.strptime(match.group(1), "%Y%m%d_%H%M%S").replace(tzinfo=pytz.utc)
+            found.append((taken, os.path.join(self.backup_dir, name)))
+        return sorted(found, reverse=True)
@@ -0,0 +1,372 @@
+# Import Necessary Libraries
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time as clock
+import tracemalloc
+from types import SimpleNamespace
+
+# Synthetic datasets: (members with flight time, events this month)
+DATASETS = {
+    "1k": (1_000, 30),
+    "10k": (10_000, 100),
+    "100k": (100_000, 300),
+}
+
+# Regression allowed before a benchmark fails (fraction of the baseline), by operation.
+# Disk-bound operations vary more from run to run than in-memory ones.
+THRESHOLDS = {
+    "log_start_time": 0.25,
+    "log_end_time": 0.25,
+    "save": 0.5,
+    "load": 0.5,
+    "export": 0.5,
+}
+
+# Timed passes of each operation; the best pass is reported, so one slow pass
+# (a GC pause, another process) does not look like a regression
+REPEATS = 5
+
+# Calls per pass below which a p99 is just the slowest call, and is not compared
+MIN_P99_SAMPLES = 100
+
+# Changes below these are noise, whatever the percentage: per-operation latency
+# changes below a tenth of the baseline's p50, p99 changes below twice the
+# baseline's own tail (its p99 - p50), and anything below the timer's
+# resolution (microseconds)
+NOISE_FRACTION = 0.1
+TAIL_NOISE = 2.0
+NOISE_FLOOR_US = 2.0
+
+# Times each operation runs per dataset (fewer for the ones that touch every member)
+ITERATIONS = {
+    "log_start_time": 2000,
+    "log_end_time": 2000,
+    "save": 200,
+    "load": 5,
+    "export": 3,
+}
+
+# Member IDs of the synthetic datasets
+FIRST_MEMBER_ID = 100_000_000_000_000_000
+
+# Time the synthetic sessions start (epoch seconds)
+STARTED = 1700000000.0
+
+# A member that is not a bot (saves a guild lookup per call)
+HUMAN = SimpleNamespace(bot=False)
+
+
+def synthetic_state(members, events, seed=0):
+    """Return a snapshot state with `members` members and `events` events, each member attending a few"""
+    generator = random.Random(seed)
+    member_ids = [str(FIRST_MEMBER_ID + i) for i in range(members)]
+    event_names = [f"Event {i + 1}" for i in range(events)]
+    event_history = {name: [] for name in event_names}
+    for member_id in member_ids:
+        for name in generator.sample(event_names, min(3, events)):
+            event_history[name].append(member_id)
+    return {
+        "flight_hours": {member_id: generator.randrange(1, 3000) for member_id in member_ids},
+        "event_history": event_history,
+        "active_events": {"Benchmark Event": [1]},
+    }
+
+
+def open_storage(storage, data_dir):
+    """Open the JSON or SQLite store in data_dir"""
+    from storage import JSONStorage, SQLiteStorage
+
+    snapshot_path = os.path.join(data_dir, "current.snap")
+    if storage == "json":
+        return JSONStorage(snapshot_path)
+    return SQLiteStorage(os.path.join(data_dir, "flight_hours.db"), snapshot_path)
+
+
+def load_manager(storage, data_dir):
+    """Return a FlightHours restored from the store in data_dir"""
+    from config import FlightHours
+
+    manager = FlightHours(open_storage(storage, data_dir))
+    manager.load()
+    return manager
+
+
+def timed_pass(operation, iterations, setup=None):
+    """Call operation(i) `iterations` times and return (elapsed seconds, sorted latencies)"""
+    latencies = []
+    if setup:
+        setup()
+    started = clock.perf_counter()
+    for i in range(iterations):
+        call_started = clock.perf_counter()
+        operation(i)
+        latencies.append(clock.perf_counter() - call_started)
+    elapsed = clock.perf_counter() - started
+    latencies.sort()
+    return elapsed, latencies
+
+
+def measure(operation, iterations, setup=None, repeats=REPEATS):
+    """
+    Time `repeats` passes of `iterations` calls of operation(i) and return
+    the best throughput and latency among them, then make one more pass
+    under tracemalloc to measure allocations (setup resets the state before
+    each pass)
+    """
+    passes = [timed_pass(operation, iterations, setup) for _ in range(repeats)]
+    elapsed = min(elapsed for elapsed, _ in passes)
+
+    def best(quantile):
+        return min(
+            latencies[min(int(len(latencies) * quantile), len(latencies) - 1)]
+            for _, latencies in passes
+        )
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(iterations):
+        operation(i)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "repeats": repeats,
+        "ops_per_sec": round(iterations / elapsed, 1),
+        "p50_us": round(best(0.5) * 1e6, 1),
+        "p99_us": round(best(0.99) * 1e6, 1),
+        "alloc_peak_kib": round((peak - before) / 1024, 1),
+        "alloc_retained_bytes_per_op": round((after - before) / iterations, 1),
+        "peak_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def run_dataset(name, storage="sqlite", seed=0, iterations=None, work_dir=None, repeats=REPEATS):
+    """Run every benchmark on one dataset and return {operation: measurement}"""
+    from config import partitions
+    from simulator import FakeHTTP, SimGuild
+
+    members, events = DATASETS[name] if isinstance(name, str) else name
+    iterations = {**ITERATIONS, **(iterations or {})}
+    member_ids = [FIRST_MEMBER_ID + i for i in range(members)]
+    sessions = min(iterations["log_start_time"], members)
+    results = {}
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as directory:
+        manager = load_manager(storage, directory)
+        manager.restore_state(synthetic_state(members, events, seed))
+        manager.checkpoint()
+
+        # Members joining and leaving the event voice channel, one at a time
+        results["log_start_time"] = measure(
+            lambda i: manager.log_start_time(member_ids[i], HUMAN, at=STARTED),
+            sessions,
+            setup=lambda: manager.end_sessions(at=STARTED),
+            repeats=repeats,
+        )
+        results["log_end_time"] = measure(
+            lambda i: manager.log_end_time(member_ids[i], HUMAN, at=STARTED + 3600),
+            sessions,
+            setup=lambda: manager.start_sessions(
+                [SimpleNamespace(id=member_id, bot=False) for member_id in member_ids[:sessions]],
+                at=STARTED,
+            ),
+            repeats=repeats,
+        )
+
+        # A change followed by a write, as every command makes
+        def save(i):
+            manager.adjust_flight_time(member_ids[i % members], 1)
+            manager.save()
+
+        results["save"] = measure(save, iterations["save"], repeats=repeats)
+        manager.checkpoint()
+        manager.storage.close()
+
+        # A restart: reading the whole month back from disk
+        def load(i):
+            load_manager(storage, directory).storage.close()
+
+        results["load"] = measure(load, iterations["load"], repeats=repeats)
+
+        # Exporting every member's flight time, fetching each member from the guild
+        guild = SimGuild(1, FakeHTTP())
+        for member_id in member_ids:
+            guild.add_member(member_id)
+        manager = load_manager(storage, directory)
+        export_path = os.path.join(directory, "export", "flight_hours.txt")
+        home = partitions.home.config
+        previous, home.guild = home.guild, guild
+        try:
+            results["export"] = measure(
+                lambda i: asyncio.run(manager.export(export_path)),
+                iterations["export"],
+                repeats=repeats,
+            )
+        finally:
+            home.guild = previous
+            manager.storage.close()
+    return results
+
+
+def run(datasets, storage="sqlite", seed=0, repeats=REPEATS):
+    """Run the benchmarks on several datasets and return the results document"""
+    results = {}
+    for name in datasets:
+        for operation, measurement in run_dataset(name, storage, seed, repeats=repeats).items():
+            results[f"{name}/{operation}"] = measurement
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "storage": storage,
+        "results": results,
+    }
+
+
+def noise_floors(before, floor_us=NOISE_FLOOR_US):
+    """Return the (latency, p99) changes in microseconds below which a benchmark's changes are noise"""
+    p50_us = before.get("p50_us", 0.0)
+    return (
+        max(p50_us * NOISE_FRACTION, floor_us),
+        max((before["p99_us"] - p50_us) * TAIL_NOISE, floor_us),
+    )
+
+
+def compare(baseline, current, thresholds=None, default=0.25, floor_us=NOISE_FLOOR_US):
+    """
+    Return a message for every benchmark in both documents whose throughput
+    fell, or whose p99 latency rose, by more than its operation's threshold.
+    Changes within its noise_floors() are ignored, and so are the p99s of
+    operations timed too few times per pass to have one.
+    """
+    thresholds = {**THRESHOLDS, **(thresholds or {})}
+    regressions = []
+    for key, measurement in current["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        allowed = thresholds.get(key.split("/", 1)[1], default)
+        noise_us, tail_noise_us = noise_floors(before, floor_us)
+        slower_us = 1e6 / measurement["ops_per_sec"] - 1e6 / before["ops_per_sec"]
+        if (
+            measurement["ops_per_sec"] < before["ops_per_sec"] * (1 - allowed)
+            and slower_us >= noise_us
+        ):
+            regressions.append(
+                f"{key}: {measurement['ops_per_sec']} ops/s, "
+                f"was {before['ops_per_sec']} (allowed -{allowed:.0%})"
+            )
+        if (
+            measurement["iterations"] >= MIN_P99_SAMPLES
+            and measurement["p99_us"] > before["p99_us"] * (1 + allowed)
+            and measurement["p99_us"] - before["p99_us"] >= tail_noise_us
+        ):
+            regressions.append(
+                f"{key}: p99 {measurement['p99_us']} us, "
+                f"was {before['p99_us']} (allowed +{allowed:.0%})"
+            )
+    return regressions
+
+
+def merge_best(first, second):
+    """Return a results document with the best measurement of each benchmark in either document"""
+    results = dict(first["results"])
+    for key, measurement in second["results"].items():
+        before = results.get(key)
+        if before is None:
+            results[key] = measurement
+            continue
+        results[key] = {
+            **before,
+            "ops_per_sec": max(before["ops_per_sec"], measurement["ops_per_sec"]),
+            "p50_us": min(before["p50_us"], measurement["p50_us"]),
+            "p99_us": min(before["p99_us"], measurement["p99_us"]),
+        }
+    return {**first, "results": results}
+
+
+def confirmed_regressions(baseline, current, rerun, thresholds=None, floor_us=NOISE_FLOOR_US):
+    """
+    Compare like compare(), but only report the regressions that show up again
+    once rerun() has measured everything a second time. A stall of the machine
+    can slow every pass of an operation, and rarely strikes the same one twice.
+    Returns (regressions, current with the best of both runs)
+    """
+    regressions = compare(baseline, current, thresholds, floor_us=floor_us)
+    if regressions:
+        current = merge_best(current, rerun())
+        regressions = compare(baseline, current, thresholds, floor_us=floor_us)
+    return regressions, current
+
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py --datasets 1k 10k --output results.json --baseline main.json
+    parser = argparse.ArgumentParser(description="Benchmark the FlightHours hot paths")
+    parser.add_argument("--datasets", nargs="+", default=["1k", "10k"], choices=list(DATASETS))
+    parser.add_argument("--storage", choices=["sqlite", "json"], default="sqlite")
+    parser.add_argument("--output", default="benchmark_results.json", help="Results file (- for stdout)")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        metavar="OPERATION=FRACTION",
+        help="Allowed regression of an operation (e.g. save=0.3)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Timed passes per operation")
+    parser.add_argument(
+        "--noise-floor",
+        type=float,
+        default=NOISE_FLOOR_US,
+        help="Latency changes (microseconds per operation) always ignored as noise",
+    )
+    options = parser.parse_args()
+
+    # The bot's modules load without a .env or /data
+    from simulator import simulated_environment, write_report
+
+    def measure_all():
+        return run(options.datasets, options.storage, options.seed, options.repeats)
+
+    # Anything the bot prints goes to stderr, and so does the table when stdout holds the results
+    regressions = []
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(sys.stderr):
+        for key, value in simulated_environment(work_dir).items():
+            os.environ.setdefault(key, value)
+        document = measure_all()
+        if options.baseline:
+            with open(options.baseline) as file:
+                baseline = json.load(file)
+            thresholds = {
+                operation: float(fraction)
+                for operation, fraction in (item.split("=", 1) for item in options.threshold)
+            }
+            regressions, document = confirmed_regressions(
+                baseline, document, measure_all, thresholds, floor_us=options.noise_floor
+            )
+    table = sys.stderr if options.output == "-" else sys.stdout
+
+    write_report(document, options.output)
+    for key, measurement in document["results"].items():
+        print(
+            f"{key:>22}: {measurement['ops_per_sec']:>12} ops/s  "
+            f"p50 {measurement['p50_us']:>10} us  p99 {measurement['p99_us']:>10} us  "
+            f"peak RSS {measurement['peak_rss_mib']} MiB",
+            file=table,
+        )
+
+    for regression in regressions:
+        print(f"Regression: {regression}", file=table)
+    if regressions:
+        sys.exit(1)
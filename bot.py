@@ -1,11 +1,16 @@
 # Import Discord Python Library
 import discord
 from discord.enums import EventStatus
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
+import logging
 import os
+import time
 
-from config import config, flight_hours_manager
+from config import config, flight_hours_manager, partitions, persistence
+from guilds import GuildProxy
 from logger import logger
+from voice_queue import VoiceEventQueue
 
 # Configure User-Agent header to comply with Discord API requirements and RFC 9110
 # Discord requires: DiscordBot ($url, $versionNumber)
@@ -17,6 +22,11 @@ bot_version = os.getenv("BOT_VERSION", "2.4.2")
 # This is RFC 9110 compliant (product token + comment)
 user_agent = f"DiscordBot ({bot_url}, {bot_version})"
 
+# Notes on the User-Agent patch go to the standard "bot" logger (debug level, so
+# they stay quiet unless asked for) instead of the log channel, whose messages
+# are themselves requests
+http_log = logging.getLogger("bot")
+
 # Monkey-patch discord.http.HTTPClient to always include User-Agent
 # This must be done BEFORE any HTTPClient instances are created
 _original_http_init = discord.http.HTTPClient.__init__
@@ -29,7 +39,7 @@ def _patched_http_init(self, *args, **kwargs):
     # Set User-Agent as soon as HTTPClient is created
     if hasattr(self, 'user_agent'):
         self.user_agent = user_agent
-        print(f"HTTPClient initialized - Set user_agent attribute: {user_agent}")
+        http_log.debug(f"HTTPClient initialized - Set user_agent attribute: {user_agent}")
     
     # Also patch the aiohttp session if it exists
     # discord.py uses aiohttp.ClientSession internally
@@ -38,7 +48,7 @@ def _patched_http_init(self, *args, **kwargs):
         # We'll patch it in setup_hook or when it's first accessed
         pass
     except Exception as e:
-        print(f"Note: Could not patch session in __init__: {e}")
+        http_log.debug(f"Note: Could not patch session in __init__: {e}")
 
 
 async def _patched_http_request(self, route, *, files=None, form=None, **kwargs):
@@ -51,9 +61,9 @@ async def _patched_http_request(self, route, *, files=None, form=None, **kwargs)
     # Always set User-Agent if not already set
     if 'User-Agent' not in headers:
         headers['User-Agent'] = user_agent
-        print(f"✓ Added User-Agent to request headers: {user_agent}")
+        http_log.debug(f"✓ Added User-Agent to request headers: {user_agent}")
     else:
-        print(f"✓ User-Agent already in headers: {headers.get('User-Agent')}")
+        http_log.debug(f"✓ User-Agent already in headers: {headers.get('User-Agent')}")
     
     kwargs['headers'] = headers
     
@@ -68,19 +78,21 @@ async def _patched_http_request(self, route, *, files=None, form=None, **kwargs)
         if e.status == 429 or (e.status == 403 and '1015' in str(e.response)):
             error_msg = str(e.response) if hasattr(e, 'response') else str(e)
             if '1015' in error_msg or 'rate limit' in error_msg.lower():
-                print(f"⚠ Cloudflare Error 1015: IP temporarily banned. This usually clears in 15-60 minutes.")
-                print(f"   The User-Agent header is correctly configured: {user_agent}")
-                print(f"   Please wait for the IP ban to expire before retrying.")
+                http_log.warning(
+                    "Cloudflare Error 1015: IP temporarily banned. This usually clears in 15-60 minutes. "
+                    f"The User-Agent header is correctly configured: {user_agent}. "
+                    "Please wait for the IP ban to expire before retrying."
+                )
         raise
 
 
 # Apply the monkey-patch
 discord.http.HTTPClient.__init__ = _patched_http_init
 discord.http.HTTPClient.request = _patched_http_request
-print(f"✓ Patched discord.http.HTTPClient to include User-Agent: {user_agent}")
+http_log.debug(f"✓ Patched discord.http.HTTPClient to include User-Agent: {user_agent}")
 
 
-class CustomBot(commands.Bot):
+class CustomBot(commands.AutoShardedBot):
     """Custom Bot class (User-Agent is configured via module-level patch)"""
     
     async def setup_hook(self):
@@ -89,7 +101,7 @@ class CustomBot(commands.Bot):
         # Verify User-Agent is configured and patch aiohttp session
         if hasattr(self, 'http') and self.http:
             if hasattr(self.http, 'user_agent'):
-                print(f"✓ Verified User-Agent in HTTPClient: {self.http.user_agent}")
+                http_log.debug(f"✓ Verified User-Agent in HTTPClient: {self.http.user_agent}")
             
             # Also patch the aiohttp session's default headers
             try:
@@ -107,26 +119,96 @@ class CustomBot(commands.Bot):
                     if not hasattr(session, '_default_headers'):
                         session._default_headers = {}
                     session._default_headers['User-Agent'] = user_agent
-                    print(f"✓ Set aiohttp session _default_headers['User-Agent']: {user_agent}")
+                    http_log.debug(f"✓ Set aiohttp session _default_headers['User-Agent']: {user_agent}")
                     
                     # Also ensure it's in the headers dict if it exists
                     if hasattr(session, 'headers'):
                         if session.headers is None:
                             session.headers = {}
                         session.headers['User-Agent'] = user_agent
-                        print(f"✓ Set aiohttp session headers['User-Agent']: {user_agent}")
+                        http_log.debug(f"✓ Set aiohttp session headers['User-Agent']: {user_agent}")
             except Exception as e:
-                print(f"Note: Could not patch aiohttp session: {e}")
+                http_log.debug(f"Note: Could not patch aiohttp session: {e}")
+
+    async def close(self):
+        """Write any pending configuration and flight hours before shutting down"""
+        scheduled_backup.cancel()
+        reconcile_voice.cancel()
+        evict_idle_guilds.cancel()
+        for partition in partitions.loaded():
+            await partition.voice_events.stop()
+        await persistence.stop()
+        await logger.stop()
+        for partition in partitions.loaded():
+            partition.flight_hours.storage.close()
+        if recorder is not None:
+            await asyncio.to_thread(recorder.close)
+        await super().close()
+
+
+def shard_options():
+    """
+    Read SHARD_COUNT and SHARD_IDS (comma separated) to run only some of the
+    shards in this process. Without them every shard runs here, with the
+    number of shards Discord recommends.
+    """
+    options = {}
+    if os.getenv("SHARD_COUNT"):
+        options["shard_count"] = int(os.getenv("SHARD_COUNT"))
+    if os.getenv("SHARD_IDS"):
+        options["shard_ids"] = [int(shard_id) for shard_id in os.getenv("SHARD_IDS").split(",")]
+    return options
 
 
 # Define Intents & Create Bot Object
 intents = discord.Intents.all()
-bot = CustomBot(command_prefix="!", intents=intents, help_command=None)
+bot = CustomBot(command_prefix="!", intents=intents, help_command=None, **shard_options())
 
 # Remove the help command
 bot.remove_command("help")
 
 
+async def log_voice(message, key=None):
+    """Log a voice channel change (repeats with the same key are counted, see logger.py)"""
+    await logger.debug(message, "voice", key)
+
+
+def setup_partition(partition):
+    """Give a guild partition its voice event queue and, once connected, its guild and log channel"""
+    partition.voice_events = VoiceEventQueue(
+        partition.flight_hours,
+        log_voice,
+        maxsize=int(os.getenv("VOICE_QUEUE_SIZE", "10000")),
+        summary_threshold=logger.summary_threshold,
+    )
+    guild = bot.get_guild(partition.guild_id)
+    if guild is not None:
+        partition.config.guild = guild
+        partition.config.log_channel = guild.get_channel(partition.config.log_channel_id)
+        partition.flight_hours.writer.bind()
+
+
+# Voice channel changes are applied in order by each guild's consumer task (see flight_logs.py)
+setup_partition(partitions.home)
+partitions.setup.append(setup_partition)
+voice_events = GuildProxy(partitions, "voice_events")
+
+# Record the home guild's gateway events and commands for replay (see replay.py)
+recorder = None
+if os.getenv("GATEWAY_RECORD_PATH"):
+    # Imported only when recording (replay brings in the simulator)
+    from replay import EventRecorder, configured_ids, install_recorder
+
+    recorder = EventRecorder(
+        os.getenv("GATEWAY_RECORD_PATH"), config.guild_id, configured_ids(config)
+    )
+    install_recorder(bot, recorder)
+
+# Whether the gateway is connected (each guild partition keeps the last time
+# its open sessions were known to match the event voice channels)
+gateway_connected = False
+
+
 # Function to Determine Successful Connection
 @bot.event
 async def on_ready():
@@ -142,43 +224,163 @@ async def on_ready():
     Returns:
         None
     """
-    # Update Logger with Login Information
+    # Measure how long it takes to resume logging after a restart
+    resume_started = time.perf_counter()
+    global gateway_connected
+    gateway_connected = True
+
+    # The home guild may be served by a shard in another process (other guilds load when first used)
     config.guild = bot.get_guild(config.guild_id)
+    if config.guild is None:
+        await logger.info(f"Guild {config.guild_id} is not served by this process's shards.")
+        start_background_tasks()
+        return
+
+    # Update Logger with Login Information
     config.log_channel = config.guild.get_channel(config.log_channel_id)
     await logger.setChannel(config.log_channel)
     await logger.info(f"Logged in as {bot.user.name} ({bot.user.id})")
 
-    # Load in Configuration Data from File
+    # Load in Configuration Data from File (flight time and attendance load in the background)
     config.load()
-    flight_hours_manager.load()
+    flight_hours_manager.writer.bind()
+    history_task = flight_hours_manager.load_prioritized()
+    if history_task:
+        bot.loop.create_task(report_history_load(resume_started))
 
-    # If there is an ongoing event retrieve the event VC
-    if flight_hours_manager.active_event:
-        await logger.info(f"Resuming Event Logging...")
-        return
+    # Write subsequent changes in the background and take scheduled backups
+    voice_events.start()
+    start_background_tasks()
+
+    # If there are ongoing events resume logging for them
+    if flight_hours_manager.events:
+        resume_ms = (time.perf_counter() - resume_started) * 1000
+        await logger.info(f"Resuming Event Logging... (resumed in {resume_ms:.0f} ms)")
+
+        # Pick up joins and leaves that happened while the bot was offline
+        await reconcile_guilds()
 
-    # If an event has already started, then start logging for that event
+    # If other events have already started, then start logging for each of them
     for event in config.guild.scheduled_events:
-        if event.status == EventStatus.active:
+        if event.status == EventStatus.active and event.name not in flight_hours_manager.events:
 
             # Update Logger Information
             await logger.info(f"Starting Flight Logging for Event '{event.name}'.")
 
-            # Update the Event Voice Channel & Event Status Flag
-            flight_hours_manager.active_event = event.name
-            flight_hours_manager.event_history[event.name] = set()
-            if event.channel:
-                flight_hours_manager.voice_channels.append(event.channel)
+            # Mark the Event as Active & Route its Voice Channel to it
+            flight_hours_manager.start_event(event.name, event.channel)
 
             # If Members Are Already in the Voice Channel, Log Them
             if event.channel:
-                for member in event.channel.members:
-                    flight_hours_manager.log_start_time(member.id)
-                    await logger.info(
-                        f"{member.mention} Joined {event.channel.mention}. Starting Logging..."
-                    )
+                started = flight_hours_manager.start_sessions(
+                    event.channel.members, event_name=event.name
+                )
+                await logger.sessions_started(event.channel.mention, started)
+
+
+def start_background_tasks():
+    """Start background writes, scheduled backups, voice reconciliation and idle guild eviction"""
+    persistence.start()
+    for task in (scheduled_backup, reconcile_voice, evict_idle_guilds):
+        if not task.is_running():
+            task.start()
+
+
+async def report_history_load(started):
+    """Log how long the background load of flight time and attendance took"""
+    await flight_hours_manager.wait_until_loaded()
+    load_ms = (time.perf_counter() - started) * 1000
+    await logger.info(f"Flight hours history loaded in {load_ms:.0f} ms.")
+
+
+@tasks.loop(hours=1)
+async def scheduled_backup():
+    """Write a compressed snapshot of each loaded guild's flight hours and prune old snapshots"""
+    for partition in partitions.loaded():
+        if partition.config.guild is None:
+            continue  # Served (and backed up) by another process
+        with partitions.use(partition):
+            await flight_hours_manager.wait_until_loaded()
+            try:
+                backup_path = await asyncio.to_thread(flight_hours_manager.create_backup)
+                await logger.debug(f"Flight hours backed up to {backup_path}", "backups")
+            except Exception as e:
+                await logger.error(f"Scheduled flight hours backup failed: {e}", "backups")
+
+
+@tasks.loop(minutes=5)
+async def evict_idle_guilds():
+    """Write out and unload the guild partitions that have been idle for a while"""
+    for partition in partitions.evict_idle():
+        await partition.voice_events.stop()
+        # Write the guild's pending saves before its storage closes under them
+        await persistence.flush(
+            [partition.flight_hours.storage.path, partition.config.settings_path]
+        )
+        await asyncio.to_thread(partition.flight_hours.checkpoint)
+        await asyncio.to_thread(partition.flight_hours.storage.close)
+        await logger.info(f"Unloaded idle guild {partition.guild_id}", "guilds")
+
+
+async def reconcile_voice_sessions():
+    """
+    Bring the open sessions in line with who is in each event's voice channels now.
+    Only the tracked channels are read, so the cost follows the number of members
+    in them rather than the size of the guild. Joins and leaves that were missed
+    happened at some unknown time since the sessions were last known to match, so
+    they are timed at the middle of that gap. After a restart that time is unknown:
+    members who left are only credited up to the last session checkpoint.
+    """
+    partition = partitions.current()
+    if not flight_hours_manager.events or config.guild is None:
+        return
+
+    # Apply the changes already received before comparing
+    await voice_events.drain()
+
+    # Take the members of every tracked channel in one sweep, grouped by event
+    members = {event_name: [] for event_name in flight_hours_manager.events}
+    for channel_id, event_name in list(flight_hours_manager.channel_events.items()):
+        channel = config.guild.get_channel(channel_id)
+        if channel is not None:
+            members[event_name].extend(channel.members)
+
+    now = time.time()
+    if partition.voice_synced_at is not None:
+        joined_at = left_at = (partition.voice_synced_at + now) / 2
+    else:
+        joined_at, left_at = now, flight_hours_manager.heartbeat or now
+    started, ended = flight_hours_manager.reconcile(
+        members, joined_at=joined_at, left_at=left_at
+    )
+    partition.voice_synced_at = now
+
+    if started or ended:
+        flight_hours_manager.save()
+        await logger.sessions_started("an event while the bot was not watching", started)
+        await logger.sessions_ended("an event while the bot was not watching", ended)
+
+
+async def reconcile_guilds():
+    """Reconcile the voice sessions of every loaded guild"""
+    for partition in partitions.loaded():
+        with partitions.use(partition):
+            await reconcile_voice_sessions()
+
+
+@tasks.loop(minutes=5)
+async def reconcile_voice():
+    """Periodically correct sessions for voice changes the gateway did not deliver"""
+    if gateway_connected:
+        await reconcile_guilds()
+
 
-            break
+@bot.before_invoke
+async def wait_for_flight_hours(ctx):
+    """Work on the command's guild and hold commands until its flight time and attendance have loaded"""
+    if await partitions.enter(ctx.guild) is None:
+        raise commands.CheckFailure("This server is not configured for the bot.")
+    await flight_hours_manager.wait_until_loaded()
 
 
 @bot.event
@@ -191,14 +393,21 @@ async def on_command_error(ctx, error):
 async def on_disconnect():
     """Handle bot disconnection"""
     # await logger.error("Bot disconnected from Discord. Attempting to reconnect...")
-    pass
+    global gateway_connected
+    if gateway_connected:
+        gateway_connected = False
+        for partition in partitions.loaded():
+            partition.voice_synced_at = time.time()  # Voice changes are missed from here on
+    await persistence.flush()
 
 
 @bot.event
 async def on_resume():
     """Handle bot reconnection"""
     # await logger.info("Bot reconnected to Discord successfully.")
-    pass
+    global gateway_connected
+    gateway_connected = True
+    await reconcile_guilds()
 
 
 @bot.event
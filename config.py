@@ -5,78 +5,98 @@ from discord.ext import commands
 # Import Other Necessary Libraries
 from datetime import datetime as time
 
+import asyncio
+import copy
+import functools
 import json
+import logging
 import os
 import pytz
 import shutil
 import tempfile
-import threading
-from collections import OrderedDict
+
+from archive import MonthlyArchive
+from backups import BackupManager, read_json, recover, rotate
+from attendance import AttendanceMatrix
+from guilds import GuildPartition, GuildPartitions, GuildProxy
+from members import MemberStore
+from state import SingleWriter, StateSnapshot, on_writer
+from storage import create_storage
+from persistence import PersistenceScheduler
+
+# Forwarded to the bot's logger once it is loaded
+log = logging.getLogger("eventsbot.config")
+
+# Coalesces save() calls into background writes once the bot is running
+persistence = PersistenceScheduler(float(os.getenv("PERSISTENCE_INTERVAL", "2.0")))
 
 
 class Configurations:
 
-    def __init__(self):
-        # Load Discord IDs from environment variables (no defaults - must be in .env)
-        guild_id_str = os.getenv("GUILD_ID")
+    def __init__(self, settings=None, settings_path="/data/config/bot_settings.json"):
+        # Load Discord IDs from environment variables (no defaults - must be in .env),
+        # or for a partner guild from the IDs in its own configuration directory
+        settings = os.environ if settings is None else settings
+        self.settings_path = settings_path
+        guild_id_str = settings.get("GUILD_ID")
         if not guild_id_str:
             raise ValueError("GUILD_ID environment variable is required!")
         self.guild_id = int(guild_id_str)
 
-        log_channel_id_str = os.getenv("LOG_CHANNEL_ID")
+        log_channel_id_str = settings.get("LOG_CHANNEL_ID")
         if not log_channel_id_str:
             raise ValueError("LOG_CHANNEL_ID environment variable is required!")
         self.log_channel_id = int(log_channel_id_str)
 
         # Role IDs from environment variables (no defaults - must be in .env)
-        moderator_role_id_str = os.getenv("MODERATOR_ROLE_ID")
+        moderator_role_id_str = settings.get("MODERATOR_ROLE_ID")
         if not moderator_role_id_str:
             raise ValueError("MODERATOR_ROLE_ID environment variable is required!")
         self.moderator_role_id = int(moderator_role_id_str)
 
-        captain_role_id_str = os.getenv("CAPTAIN_ROLE_ID")
+        captain_role_id_str = settings.get("CAPTAIN_ROLE_ID")
         if not captain_role_id_str:
             raise ValueError("CAPTAIN_ROLE_ID environment variable is required!")
         self.captain_role_id = int(captain_role_id_str)
 
-        first_officer_role_id_str = os.getenv("FIRST_OFFICER_ROLE_ID")
+        first_officer_role_id_str = settings.get("FIRST_OFFICER_ROLE_ID")
         if not first_officer_role_id_str:
             raise ValueError("FIRST_OFFICER_ROLE_ID environment variable is required!")
         self.first_officer_role_id = int(first_officer_role_id_str)
 
-        first_class_role_id_str = os.getenv("FIRST_CLASS_ROLE_ID")
+        first_class_role_id_str = settings.get("FIRST_CLASS_ROLE_ID")
         if not first_class_role_id_str:
             raise ValueError("FIRST_CLASS_ROLE_ID environment variable is required!")
         self.first_class_role_id = int(first_class_role_id_str)
 
-        business_class_role_id_str = os.getenv("BUSINESS_CLASS_ROLE_ID")
+        business_class_role_id_str = settings.get("BUSINESS_CLASS_ROLE_ID")
         if not business_class_role_id_str:
             raise ValueError("BUSINESS_CLASS_ROLE_ID environment variable is required!")
         self.business_class_role_id = int(business_class_role_id_str)
 
-        premium_economy_role_id_str = os.getenv("PREMIUM_ECONOMY_ROLE_ID")
+        premium_economy_role_id_str = settings.get("PREMIUM_ECONOMY_ROLE_ID")
         if not premium_economy_role_id_str:
             raise ValueError(
                 "PREMIUM_ECONOMY_ROLE_ID environment variable is required!"
             )
         self.premium_economy_role_id = int(premium_economy_role_id_str)
 
-        economy_class_role_id_str = os.getenv("ECONOMY_CLASS_ROLE_ID")
+        economy_class_role_id_str = settings.get("ECONOMY_CLASS_ROLE_ID")
         if not economy_class_role_id_str:
             raise ValueError("ECONOMY_CLASS_ROLE_ID environment variable is required!")
         self.economy_class_role_id = int(economy_class_role_id_str)
 
-        server_booster_role_id_str = os.getenv("SERVER_BOOSTER_ROLE_ID")
+        server_booster_role_id_str = settings.get("SERVER_BOOSTER_ROLE_ID")
         if not server_booster_role_id_str:
             raise ValueError("SERVER_BOOSTER_ROLE_ID environment variable is required!")
         self.server_booster_role_id = int(server_booster_role_id_str)
 
-        lh_mh_checkin_role_id_str = os.getenv("LH_MH_CHECKIN_ROLE_ID")
+        lh_mh_checkin_role_id_str = settings.get("LH_MH_CHECKIN_ROLE_ID")
         if not lh_mh_checkin_role_id_str:
             raise ValueError("LH_MH_CHECKIN_ROLE_ID environment variable is required!")
         self.lh_mh_checkin_role_id = int(lh_mh_checkin_role_id_str)
 
-        lh_mh_security_role_id_str = os.getenv("LH_MH_SECURITY_ROLE_ID")
+        lh_mh_security_role_id_str = settings.get("LH_MH_SECURITY_ROLE_ID")
         if not lh_mh_security_role_id_str:
             raise ValueError("LH_MH_SECURITY_ROLE_ID environment variable is required!")
         self.lh_mh_security_role_id = int(lh_mh_security_role_id_str)
@@ -147,18 +167,26 @@ class Configurations:
 
         self.checkin_start = False
 
-    def save(self, file_path="/data/config/bot_settings.json"):
-        """Save configuration with atomic write and backup"""
-        data = {
-            "restricted_channels": self.restricted_channels,
-            "blacklist_members": self.blacklist,
-            "lh_mh_attributes": self.lh_mh_attributes,
-        }
+    def save(self, file_path=None):
+        """Schedule a background write of the configuration (or write it now)"""
+        file_path = file_path or self.settings_path
+        # Capture the data on the caller's thread so the worker never sees a partial update
+        data = copy.deepcopy(
+            {
+                "restricted_channels": self.restricted_channels,
+                "blacklist_members": self.blacklist,
+                "lh_mh_attributes": self.lh_mh_attributes,
+            }
+        )
+        if persistence.running:
+            persistence.mark_dirty(file_path, functools.partial(self.write, file_path, data))
+        else:
+            self.write(file_path, data)
 
-        # Create backup if file exists
-        if os.path.exists(file_path):
-            backup_path = f"{file_path}.backup"
-            shutil.copy2(file_path, backup_path)
+    def write(self, file_path, data):
+        """Save configuration with atomic write and backup"""
+        # Keep the previous version as the backup
+        rotate(file_path)
 
         # Ensure directory exists
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
@@ -180,13 +208,14 @@ class Configurations:
                 os.unlink(temp_path)
             raise e
 
-    def load(self, file_path="/data/config/bot_settings.json"):
-        if os.path.exists(file_path):
-            with open(file_path, "r") as file:
-                data = json.load(file)
-                self.restricted_channels = data.get("restricted_channels", [])
-                self.blacklist = data.get("blacklist_members", [])
-                self.lh_mh_attributes = data.get("lh_mh_attributes", {})
+    def load(self, file_path=None):
+        file_path = file_path or self.settings_path
+        # Fall back to the previous version if the file is damaged
+        source, data = recover([file_path, f"{file_path}.backup"], read_json)
+        if source is not None:
+            self.restricted_channels = data.get("restricted_channels", [])
+            self.blacklist = data.get("blacklist_members", [])
+            self.lh_mh_attributes = data.get("lh_mh_attributes", {})
             if not self.lh_mh_attributes:
                 self.lh_mh_attributes = {
                     "departure_airport": "N/A",
@@ -206,26 +235,204 @@ class Configurations:
 
 
 class FlightHours:
-    def __init__(self):
+    def __init__(self, storage=None):
 
         # Class Attributes
-        self.flight_hours = {}  # Key: Member ID (str) | Value: Minutes (int)
-        self.start_time = {}  # Key: Member ID (str) | Value: Time (datetime)
-        self.event_history = (
-            OrderedDict()
-        )  # Key: Event Name (str) | Value: ID of Members Joined (Set of str)
-        self.member_history = (
-            {}
-        )  # Key: Member ID (str) | Value: Events Joined (Set of str)
-        self.active_event = None
-        self.voice_channels = []
-
-        # Thread lock for preventing race conditions
-        self._lock = threading.Lock()
-
-    def log_start_time(self, member_id, member=None):
-        # Ensure member_id is always a string for consistency
-        member_id_str = str(member_id)
+        self.members = MemberStore()  # Flight minutes and session starts per member
+        self.attendance = AttendanceMatrix()  # Events and the members who joined them
+        self.events = {}  # Key: Active Event Name | Value: {Channel ID (int): None} (an ordered set)
+        self.channel_events = {}  # Key: Channel ID (int) | Value: Name of the Event it belongs to
+        self.session_events = {}  # Key: Member ID (int) | Value: Event of their open session
+        self.period = time.now(pytz.utc).strftime("%Y-%m")  # Month being tracked
+
+        # Storage engine that persists every mutation record
+        self.storage = storage if storage is not None else create_storage()
+        self.storage.manager = self
+        self.seq = 0  # Sequence number of the last applied record
+        self.heartbeat = None  # When (epoch seconds) open sessions were last checkpointed
+        self.clock = None  # Replaces the wall clock when set (the replay driver's virtual time)
+
+        # Every mutation runs on the writer; other threads read immutable snapshots
+        self.writer = SingleWriter()
+
+        # Set once flight time and attendance are loaded (see load_prioritized)
+        self.history_loaded = None
+        self._backlog = None  # Records applied while the history was loading
+
+    @property
+    def active_event(self):
+        """The most recently started active event (None if no event is active)"""
+        return next(reversed(self.events), None)
+
+    @property
+    def voice_channel_ids(self):
+        """Read-only view: Channel ID (int) -> Event Name, for every tracked voice channel"""
+        return self.channel_events
+
+    @property
+    def flight_hours(self):
+        """Read-only view: Member ID (str) -> Minutes (int)"""
+        return self.members.minutes_view
+
+    @property
+    def start_time(self):
+        """Read-only view: Member ID (str) -> Session Start (datetime)"""
+        return self.members.sessions_view
+
+    @property
+    def event_history(self):
+        """Read-only view: Event Name (str) -> IDs of Members Joined (frozenset of str)"""
+        return self.attendance.by_event
+
+    @property
+    def member_history(self):
+        """Read-only view: Member ID (str) -> Events Joined (frozenset of str)"""
+        return self.attendance.by_member
+
+    def _record(self, op, **fields):
+        """Apply a mutation record to the in-memory state and hand it to storage (on the writer)"""
+        record = {"op": op, "seq": self.seq + 1, **fields}
+        self.apply_record(record)
+        self.storage.append(record)
+        if self._backlog is not None:
+            self._backlog.append(record)
+        return record
+
+    def apply_record(self, record):
+        """Apply a single mutation record (used both live and during journal replay)"""
+        op = record["op"]
+        self.seq = record["seq"]
+
+        if op == "start":
+            self.members.start_session(record["m"], record["t"])
+            self._assign_session(record["m"], record.get("ev"))
+
+        elif op == "start_many":
+            for member_id in record["ms"]:
+                self.members.start_session(member_id, record["t"])
+                self._assign_session(member_id, record.get("ev"))
+
+        elif op == "end":
+            self.members.add_minutes(record["m"], record["min"])
+
+            # Only members who stayed for 5+ minutes are recorded with an event
+            event_name = record.get("ev")
+            if event_name is not None:
+                self.attendance.add(event_name, record["m"])
+            self.members.end_session(record["m"])
+            self.session_events.pop(int(record["m"]), None)
+
+        elif op == "end_many":
+            for member_id, minutes, event_name in record["ends"]:
+                self.members.add_minutes(member_id, minutes)
+                if event_name is not None:
+                    self.attendance.add(event_name, member_id)
+                self.members.end_session(member_id)
+                self.session_events.pop(int(member_id), None)
+
+        elif op == "accrue":
+            for member_id, minutes in record["ac"]:
+                self.members.accrue(member_id, minutes)
+            self.heartbeat = record["hb"]
+
+        elif op == "adjust":
+            self.members.add_minutes(record["m"], record["min"], floor=0)
+
+        elif op == "attend":
+            self.attendance.add(record["ev"], record["m"])
+
+        elif op == "unattend":
+            self.attendance.discard(record["ev"], record["m"])
+
+        elif op == "add_event":
+            self.attendance.add_event(record["ev"])
+
+        elif op == "remove_event":
+            self.attendance.remove_event(record["ev"])
+
+        elif op == "start_event":
+            # Restarting an event with an existing name resets its attendance
+            self.attendance.reset_event(record["ev"])
+            self.events.setdefault(record["ev"], {})
+            for channel_id in record.get("vc", []):
+                self._track_channel(record["ev"], channel_id)
+
+        elif op == "end_event":
+            # Records written before concurrent events ended every event
+            event_name = record.get("ev")
+            for name in [event_name] if event_name is not None else list(self.events):
+                self._end_event(name)
+
+        elif op == "vc_add":
+            event_name = record.get("ev") or self.active_event
+            if event_name in self.events:
+                self._track_channel(event_name, record["c"])
+
+        elif op == "vc_remove":
+            event_name = self.channel_events.pop(int(record["c"]), None)
+            if event_name is not None:
+                self.events[event_name].pop(int(record["c"]), None)
+
+        elif op == "clear":
+            self.period = record.get("period", self.period)
+            self.members.clear()
+            self.session_events.clear()
+            self.attendance.clear()
+
+    def _track_channel(self, event_name, channel_id):
+        """Route a voice channel to an event (moving it from any other event)"""
+        channel_id = int(channel_id)
+        previous = self.channel_events.get(channel_id)
+        if previous is not None:
+            self.events[previous].pop(channel_id, None)
+        self.channel_events[channel_id] = event_name
+        self.events[event_name][channel_id] = None
+
+    def _end_event(self, event_name):
+        """Stop tracking an event's channels and drop its open sessions"""
+        for channel_id in self.events.pop(event_name, {}):
+            self.channel_events.pop(channel_id, None)
+        for member_id in [m for m, e in self.session_events.items() if e == event_name]:
+            self.members.end_session(member_id)
+            del self.session_events[member_id]
+
+        # Sessions of no particular event belong to whichever event ends last
+        if not self.events:
+            self.members.clear_sessions()
+            self.session_events.clear()
+
+    def _assign_session(self, member_id, event_name):
+        """Record the event of a member's open session"""
+        member_id = int(member_id)
+        if event_name is not None or member_id not in self.session_events:
+            self.session_events[member_id] = event_name or self.active_event
+
+    def session_event(self, member_id):
+        """Return the event a member's open session belongs to"""
+        return self.session_events.get(int(member_id)) or self.active_event
+
+    def resolve_event(self, event_name=None):
+        """Return the active event with this name, or the only active event if no name is given"""
+        if event_name:
+            return event_name if event_name in self.events else None
+        return next(iter(self.events)) if len(self.events) == 1 else None
+
+    def event_for_channel(self, channel):
+        """Return the active event a voice channel is tracked for (None if it is not tracked)"""
+        return self.channel_events.get(channel.id) if channel is not None else None
+
+    def now(self):
+        """Return the current time in epoch seconds (from the clock, if one is set)"""
+        return self.clock() if self.clock is not None else time.now(pytz.utc).timestamp()
+
+    def is_event_channel(self, channel):
+        """Return whether a voice channel (or None, for no channel) is tracked for an event"""
+        return channel is not None and channel.id in self.channel_events
+
+    @on_writer
+    def log_start_time(self, member_id, member=None, at=None, event_name=None):
+        # Member IDs are tracked as integer snowflakes
+        member_id = int(member_id)
 
         # Check if this is a bot (if member object is provided)
         if member and member.bot:
@@ -237,7 +444,7 @@ class FlightHours:
             # Try to get member from guild to check if it's a bot
             try:
                 guild_member = (
-                    self.guild.get_member(int(member_id_str)) if self.guild else None
+                    config.guild.get_member(member_id) if config.guild else None
                 )
                 if guild_member and guild_member.bot:
                     return False  # Don't log bots
@@ -245,16 +452,18 @@ class FlightHours:
                 # If we can't determine, err on the side of caution and don't log
                 return False
 
-        with self._lock:
-            # Only track the start time - don't add to history yet
-            if member_id_str not in self.start_time:
-                self.start_time[member_id_str] = time.now(pytz.utc)
+        # Only track the start time - don't add to history yet
+        # Start from when the member joined (at, in epoch seconds) if it is known
+        if self.members.session_start(member_id) is None:
+            start = at if at is not None else self.now()
+            self._record("start", m=member_id, t=start, ev=event_name or self.active_event)
 
         return True  # Successfully logged
 
-    def log_end_time(self, member_id, member=None):
-        # Ensure member_id is always a string for consistency
-        member_id_str = str(member_id)
+    @on_writer
+    def log_end_time(self, member_id, member=None, at=None):
+        # Member IDs are tracked as integer snowflakes
+        member_id = int(member_id)
 
         # Check if this is a bot (if member object is provided)
         if member and member.bot:
@@ -265,7 +474,7 @@ class FlightHours:
             # Try to get member from guild to check if it's a bot
             try:
                 guild_member = (
-                    self.guild.get_member(int(member_id_str)) if self.guild else None
+                    config.guild.get_member(member_id) if config.guild else None
                 )
                 if guild_member and guild_member.bot:
                     return 0  # Don't log bots
@@ -273,178 +482,337 @@ class FlightHours:
                 # If we can't determine, err on the side of caution and don't log
                 return 0
 
-        with self._lock:
-            if member_id_str in self.start_time:
-
-                # Calculate how long the member was in the voice channel for
-                elapsed = time.now(pytz.utc) - self.start_time[member_id_str]
-                minutes_flown = int(elapsed.total_seconds() // 60)
-
-                # Validate calculated time (prevent negative or excessive values)
-                if minutes_flown < 0:
-                    minutes_flown = 0
-
-                # If the member is not in the flight hours dictionary, add them to it
-                if member_id_str not in self.flight_hours:
-                    self.flight_hours[member_id_str] = 0
-
-                # Add the elapsed minutes to the total flight hours for the member
-                self.flight_hours[member_id_str] += minutes_flown
-
-                # Check if member stayed for more than 5 minutes
-                if minutes_flown >= 5:
-
-                    # Add to history only if they stayed for 5+ minutes
-                    if member_id_str not in self.member_history:
-                        self.member_history[member_id_str] = set()
-
-                    # Add the member to the event history and the event to member history
-                    self.event_history[self.active_event].add(member_id_str)
-                    self.member_history[member_id_str].add(self.active_event)
-
-                # Remove the start time entry for the member regardless of duration
-                del self.start_time[member_id_str]
-
-                # Return the minutes flown
-                return minutes_flown
-
-            else:
-                return 0  # Extra layer of protection
-
-    def save(self, file_path="/data/flight_hours/current.json"):
-        """Save flight hours with atomic write and backup"""
-        with self._lock:
-            # Convert non-parseable data types to parseable data types
-            start_time_str = {k: v.isoformat() for k, v in self.start_time.items()}
-            member_history_list = {k: list(v) for k, v in self.member_history.items()}
-            event_history_list = {k: list(v) for k, v in self.event_history.items()}
-            voice_channel_ids = [channel.id for channel in self.voice_channels]
-
-            # Store the data in JSON format
-            data = {
-                "active_event": self.active_event,
-                "voice_channels": voice_channel_ids,
-                "flight_hours": self.flight_hours,
-                "start_time": start_time_str,
-                "member_history": member_history_list,
-                "event_history": event_history_list,
-            }
-
-            # Create backup if file exists
-            if os.path.exists(file_path):
-                backup_path = f"{file_path}.backup"
-                shutil.copy2(file_path, backup_path)
-
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-            # Atomic write using temporary file
-            try:
-                with tempfile.NamedTemporaryFile(
-                    mode="w", dir=os.path.dirname(file_path), delete=False
-                ) as temp_file:
-                    json.dump(data, temp_file, indent=2)
-                    temp_path = temp_file.name
-
-                # Atomic move
-                shutil.move(temp_path, file_path)
-
-            except Exception as e:
-                # Clean up temp file if it exists
-                if "temp_path" in locals() and os.path.exists(temp_path):
-                    os.unlink(temp_path)
-                raise e
-
-    def load(self, file_path="/data/flight_hours/current.json"):
-        """Load flight hours with error handling and backup recovery"""
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, "r") as file:
-                    # Retrieve the JSON data from the file
-                    data = json.load(file)
-                    self.active_event = data.get("active_event", None)
-                    # Filter out None values (deleted channels) to prevent memory leaks
-                    self.voice_channels = [
-                        config.guild.get_channel(vc_id)
-                        for vc_id in data.get("voice_channels", [])
-                        if config.guild.get_channel(vc_id) is not None
-                    ]
-                    self.flight_hours = data.get("flight_hours", {})
-                    self.start_time = {
-                        k: time.fromisoformat(v)
-                        for k, v in data.get("start_time", {}).items()
-                    }
-                    self.member_history = {
-                        k: set(v) for k, v in data.get("member_history", {}).items()
-                    }
-                    # Convert event_history back to OrderedDict to maintain order
-                    event_history_data = data.get("event_history", {})
-                    self.event_history = OrderedDict(
-                        (k, set(v)) for k, v in event_history_data.items()
-                    )
-
-            except (json.JSONDecodeError, ValueError, KeyError) as e:
-                # Try to restore from backup
-                backup_path = f"{file_path}.backup"
-                if os.path.exists(backup_path):
-                    try:
-                        with open(backup_path, "r") as file:
-                            data = json.load(file)
-                            self.active_event = data.get("active_event", None)
-                            self.voice_channels = [
-                                config.guild.get_channel(vc_id)
-                                for vc_id in data.get("voice_channels", [])
-                                if config.guild.get_channel(vc_id) is not None
-                            ]
-                            self.flight_hours = data.get("flight_hours", {})
-                            self.start_time = {
-                                k: time.fromisoformat(v)
-                                for k, v in data.get("start_time", {}).items()
-                            }
-                            self.member_history = {
-                                k: set(v)
-                                for k, v in data.get("member_history", {}).items()
-                            }
-                            # Convert event_history back to OrderedDict to maintain order
-                            event_history_data = data.get("event_history", {})
-                            self.event_history = OrderedDict(
-                                (k, set(v)) for k, v in event_history_data.items()
-                            )
-                            print(
-                                f"Restored flight hours from backup due to corruption: {e}"
-                            )
-                    except Exception as backup_error:
-                        print(f"Failed to restore from backup: {backup_error}")
-                        # Initialize with empty data
-                        self.active_event = None
-                        self.voice_channels = []
-                        self.flight_hours = {}
-                        self.start_time = {}
-                        self.member_history = {}
-                        self.event_history = OrderedDict()
-                else:
-                    print(f"No backup available, initializing with empty data: {e}")
-                    # Initialize with empty data
-                    self.active_event = None
-                    self.voice_channels = []
-                    self.flight_hours = {}
-                    self.start_time = {}
-                    self.member_history = {}
-                    self.event_history = OrderedDict()
-
-    def create_backup(self, file_path="/data/flight_hours/current.json"):
-        """Create a timestamped backup of flight hours data"""
-        if os.path.exists(file_path):
-            timestamp = time.now(pytz.utc).strftime("%Y%m%d_%H%M%S")
-            backup_path = f"/data/backups/flight_hours_backup_{timestamp}.json"
-
-            # Ensure backup directory exists
-            os.makedirs(os.path.dirname(backup_path), exist_ok=True)
-
-            # Copy current file to backup
-            shutil.copy2(file_path, backup_path)
-            return backup_path
-        return None
+        start = self.members.session_start(member_id)
+        if start is not None:
+
+            # Calculate how long the member was in the voice channel for
+            end = at if at is not None else self.now()
+            elapsed = end - start
+            minutes_flown = int(elapsed // 60)
+
+            # Validate calculated time (prevent negative or excessive values)
+            if minutes_flown < 0:
+                minutes_flown = 0
+
+            # Add the minutes not yet credited by a checkpoint and record attendance
+            # at the session's own event only if they stayed for 5+ minutes
+            event_name = self.session_event(member_id) if minutes_flown >= 5 else None
+            credited = max(minutes_flown - self.members.accrued(member_id), 0)
+            self._record("end", m=member_id, min=credited, ev=event_name)
+
+            # Return the minutes flown
+            return minutes_flown
+
+        else:
+            return 0  # Extra layer of protection
+
+    @on_writer
+    def start_sessions(self, members, at=None, event_name=None):
+        """
+        Start sessions at an event (the latest by default) for many members in
+        one record and return the IDs that started one
+        """
+        started = {}  # Key: Member ID (int) | Value: None (an ordered set)
+        for member in members:
+            if member.bot:
+                continue  # Don't log bots
+            member_id = int(member.id)
+            if self.members.session_start(member_id) is None:
+                started[member_id] = None
+
+        if started:
+            start = at if at is not None else self.now()
+            self._record("start_many", ms=list(started), t=start, ev=event_name or self.active_event)
+        return list(started)
+
+    @on_writer
+    def end_sessions(self, member_ids=None, at=None, event_name=None):
+        """
+        End the sessions of many members (every open session by default, or
+        every one at event_name) in one record and return {member ID: minutes
+        flown} for the sessions ended
+        """
+        if member_ids is None:
+            member_ids = self.open_sessions(event_name)
+
+        now = at if at is not None else self.now()
+        ended, ends = {}, []
+        for member_id in map(int, member_ids):
+            start = self.members.session_start(member_id)
+            if start is None or member_id in ended:
+                continue
+            minutes_flown = max(int((now - start) // 60), 0)
+
+            # Attendance is only recorded for members who stayed for 5+ minutes
+            attended = self.session_event(member_id) if minutes_flown >= 5 else None
+            credited = max(minutes_flown - self.members.accrued(member_id), 0)
+            ends.append([member_id, credited, attended])
+            ended[member_id] = minutes_flown
+
+        if ends:
+            self._record("end_many", ends=ends)
+        return ended
+
+    @on_writer
+    def reconcile(self, members_by_event, joined_at=None, left_at=None):
+        """
+        Match the open sessions to the members in each event's voice channels
+        ({event name: members}): end the sessions of members who are gone (or
+        now at another event) at left_at and start sessions for members who are
+        there without one at joined_at (epoch seconds, default now).
+        Returns (IDs of the sessions started, {member ID: minutes} of those ended)
+        """
+        present = {
+            int(member.id): event_name
+            for event_name, members in members_by_event.items()
+            for member in members
+            if not member.bot
+        }
+        gone = [
+            member_id
+            for member_id in self.open_sessions()
+            if present.get(member_id) != self.session_event(member_id)
+        ]
+        ended = self.end_sessions(gone, at=left_at)
+        started = []
+        for event_name, members in members_by_event.items():
+            started += self.start_sessions(members, at=joined_at, event_name=event_name)
+        return started, ended
+
+    def open_sessions(self, event_name=None):
+        """Return the IDs of the members with an open session (optionally at one event)"""
+        return [
+            member_id
+            for member_id, _ in self.members.session_items()
+            if event_name is None or self.session_event(member_id) == event_name
+        ]
+
+    @on_writer
+    def accrue_sessions(self, member_ids, at=None):
+        """
+        Credit the whole minutes flown so far in the given open sessions and
+        record a heartbeat at `at` (epoch seconds, default now). Returns the
+        number of sessions that were credited minutes.
+        """
+        now = at if at is not None else self.now()
+        credits = []
+        for member_id in map(int, member_ids):
+            start = self.members.session_start(member_id)
+            if start is None:
+                continue
+            minutes = int((now - start) // 60) - self.members.accrued(member_id)
+            if minutes > 0:
+                credits.append([member_id, minutes])
+
+        self._record("accrue", ac=credits, hb=now)
+        return len(credits)
+
+    @on_writer
+    def adjust_flight_time(self, member_id, minutes):
+        """Add (or subtract, if negative) flight time for a member and return the new total"""
+        self._record("adjust", m=int(member_id), min=int(minutes))
+        return self.members.minutes(member_id)
+
+    @on_writer
+    def add_attendance(self, event_name, member_id):
+        """Record a member as having attended an event"""
+        self._record("attend", ev=event_name, m=str(member_id))
+
+    @on_writer
+    def remove_attendance(self, event_name, member_id):
+        """Remove a member from the attendance of an event"""
+        self._record("unattend", ev=event_name, m=str(member_id))
+
+    @on_writer
+    def add_event(self, event_name):
+        """Add an event with no attendance to the event history"""
+        self._record("add_event", ev=event_name)
+
+    @on_writer
+    def remove_event(self, event_name):
+        """Remove an event and its attendance from the event history"""
+        self._record("remove_event", ev=event_name)
+
+    @on_writer
+    def start_event(self, event_name, channel=None):
+        """Mark an event as active alongside any others, optionally tracking its voice channel"""
+        channel_ids = [channel.id] if channel is not None else []
+        self._record("start_event", ev=event_name, vc=channel_ids)
+
+    @on_writer
+    def end_event(self, event_name=None):
+        """Mark an event (the latest by default) as ended and drop its open sessions"""
+        event_name = event_name or self.active_event
+        if event_name is not None:
+            self._record("end_event", ev=event_name)
+
+    @on_writer
+    def add_voice_channel(self, channel, event_name=None):
+        """Track a voice channel for an active event (the latest by default)"""
+        self._record("vc_add", c=channel.id, ev=event_name or self.active_event)
+
+    @on_writer
+    def remove_voice_channel(self, channel):
+        """Stop tracking a voice channel for whichever event it belongs to"""
+        self._record("vc_remove", c=channel.id)
+
+    @on_writer
+    def clear(self):
+        """Clear all flight hours, open sessions and attendance and start a new period"""
+        self._record("clear", period=time.now(pytz.utc).strftime("%Y-%m"))
+
+    async def seal_period(self, archive):
+        """
+        Archive the current period into an immutable partition, then clear it
+        (call from the event loop). The partition is compressed and written in
+        a worker thread; records applied meanwhile are cleared with the period.
+        """
+        partition_id = await asyncio.to_thread(archive.seal, self.snapshot_state())
+        self.clear()
+        return partition_id
+
+    def save(self):
+        """Schedule a background write of the flight hours (or write them now)"""
+        if persistence.running:
+            persistence.mark_dirty(self.storage.path, self.write)
+        else:
+            self.write()
+
+    def write(self):
+        """Make every mutation record durable"""
+        self.storage.write(self)
+
+    def checkpoint(self):
+        """Persist the full state in place of the individual mutation records"""
+        self.storage.checkpoint(self)
+
+    @on_writer
+    def load(self):
+        """Restore the flight hours from storage"""
+        self.storage.load(self)
+
+    def load_prioritized(self):
+        """
+        Restore the active event, voice channels and open sessions now and load
+        flight time and attendance in the background (call from the event loop).
+        Once loaded, memory is ahead of storage, so later calls (a gateway
+        reconnect firing on_ready again) do nothing.
+        """
+        if self.history_loaded is not None:
+            return None
+        self.history_loaded = asyncio.Event()
+        load_history = self.storage.load_core(self)
+        if load_history is None:
+            self.history_loaded.set()
+            return None
+
+        # Logging resumes right away; its records are replayed over the history
+        self._backlog = []
+        return asyncio.get_running_loop().create_task(self._load_history(load_history))
+
+    async def _load_history(self, load_history):
+        try:
+            data = await asyncio.to_thread(load_history)
+            backlog, self._backlog = self._backlog, None
+            self.restore_state(data)
+            for record in backlog:
+                if record["seq"] > data["seq"]:
+                    self.apply_record(record)
+        except Exception as e:
+            self._backlog = None
+            log.error(f"Failed to load flight hours history: {e}")
+        finally:
+            self.history_loaded.set()
+
+    async def wait_until_loaded(self):
+        """Wait until flight time and attendance are available to queries"""
+        if self.history_loaded is not None:
+            await self.history_loaded.wait()
+
+    @on_writer
+    def snapshot(self):
+        """
+        Return an immutable copy of the current state for storage to serialize
+        off the event loop (queries on the loop read the live state instead)
+        """
+        return StateSnapshot(
+            self.seq,
+            self.period,
+            {name: list(channel_ids) for name, channel_ids in self.events.items()},
+            dict(self.session_events),
+            self.members.copy(),
+            self.attendance.copy(),
+            self.heartbeat,
+        )
+
+    def snapshot_state(self):
+        """Capture the state in a JSON-compatible form"""
+        return self.snapshot().to_dict()
+
+    def restore_state(self, data):
+        """Replace the in-memory state with the contents of a snapshot"""
+        self.seq = data.get("seq", 0)
+        self.period = data.get("period") or time.now(pytz.utc).strftime("%Y-%m")
+        # Channels are tracked by ID, so nothing is fetched from the guild here
+        # (older snapshots stored a single active event and its channels)
+        active_events = data.get("active_events")
+        if active_events is None:
+            active_event = data.get("active_event", None)
+            active_events = {active_event: data.get("voice_channels", [])} if active_event else {}
+        self.events, self.channel_events = {}, {}
+        for event_name, channel_ids in active_events.items():
+            self.events[event_name] = {}
+            for channel_id in channel_ids:
+                self._track_channel(event_name, channel_id)
+        self.session_events = {
+            int(member_id): event_name
+            for member_id, event_name in data.get("session_events", {}).items()
+        }
+        self.heartbeat = data.get("heartbeat")
+        self.members = MemberStore()
+        for member_id, minutes in data.get("flight_hours", {}).items():
+            self.members.add_minutes(member_id, minutes)
+        # Older snapshots stored session starts as ISO strings and no credited minutes
+        accrued = data.get("accrued", {})
+        for member_id, start in data.get("start_time", {}).items():
+            if not isinstance(start, (int, float)):
+                start = time.fromisoformat(start).timestamp()
+            self.members.start_session(member_id, start, accrued.get(str(member_id), 0))
+            # Sessions from before concurrent events belong to the one active event
+            self._assign_session(member_id, self.session_events.get(int(member_id)))
+        # member_history is derived from event_history (older snapshots stored both)
+        self.attendance = AttendanceMatrix.from_dict(data.get("event_history", {}))
+
+    def minutes(self, member_id):
+        """Return a member's flight time this month in minutes"""
+        return self.members.minutes(member_id)
+
+    def top_flight_hours(self, limit=10):
+        """Return the (member ID, minutes) pairs with the most flight time"""
+        # Answered from memory: the ranking is cached until someone's minutes change
+        return [(str(member_id), minutes) for member_id, minutes in self.members.top(limit)]
+
+    # Queries are answered from memory, so commands never wait on storage (or its lock)
+
+    def event_names(self):
+        """Return the names of this month's events in the order they were added"""
+        return self.attendance.events()
+
+    def event_members(self, event_name):
+        """Return the IDs of the members who attended an event"""
+        return self.attendance.members(event_name)
+
+    def member_events(self, member_id):
+        """Return the names of the events a member attended"""
+        return self.attendance.member_events(member_id)
+
+    def create_backup(self, backups=None):
+        """Write a compressed, timestamped snapshot of the flight hours and prune old ones"""
+        backups = backups or self.storage.backups
+        extension = os.path.splitext(self.storage.path)[1]
+
+        # Compress a consistent image of the stored data
+        return backups.create(self.storage.backup, extension)
 
     async def export(self, file_path):
         # Ensure directory exists
@@ -452,8 +820,8 @@ class FlightHours:
 
         with open(file_path, "w") as file:
 
-            # Iterate through the dictionary
-            for member_id, minutes in self.flight_hours.items():
+            # Iterate through the members with flight time
+            for member_id, minutes in list(self.members.minutes_items()):
 
                 # Check if the member exists
                 member = None
@@ -470,6 +838,64 @@ class FlightHours:
                     file.write(f"{member.name}: {hours} hours {minutes} minutes\n")
 
 
+def create_backups(backup_dir):
+    """Create a BackupManager with the retention policy from the environment"""
+    return BackupManager(
+        backup_dir,
+        hourly=int(os.getenv("FLIGHT_BACKUP_HOURLY", "24")),
+        daily=int(os.getenv("FLIGHT_BACKUP_DAILY", "30")),
+    )
+
+
+def create_partition(guild_id):
+    """
+    Build the partition of a partner guild from GUILD_CONFIG_DIR/<guild ID>/ids.json
+    (the same IDs the .env holds for the home guild). Its settings, flight state,
+    backups and archive live in per-guild directories, so shards in several
+    processes can share one local store. Returns None if the guild is not configured.
+    """
+    guild_dir = os.path.join(os.getenv("GUILD_CONFIG_DIR", "/data/config/guilds"), str(guild_id))
+    source, settings = recover([os.path.join(guild_dir, "ids.json")], read_json)
+    if source is None:
+        return None
+
+    try:
+        guild_config = Configurations(
+            {**settings, "GUILD_ID": guild_id}, os.path.join(guild_dir, "bot_settings.json")
+        )
+    except ValueError as e:
+        log.error(f"Guild {guild_id} is not configured correctly: {e}")
+        return None
+
+    partition_dir = os.path.join("guilds", str(guild_id))
+    data_dir = os.path.join(os.getenv("FLIGHT_DATA_DIR", "/data/flight_hours"), partition_dir)
+    backup_dir = os.path.join(os.getenv("FLIGHT_BACKUP_DIR", "/data/backups"), partition_dir)
+    archive_dir = os.path.join(
+        os.getenv("FLIGHT_ARCHIVE_DIR", "/data/flight_hours/archive"), partition_dir
+    )
+    return GuildPartition(
+        guild_id,
+        guild_config,
+        FlightHours(create_storage(data_dir, backups=create_backups(backup_dir))),
+        MonthlyArchive(archive_dir),
+    )
+
+
 # Create Objects
-config = Configurations()
-flight_hours_manager = FlightHours()
\ No newline at end of file
+backups = create_backups(os.getenv("FLIGHT_BACKUP_DIR", "/data/backups"))
+home_config = Configurations()
+partitions = GuildPartitions(
+    GuildPartition(
+        home_config.guild_id,
+        home_config,
+        FlightHours(create_storage(backups=backups)),
+        MonthlyArchive(os.getenv("FLIGHT_ARCHIVE_DIR", "/data/flight_hours/archive")),
+    ),
+    create_partition,
+    idle_minutes=int(os.getenv("GUILD_IDLE_MINUTES", "30")),
+)
+
+# The current guild's configuration, flight hours and archive (the home guild's by default)
+config = GuildProxy(partitions, "config")
+flight_hours_manager = GuildProxy(partitions, "flight_hours")
+archive = GuildProxy(partitions, "archive")
\ No newline at end of file
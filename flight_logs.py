@@ -1,27 +1,30 @@
 # Import Discord Python Libraries
 # Import Other Necessary Libraries
-from datetime import datetime as time
+import asyncio
+import os
 
 import discord
-import pytz
 from discord.enums import EventStatus
 from discord.ext import commands, tasks
 
 # Import Bot & Logger Objects
-from bot import bot
+from bot import bot, voice_events
 
 # Import Necessary Local Files
-from config import config, flight_hours_manager
+from config import config, flight_hours_manager, partitions
 from logger import logger
 
+# Open sessions credited per record by the session checkpoint
+CHECKPOINT_BATCH = 500
+
 
 @bot.event
 async def on_voice_state_update(member, before, after):
     """
     Description:
         This bot event function monitors changes between the voice channel to track flight hours.
-        If the is_event_active flag is enabled, this function will track the hours of each
-        member in the voice channel until they leave.
+        While any event is active, changes involving one of its voice channels are queued
+        for the voice event queue, which tracks the hours of each member until they leave.
 
     Arguments:
         member : The member that is switching voice channels
@@ -32,84 +35,34 @@ async def on_voice_state_update(member, before, after):
         None
     """
 
+    # Work on the member's guild (ignoring guilds that are not configured)
+    if await partitions.enter(member.guild) is None:
+        return
+
     # Check if there is an ongoing event
-    if not flight_hours_manager.active_event:
+    if not flight_hours_manager.events:
         return
 
     # Check if there was a change in the voice channel
     if before.channel == after.channel:
         return
 
-    # Case 1: Member switches from non-event VC to a non-event VC
-    if (
-        before.channel not in flight_hours_manager.voice_channels
-        and after.channel not in flight_hours_manager.voice_channels
-    ):
+    # Bots are never logged
+    if member.bot:
         return
 
-    # Case 2: Member switches from event VC to a event VC
-    if (
-        before.channel in flight_hours_manager.voice_channels
-        and after.channel in flight_hours_manager.voice_channels
-    ):
-
-        # Simply log the change of channels to the log channel
-        await logger.info(
-            f"{member.mention} switched from <#{before.channel.id}> to <#{after.channel.id}>. Resuming Logging..."
-        )
-
-    # Case 3: Member switches from a non-event VC to an event VC (Joining Event)
-    if (
-        before.channel not in flight_hours_manager.voice_channels
-        and after.channel in flight_hours_manager.voice_channels
-    ):
-
-        # Check if the member is a human member
-        if member.bot:
-            return
-
-        # Log the start time for the member
-        success = flight_hours_manager.log_start_time(member.id, member)
-        if not success:
-            return  # Bot was filtered out, don't log
-
-        # Update Information to the Logger
-        await logger.info(
-            f"{member.mention} joined <#{after.channel.id}>. Starting Logging..."
-        )
-
-        # Export the updated data back to the file
-        flight_hours_manager.save()
+    # Ignore changes between two non-event VCs (one ID lookup per side)
+    was_in_event = flight_hours_manager.is_event_channel(before.channel)
+    is_in_event = flight_hours_manager.is_event_channel(after.channel)
+    if not was_in_event and not is_in_event:
         return
 
-    # Case 4: Members switches from event VC to a non-event VC (Leaving Event)
-    if (
-        before.channel in flight_hours_manager.voice_channels
-        and after.channel not in flight_hours_manager.voice_channels
-    ):
-
-        # Check if the member is a human member
-        if member.bot:
-            return
-
-        # Log the left member and get the elapsed time
-        elapsed_minutes = flight_hours_manager.log_end_time(member.id, member)
-        if elapsed_minutes == 0 and member.bot:
-            return  # Bot was filtered out, don't log
-
-        # Update the logger information to the log channel
-        await logger.info(
-            f"{member.mention} left <#{before.channel.id}>. Ending Logging..."
-        )
-        total_flight_time = flight_hours_manager.flight_hours.get(str(member.id), 0)
-        await logger.info(
-            f"{int(elapsed_minutes)} minutes of flight time were added to {member.mention}. "
-            f"{member.mention} has a total flight time of {int(total_flight_time)} minutes."
-        )
-
-        # Export the updated data back to the file
-        flight_hours_manager.save()
-        return
+    # Hand the change to the voice event queue, which applies it and logs it in order
+    voice_events.submit(
+        member.id,
+        before.channel.id if before.channel else None,
+        after.channel.id if after.channel else None,
+    )
 
 
 @bot.event
@@ -117,8 +70,9 @@ async def on_scheduled_event_update(before, after):
     """
     Description:
         This bot event function monitors changes made to scheduled events, specifically
-        the status. If the status changes to active, then the event has started so the flag
-        is enabled. Likewise the flag is disabled when the status changes to ended.
+        the status. If the status changes to active, then the event has started and is tracked
+        alongside any other active events. Likewise it stops being tracked when the status
+        changes to ended, without affecting the other events.
 
     Arguments:
         before : The state of the scheduled event before any changes
@@ -128,29 +82,25 @@ async def on_scheduled_event_update(before, after):
         None
     """
 
+    # Work on the event's guild (ignoring guilds that are not configured)
+    if await partitions.enter(after.guild) is None:
+        return
+
     # Case 1: Event Status Changes to Active (Start Logging for the Event)
     if after.status == EventStatus.active:
 
         # Update Logger Information
         await logger.info(f"Starting Logging for Event '{after.name}'.")
 
-        # Set the active event and add the event VC to the voice channel list
-        flight_hours_manager.active_event = after.name
-        flight_hours_manager.event_history[after.name] = set()
-        if after.channel:
-            flight_hours_manager.voice_channels.append(after.channel)
+        # Mark the event as active and route the event VC to it
+        flight_hours_manager.start_event(after.name, after.channel)
 
         # Log any members who are already in the voice channel
         if after.channel:
-            for member in after.channel.members:
-                if member.bot:
-                    continue
-                success = flight_hours_manager.log_start_time(member.id, member)
-                if not success:
-                    continue  # Bot was filtered out, skip logging
-                await logger.info(
-                    f"{member.mention} joined {after.channel.mention}. Starting Logging..."
-                )
+            started = flight_hours_manager.start_sessions(
+                after.channel.members, event_name=after.name
+            )
+            await logger.sessions_started(after.channel.mention, started)
 
         # Export the updated data back to the file
         flight_hours_manager.save()
@@ -159,41 +109,66 @@ async def on_scheduled_event_update(before, after):
     # Case 2: Event Status Changes to Ended (End Logging for the Event)
     if after.status == EventStatus.ended:
 
+        # Events started before the bot was running are not tracked
+        if before.name not in flight_hours_manager.events:
+            return
+
         # End the Logging for all members who joined the event
-        for member_id in list(flight_hours_manager.start_time.keys()):
-
-            # Get member object first to check if it's a bot
-            member = config.guild.get_member(int(member_id))
-            if not member or member.bot:
-                continue  # Skip bots or non-existent members
-
-            # Log the left member and get the elapsed time
-            elapsed_minutes = flight_hours_manager.log_end_time(member_id, member)
-            if elapsed_minutes == 0:
-                continue  # No time logged (shouldn't happen for valid members)
-
-            # Update the logger information to the log channel
-            if not member.voice:
-                continue
-            await logger.info(
-                f"<@{member_id}> left {member.voice.channel.mention}. Ending Logging..."
-            )
-            total_flight_time = flight_hours_manager.flight_hours.get(str(member_id), 0)
-            await logger.info(
-                f"{int(elapsed_minutes)} minutes of flight time were added to <@{member_id}>. "
-                f"<@{member_id}> has a total flight time of {int(total_flight_time)} minutes."
-            )
+        ended = flight_hours_manager.end_sessions(event_name=before.name)
+        await logger.sessions_ended(f"'{before.name}'", ended)
 
         # Update logger information to the log channel
         await logger.info(
-            f"Ending Logging for Event '{before.name}'. A total of {len(flight_hours_manager.event_history[before.name])} members joined."
+            f"Ending Logging for Event '{before.name}'. A total of {flight_hours_manager.attendance.event_count(before.name)} members joined."
         )
 
-        # Reset the active event and clear out the event VCs
-        flight_hours_manager.active_event = None
-        flight_hours_manager.voice_channels.clear()
-        flight_hours_manager.start_time.clear()
+        # Stop tracking the event and its VCs
+        flight_hours_manager.end_event(before.name)
 
         # Export the updated data back to the file
         flight_hours_manager.save()
         return
+
+
+@tasks.loop(minutes=int(os.getenv("SESSION_CHECKPOINT_MINUTES", "5")))
+async def checkpoint_sessions():
+    """
+    Description:
+        Credits the minutes flown so far in every open session of each loaded guild and
+        records a heartbeat, so a crash during a long event loses at most one interval of
+        flight time. The sessions are credited in batches, yielding to gateway events in
+        between, and only open sessions are visited however many members have flight time.
+
+    Arguments:
+        None
+
+    Returns:
+        None
+    """
+    for partition in partitions.loaded():
+        with partitions.use(partition):
+            await checkpoint_guild_sessions()
+
+
+async def checkpoint_guild_sessions():
+    """Credit the open sessions of the current guild"""
+    # Only events have open sessions
+    if not flight_hours_manager.events:
+        return
+
+    # Credit every open session as of the same moment
+    at = flight_hours_manager.now()
+    member_ids = flight_hours_manager.open_sessions()
+    for start in range(0, max(len(member_ids), 1), CHECKPOINT_BATCH):
+        flight_hours_manager.accrue_sessions(member_ids[start : start + CHECKPOINT_BATCH], at)
+        await asyncio.sleep(0)
+
+    # Export the updated data back to the file
+    flight_hours_manager.save()
+
+
+@bot.listen("on_ready")
+async def start_session_checkpoints():
+    """Start the session checkpoint task once the bot is connected"""
+    if not checkpoint_sessions.is_running():
+        checkpoint_sessions.start()
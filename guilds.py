@@ -0,0 +1,189 @@
+# Import Necessary Libraries
+import asyncio
+import contextlib
+import contextvars
+import time
+
+# The guild the running task works on (None for the home guild). Every gateway
+# event and command runs in its own task, so setting it never leaks into another.
+current_guild = contextvars.ContextVar("current_guild", default=None)
+
+
+class GuildPartition:
+    """The configuration, flight state and archive of one guild"""
+
+    def __init__(self, guild_id, config, flight_hours, archive):
+        self.guild_id = int(guild_id)
+        self.config = config
+        self.flight_hours = flight_hours
+        self.archive = archive
+        self.voice_events = None  # VoiceEventQueue, attached by the bot
+        self.voice_synced_at = None  # When the sessions last matched the voice channels
+        self.last_used = time.monotonic()
+
+    def load(self):
+        """Read the guild's settings and flight state from disk"""
+        self.config.load()
+        self.flight_hours.load()
+
+    def idle(self, now, idle_seconds):
+        """Return whether the partition can be evicted: unused for a while, with no event or queued change"""
+        return (
+            now - self.last_used >= idle_seconds
+            and not self.flight_hours.events
+            and (self.voice_events is None or self.voice_events.depth == 0)
+        )
+
+
+class GuildPartitions:
+    """
+    The partitions of the guilds this process serves. The home guild's is
+    created up front; every other guild's is built by `factory` the first
+    time one of its events or commands arrives and evicted once it has been
+    idle for `idle_minutes`, so memory and startup follow the active guilds.
+    """
+
+    def __init__(self, home, factory, idle_minutes=30):
+        self.home = home
+        self.factory = factory  # Guild ID -> GuildPartition (None if the guild is not configured)
+        self.idle_minutes = idle_minutes
+        self.setup = []  # Callables run on each partition after it is loaded
+        self._partitions = {home.guild_id: home}
+        self._unconfigured = set()  # Guilds the factory had no configuration for
+        self._loading = {}  # Key: Guild ID | Value: Task loading its partition
+
+    def loaded(self):
+        """Return the partitions currently in memory (the home guild's first)"""
+        return list(self._partitions.values())
+
+    def get(self, guild_id):
+        """Return a guild's partition, loading it on first use (None if it is not configured; blocks while loading)"""
+        guild_id = int(guild_id)
+        partition = self._partitions.get(guild_id)
+        if partition is None:
+            if guild_id in self._unconfigured:
+                return None
+            partition = self.factory(guild_id)
+            if partition is None:
+                self._unconfigured.add(guild_id)
+                return None
+            partition.load()
+            self.add(partition)
+        partition.last_used = time.monotonic()
+        return partition
+
+    async def open(self, guild_id):
+        """
+        Return a guild's partition, loading it in a worker thread on first use so
+        the event loop keeps serving other guilds (None if it is not configured)
+        """
+        guild_id = int(guild_id)
+        partition = self._partitions.get(guild_id)
+        if partition is None:
+            if guild_id in self._unconfigured:
+                return None
+            # Events arriving while the guild loads wait for the same load
+            loading = self._loading.get(guild_id)
+            if loading is None:
+                loading = self._loading[guild_id] = asyncio.get_running_loop().create_task(
+                    self._load(guild_id)
+                )
+            partition = await asyncio.shield(loading)
+            if partition is None:
+                return None
+        partition.last_used = time.monotonic()
+        return partition
+
+    async def _load(self, guild_id):
+        try:
+            partition = await asyncio.to_thread(self.factory, guild_id)
+            if partition is None:
+                self._unconfigured.add(guild_id)
+                return None
+            await asyncio.to_thread(partition.load)
+            return self.add(partition)
+        finally:
+            del self._loading[guild_id]
+
+    def add(self, partition):
+        """Serve a loaded partition, running the setup callables on it"""
+        for setup in self.setup:
+            setup(partition)
+        self._partitions[partition.guild_id] = partition
+        return partition
+
+    def remove(self, guild_id):
+        """Stop serving a guild and return its partition (None if it was not loaded)"""
+        if int(guild_id) == self.home.guild_id:
+            raise ValueError("The home guild's partition cannot be removed")
+        return self._partitions.pop(int(guild_id), None)
+
+    async def enter(self, guild):
+        """
+        Make a guild (or None, for direct messages) the current one for the rest
+        of the running task and return its partition (None if it is not configured)
+        """
+        if guild is None:
+            return self.home
+        partition = await self.open(guild.id)
+        if partition is not None:
+            current_guild.set(partition.guild_id)
+        return partition
+
+    @contextlib.contextmanager
+    def use(self, partition):
+        """Make a partition the current one inside a with block"""
+        token = current_guild.set(partition.guild_id)
+        try:
+            yield partition
+        finally:
+            current_guild.reset(token)
+
+    def current(self):
+        """Return the partition of the current guild"""
+        guild_id = current_guild.get()
+        if guild_id is None or guild_id == self.home.guild_id:
+            return self.home
+        return self.get(guild_id) or self.home
+
+    def evict_idle(self, now=None):
+        """Remove the idle partitions (never the home guild's) from memory and return them"""
+        now = time.monotonic() if now is None else now
+        evicted = [
+            partition
+            for guild_id, partition in self._partitions.items()
+            if guild_id != self.home.guild_id
+            and partition.idle(now, self.idle_minutes * 60)
+        ]
+        for partition in evicted:
+            self.remove(partition.guild_id)
+        return evicted
+
+
+class GuildProxy:
+    """
+    Stands in for one part of the current guild's partition (its config,
+    flight hours, archive or voice queue), so modules keep using a single
+    module-level object while each guild's state stays separate.
+    """
+
+    __slots__ = ("_partitions", "_attribute")
+
+    def __init__(self, partitions, attribute):
+        object.__setattr__(self, "_partitions", partitions)
+        object.__setattr__(self, "_attribute", attribute)
+
+    def _target(self):
+        return getattr(self._partitions.current(), self._attribute)
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._target(), name)
+
+    def __repr__(self):
+        return f"<GuildProxy {self._attribute} of {self._target()!r}>"
@@ -60,7 +60,7 @@ async def help(ctx):
     # Flight tracking commands
     embed.add_field(
         name="✈️ **Flight Tracking**",
-        value="`!flighttime [member]`: View flight hours (yours or specified member)\n`!leaderboard`: Monthly flight hours leaderboard\n`!view_member_history`: Events you've attended this month\n`!view_event_history`: List events and view attendance",
+        value="`!flighttime [member]`: View flight hours (yours or specified member)\n`!leaderboard`: Monthly flight hours leaderboard\n`!view_member_history`: Events you've attended this month\n`!view_event_history`: List events and view attendance\n`!view_archive [YYYY-MM]`: View archived months",
         inline=False,
     )
 
@@ -162,7 +162,7 @@ async def mod_help(ctx):
     # Channel Management
     embed.add_field(
         name="📺 **Channel Management**",
-        value="`!restrict <channels>`: Add channels to restricted list\n`!unrestrict <channels>`: Remove channels from restricted list\n`!view_restricted_channels`: List all restricted channels\n`!add_event_vc <channels>`: Add voice channels for event logging\n`!remove_event_vc <channels>`: Remove voice channels from event logging\n`!view_event_vc`: List all event voice channels\n",
+        value="`!restrict <channels>`: Add channels to restricted list\n`!unrestrict <channels>`: Remove channels from restricted list\n`!view_restricted_channels`: List all restricted channels\n`!add_event_vc <channel> [event]`: Add a voice channel for event logging\n`!remove_event_vc <channels>`: Remove voice channels from event logging\n`!view_event_vc`: List the voice channels of each active event\n`!view_voice_queue`: Show voice event queue metrics\n",
         inline=False,
     )
 
@@ -239,14 +239,14 @@ async def admin_help(ctx):
     # Event Control
     embed.add_field(
         name="🎯 **Event Control**",
-        value="`!start_event <name>`: Start an unofficial event\n`!end_event`: End the current event\n`!add_event <name>`: Add event to history\n`!remove_event <name>`: Remove event from history\n",
+        value="`!start_event <name>`: Start an unofficial event\n`!end_event [name]`: End an active event (name needed if several are active)\n`!add_event <name>`: Add event to history\n`!remove_event <name>`: Remove event from history\n",
         inline=False,
     )
 
     # System Management
     embed.add_field(
         name="⚙️ **System Management**",
-        value="`!update_roles`: Update member roles based on flight hours\n`!clear_flight_logs`: Clear all flight logs (monthly reset)\n",
+        value="`!update_roles`: Update member roles based on flight hours\n`!clear_flight_logs`: Clear all flight logs (monthly reset)\n`!log_level <level> [subsystem]`: Set the lowest level logged (debug, info, warn, error)\n",
         inline=False,
     )
 
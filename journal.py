@@ -0,0 +1,127 @@
+# Import Necessary Libraries
+import json
+import os
+import threading
+import time
+
+
+class SessionJournal:
+    """Append-only journal of flight hour mutations with group-commit fsync"""
+
+    def __init__(self, file_path, commit_interval=1.0, commit_batch=64):
+        self.file_path = file_path
+        self.commit_interval = commit_interval  # Max seconds between fsyncs
+        self.commit_batch = commit_batch  # Max records between fsyncs
+        self.size = 0  # Size of the journal including buffered records (bytes)
+
+        self._file = None
+        self._buffer = []  # Encoded records not yet handed to the OS
+        self._truncate = False  # Whether the next commit starts a new journal
+        self._pending = 0  # Records written since the last fsync
+        self._last_sync = time.monotonic()
+
+        # Appends happen on the event loop while commits run in a worker thread
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Open the journal for appending, creating it if it does not exist"""
+        if self._file is not None:
+            return
+
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+
+        self._file = open(self.file_path, "a", encoding="utf-8")
+
+    def append(self, record):
+        """Buffer a single record (durable after the next commit)"""
+        # One compact JSON object per line
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            self.size += len(line)
+
+    def reset(self):
+        """
+        Discard every record written so far (called once a snapshot covers them).
+        Records appended afterwards are kept and written to the new journal.
+        """
+        with self._lock:
+            self._buffer = []
+            self._truncate = True
+            self.size = 0
+
+    def commit(self, force=False):
+        """
+        Hand buffered records to the OS and group fsyncs so that bursts of
+        records share a single disk flush. Returns True if an fsync was issued.
+        """
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            truncate, self._truncate = self._truncate, False
+
+        # Start a new journal if a snapshot superseded the old one
+        if truncate:
+            self._close_file()
+            os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+            self._file = open(self.file_path, "w", encoding="utf-8")
+            force = True
+        elif not lines and not self._pending:
+            return False
+
+        self.open()
+
+        # Flushing to the OS is enough to survive a process crash
+        self._file.writelines(lines)
+        self._file.flush()
+        self._pending += len(lines)
+        with self._lock:
+            self.size = self._file.tell() + sum(len(line) for line in self._buffer)
+
+        # Only fsync once per batch or interval to survive power loss
+        elapsed = time.monotonic() - self._last_sync
+        if (
+            force
+            or self._pending >= self.commit_batch
+            or elapsed >= self.commit_interval
+        ):
+            os.fsync(self._file.fileno())
+            self._pending = 0
+            self._last_sync = time.monotonic()
+            return True
+
+        return False
+
+    def replay(self):
+        """Yield every intact record in the journal in the order it was written"""
+        if not os.path.exists(self.file_path):
+            return
+
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn write can only affect the tail, so stop here
+                    break
+                yield record
+
+    def truncate(self):
+        """Discard every record and immediately start a new, empty journal"""
+        self.reset()
+        self.commit(force=True)
+
+    def close(self):
+        """Commit any buffered records and close the journal file"""
+        self.commit(force=True)
+        self._close_file()
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._file.close()
+        self._file = None
@@ -1,32 +1,640 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time as clock
+from collections import OrderedDict, deque
+from datetime import datetime as time
+
+import aiohttp
 import discord
+import pytz
 from discord.ext import commands
 
-from config import config
+from config import config, flight_hours_manager
+from ratelimit import RateWindow
+
+MESSAGE_LIMIT = 2000  # Maximum characters in a Discord message
+EMBED_LIMIT = 4096  # Maximum characters in an embed description
+EMBEDS_PER_MESSAGE = 10  # Maximum embeds in one message
+EMBED_TOTAL_LIMIT = 6000  # Maximum characters across the embeds of one message
+MAX_DELAY = 2.0  # Seconds a record may wait for others to share its message
+CHANNEL_RATE_LIMIT = (5, 5.0)  # Messages per window (seconds) Discord allows in one channel
+WEBHOOK_RATE_LIMIT = (5, 2.0)  # Requests per window (seconds) Discord allows on one webhook
+DEDUPE_SECONDS = 60.0  # Window in which repeats of a keyed record are counted instead of logged
+DEDUPE_LEVELS = ("debug", "info")  # Levels that are deduplicated (warnings and errors never are)
+SUMMARY_THRESHOLD = 25  # Members above which events are logged as counts, not per member
+
+# Log levels (records below a subsystem's or a sink's level are dropped)
+LEVELS = {"debug": 10, "info": 20, "warn": 30, "error": 40}
+
+
+class LogBuffer:
+    """Records waiting to be sent to one destination (errors are kept apart so they go first)"""
+
+    def __init__(self, destination, rate_limit):
+        self.destination = destination
+        self.errors = deque()
+        self.records = deque()
+        self.size = 0  # Characters pending
+        self.oldest = None  # When (loop time) the oldest pending record was added
+        self.window = RateWindow(*rate_limit) if rate_limit else None
+
+    def add(self, text, error, now):
+        (self.errors if error else self.records).append(text)
+        self.size += len(text) + 1
+        if self.oldest is None:
+            self.oldest = now
+
+    def due(self, now, max_delay, limit):
+        """Return whether to send: an error, `limit` characters or an old record is pending"""
+        return bool(self.errors) or self.size >= limit or (
+            self.oldest is not None and now - self.oldest >= max_delay
+        )
+
+    def take(self, limit):
+        """Remove as many consecutive records as fit in `limit` characters (errors first) and return (text, has_error)"""
+        message, has_error = "", False
+        for pending, error in ((self.errors, True), (self.records, False)):
+            while pending:
+                text = pending[0]
+                if not message and len(text) > limit:
+                    # A record longer than a message is sent in pieces
+                    pending[0] = text[limit:]
+                    self.size -= limit
+                    return text[:limit], error
+                joined = f"{message}\n{text}" if message else text
+                if len(joined) > limit:
+                    return message, has_error
+                message, has_error = joined, has_error or error
+                pending.popleft()
+                self.size -= len(text) + 1
+        self.size, self.oldest = 0, None
+        return message, has_error
+
+    def next_length(self):
+        """Return the length of the record that would be taken next"""
+        return len((self.errors or self.records)[0])
+
+    def __bool__(self):
+        return bool(self.errors or self.records)
+
+
+class BufferedSink:
+    """
+    A sink that never makes the caller wait for Discord: emit() only adds the
+    record to its destination's buffer, and a flush task sends a buffer once
+    a message's worth is pending, a record has waited `max_delay` seconds or
+    an error is pending, never faster than `rate_limit` allows. Subclasses
+    choose the destination and how pending records are sent.
+    """
+
+    size_limit = MESSAGE_LIMIT  # Characters that fill one send
+
+    def __init__(self, max_delay=MAX_DELAY, rate_limit=None, level="debug"):
+        self.max_delay = max_delay
+        self.rate_limit = rate_limit  # (messages, seconds) per destination, or None to send unpaced
+        self.level = LEVELS[level]  # Lowest level sent here
+
+        self._buffers = {}  # Key: id(Destination) | Value: LogBuffer
+        self._loop = None
+        self._task = None
+        self._wake = None
+        self._lock = None
+
+    def destination(self, record):
+        """Return where a record goes (None to drop it)"""
+        raise NotImplementedError
+
+    def format(self, record):
+        if record["level"] == "error":
+            return f"**ERROR:** {record['message']}"
+        if record["level"] == "warn":
+            return f"**WARNING:** {record['message']}"
+        return record["message"]
+
+    async def deliver(self, destination, buffer):
+        """Send the next message from a buffer"""
+        raise NotImplementedError
+
+    def emit(self, record):
+        destination = self.destination(record)
+        if destination is None:
+            return
+        self._start()
+        buffer = self._buffers.get(id(destination))
+        if buffer is None:
+            buffer = self._buffers[id(destination)] = LogBuffer(destination, self.rate_limit)
+        waiting = bool(buffer)
+        buffer.add(self.format(record), record["level"] == "error", self._loop.time())
+        # The flush task learns the deadline of a buffer's first record, or sends a full one
+        if not waiting or buffer.due(self._loop.time(), self.max_delay, self.size_limit):
+            self._wake.set()
+
+    def pending(self):
+        """Return the number of records waiting to be sent"""
+        return sum(len(b.errors) + len(b.records) for b in self._buffers.values())
+
+    async def flush(self):
+        """Send every pending record now (still within each destination's rate limit)"""
+        if self._lock is None:
+            return
+        async with self._lock:
+            for buffer in list(self._buffers.values()):
+                await self._send(buffer, force=True)
+
+    async def stop(self):
+        """Send every pending record and stop the flush task"""
+        await self.flush()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _start(self):
+        """Start the flush task on the running event loop (again if the loop changed or it stopped)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._buffers = {}
+            self._wake = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            # Sleep until a buffer is due (or a record makes one due)
+            now = self._loop.time()
+            deadlines = [b.oldest + self.max_delay for b in self._buffers.values() if b]
+            timeout = max(min(deadlines) - now, 0) if deadlines else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            async with self._lock:
+                for buffer in list(self._buffers.values()):
+                    await self._send(buffer, force=False)
+
+    async def _send(self, buffer, force):
+        """Send a buffer's due messages, waiting for its destination's rate limit"""
+        while buffer and (force or buffer.due(self._loop.time(), self.max_delay, self.size_limit)):
+            if buffer.window is not None:
+                wait = buffer.window.wait(self._loop.time())
+                if wait:
+                    # Records added meanwhile join the messages still to be sent
+                    await asyncio.sleep(wait)
+                    continue
+            try:
+                await self.deliver(buffer.destination, buffer)
+            except Exception as e:
+                print(f"Failed to send log message: {e}")
+
+
+class ChannelSink(BufferedSink):
+    """Sends records to a Discord channel, packed into messages of up to 2000 characters"""
+
+    def __init__(self, channel=None, max_delay=MAX_DELAY, rate_limit=CHANNEL_RATE_LIMIT, level="debug"):
+        super().__init__(max_delay, rate_limit, level)
+        # A fixed channel, or None to log to the current guild's log channel
+        self.channel = channel
+
+    @property
+    def log_channel(self):
+        return self.channel if self.channel is not None else config.log_channel
+
+    def destination(self, record):
+        return self.log_channel
+
+    async def deliver(self, channel, buffer):
+        message, _ = buffer.take(MESSAGE_LIMIT)
+        await channel.send(message)
+
+
+class WebhookSink(BufferedSink):
+    """
+    Sends records to a Discord webhook as embeds (red when they hold an error),
+    up to 10 per request, paced to the webhook's own rate limit
+    """
+
+    size_limit = EMBED_TOTAL_LIMIT
+
+    def __init__(self, url, webhook=None, max_delay=MAX_DELAY, rate_limit=WEBHOOK_RATE_LIMIT, level="info"):
+        super().__init__(max_delay, rate_limit, level)
+        self.url = url
+        self.webhook = webhook  # Created on the first send unless given
+        self._session = None
+
+    def destination(self, record):
+        return self
+
+    def format(self, record):
+        guild = f"[{record['guild']}] " if record.get("guild") is not None else ""
+        return guild + super().format(record)
+
+    async def deliver(self, _, buffer):
+        embeds, total = [], 0
+        while buffer and len(embeds) < EMBEDS_PER_MESSAGE:
+            # Records are only split when one alone is longer than an embed
+            remaining = EMBED_TOTAL_LIMIT - total
+            if embeds and buffer.next_length() > remaining:
+                break
+            text, has_error = buffer.take(min(EMBED_LIMIT, remaining))
+            if not text:
+                break
+            total += len(text)
+            color = discord.Color.red() if has_error else discord.Color.blue()
+            embeds.append(discord.Embed(description=text, color=color))
+        if embeds:
+            await self._webhook().send(embeds=embeds)
+
+    def _webhook(self):
+        if self.webhook is None:
+            self._session = aiohttp.ClientSession()
+            self.webhook = discord.Webhook.from_url(self.url, session=self._session)
+        return self.webhook
+
+    async def stop(self):
+        await super().stop()
+        if self._session is not None:
+            await self._session.close()
+            self._session, self.webhook = None, None
+
+
+class JSONLFileSink:
+    """
+    Appends every record as one JSON line to a local file from a background
+    thread, so logging never waits on the disk. The file is rotated once it
+    reaches `max_bytes` (path.1 is the newest of `backups` older files).
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5, level="debug"):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.level = LEVELS[level]
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def emit(self, record):
+        self._start()
+        self._queue.put(record)
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    async def flush(self):
+        """Wait until every record emitted so far is written"""
+        if self._thread is not None:
+            await asyncio.to_thread(self._queue.join)
+
+    async def stop(self):
+        """Write every pending record and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    def _start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-file-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        file = open(self.path, "a", encoding="utf-8")
+        try:
+            while True:
+                record = self._queue.get()
+                try:
+                    if record is None:
+                        return
+                    file.write(json.dumps(record, separators=(",", ":"), default=str) + "\n")
+                    if self._queue.empty():
+                        file.flush()
+                    if file.tell() >= self.max_bytes:
+                        file.close()
+                        self._rotate()
+                        file = open(self.path, "a", encoding="utf-8")
+                except Exception as e:
+                    print(f"Failed to write log record: {e}")
+                finally:
+                    self._queue.task_done()
+        finally:
+            file.close()
+
+    def _rotate(self):
+        """Shift path.N-1 to path.N, ..., path to path.1 (dropping the oldest)"""
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
 
 
 class Logger:
+    """
+    Fans every record out to its sinks: the log channel, plus any configured
+    local file or webhook. Each record has a level and a subsystem ("voice",
+    "roles", ...); records below their subsystem's level, or below every
+    sink's level, are dropped before any work is done. Debug and info records
+    logged with a dedupe key (such as one member's VC switches) are logged
+    once per `dedupe_seconds`, and the repeats are counted and summarized
+    when the window ends. Events with more than `summary_threshold` members
+    are logged as counts instead of one line per member.
+    """
 
-    def __init__(self, channel: discord.TextChannel):
-        self.log_channel = channel
+    def __init__(
+        self,
+        channel: discord.TextChannel = None,
+        sinks=None,
+        max_delay=MAX_DELAY,
+        rate_limit=CHANNEL_RATE_LIMIT,
+        level="debug",
+        dedupe_seconds=DEDUPE_SECONDS,
+        summary_threshold=SUMMARY_THRESHOLD,
+    ):
+        self.channel_sink = ChannelSink(channel, max_delay, rate_limit)
+        self.sinks = [self.channel_sink, *(sinks or [])]
+        self.level = LEVELS[level]  # Level of the subsystems without their own
+        self.levels = {}  # Key: Subsystem | Value: Level
+        self.dedupe_seconds = dedupe_seconds
+        self.summary_threshold = summary_threshold
+        self.clock = None  # Function returning monotonic seconds for the dedupe window, or None for the real clock
+        self._recent = OrderedDict()  # Key: Dedupe key | Value: [First seen, Repeats, Level, Subsystem, Message]
+        self._expiry = None  # Timer that logs the oldest repeat count once its window ends
+        self._expiry_loop = None
+        self._loop = None  # Event loop the logger last ran on (records from other threads are handed to it)
+
+    @property
+    def channel(self):
+        return self.channel_sink.channel
+
+    @property
+    def log_channel(self):
+        return self.channel_sink.log_channel
+
+    @property
+    def rate_limit(self):
+        return self.channel_sink.rate_limit
+
+    @rate_limit.setter
+    def rate_limit(self, rate_limit):
+        self.channel_sink.rate_limit = rate_limit
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def set_level(self, level, subsystem=None):
+        """Set the level of one subsystem, or of every subsystem without its own (raises KeyError for unknown levels)"""
+        if subsystem is None:
+            self.level = LEVELS[level]
+        else:
+            self.levels[subsystem] = LEVELS[level]
+
+    def enabled(self, level, subsystem="bot"):
+        """Return whether a record of this level and subsystem would be logged anywhere"""
+        level = LEVELS[level]
+        return level >= self.levels.get(subsystem, self.level) and any(
+            level >= sink.level for sink in self.sinks
+        )
 
     async def setChannel(self, channel: discord.TextChannel):
-        self.log_channel = channel
+        if self.channel_sink.channel is not None:
+            self.channel_sink.channel = channel
+        else:
+            config.log_channel = channel
         await self.info(f"Log channel set to {channel.mention}")
 
-    async def info(self, message: str):
-        try:
-            if self.log_channel is not None:
-                await self.log_channel.send(message)
-        except Exception as e:
-            print(f"Failed to send info message: {e}")
+    async def debug(self, message: str, subsystem="bot", key=None):
+        self._emit("debug", message, subsystem, key)
+
+    async def info(self, message: str, subsystem="bot", key=None):
+        self._emit("info", message, subsystem, key)
+
+    async def warn(self, message: str, subsystem="bot", key=None):
+        self._emit("warn", message, subsystem, key)
 
-    async def error(self, message: str):
+    async def error(self, message: str, subsystem="bot", key=None):
+        self._emit("error", message, subsystem, key)
+
+    def log(self, level, message: str, subsystem="bot", key=None):
+        """
+        Log a record from synchronous code: directly on the event loop, through
+        the loop from a worker thread, and to stderr when no loop is running
+        """
         try:
-            if self.log_channel is not None:
-                await self.log_channel.send(f"**ERROR:** {message}")
-        except Exception as e:
-            print(f"Failed to send error message: {e}")
+            asyncio.get_running_loop()
+        except RuntimeError:
+            loop = self._loop
+            if loop is None or not loop.is_running():
+                print(f"[{level}] {subsystem}: {message}", file=sys.stderr)
+                return
+            # The record keeps the guild of the thread's task
+            loop.call_soon_threadsafe(
+                self._emit, level, message, subsystem, key, context=contextvars.copy_context()
+            )
+            return
+        self._emit(level, message, subsystem, key)
+
+    async def summary(self, header: str, lines, subsystem="bot"):
+        """Log a header and lines as consecutive records (packed into as few messages as the limit allows)"""
+        if not self.enabled("info", subsystem):
+            return
+        self._fan_out("info", header, subsystem)
+        for line in lines:
+            self._fan_out("info", line, subsystem)
+
+    async def sessions_started(self, place, member_ids):
+        """Log the members whose sessions were started together (as a count above the summary threshold)"""
+        if not member_ids:
+            return
+        header = f"{len(member_ids)} members joined {place}. Starting Logging..."
+        if len(member_ids) > self.summary_threshold:
+            await self.info(header, "voice")
+            return
+        await self.summary(header, [f"- <@{member_id}>" for member_id in member_ids], "voice")
+
+    async def sessions_ended(self, place, ended):
+        """Log sessions ended together ({member ID: minutes}) and the new totals (as counts above the summary threshold)"""
+        if not ended:
+            return
+        header = f"{len(ended)} members left {place}. Ending Logging..."
+        if len(ended) > self.summary_threshold:
+            await self.info(f"{header} {sum(ended.values())} minutes were added in total.", "voice")
+            return
+        await flight_hours_manager.wait_until_loaded()  # Totals need the month's history
+        await self.summary(
+            header,
+            [
+                f"- <@{member_id}>: {minutes} minutes added, "
+                f"{flight_hours_manager.minutes(member_id)} minutes in total"
+                for member_id, minutes in ended.items()
+            ],
+            "voice",
+        )
+
+    async def flush(self):
+        """Log the pending repeat counts, then send or write every pending record now"""
+        self._cancel_expiry()
+        self._expire_repeats(None)
+        for sink in self.sinks:
+            await sink.flush()
+
+    async def stop(self):
+        """Send or write every pending record and stop the sinks' tasks and threads"""
+        self._cancel_expiry()
+        self._expire_repeats(None)
+        for sink in self.sinks:
+            await sink.stop()
+
+    def pending(self):
+        """Return the number of records waiting in the sinks"""
+        return sum(sink.pending() for sink in self.sinks)
+
+    def _emit(self, level, message, subsystem, key):
+        self._loop = asyncio.get_running_loop()
+        if not self.enabled(level, subsystem):
+            return
+        if self.dedupe_seconds and key is not None and level in DEDUPE_LEVELS:
+            now = self._now()
+            self._expire_repeats(now)
+            key = (level, subsystem, key)
+            repeat = self._recent.get(key)
+            if repeat is not None:
+                repeat[1] += 1
+                repeat[4] = message  # Summarized with the latest wording
+                self._schedule_expiry()
+                return
+            self._recent[key] = [now, 0, level, subsystem, message]
+        self._fan_out(level, message, subsystem)
+
+    def _now(self):
+        return (self.clock or clock.monotonic)()
+
+    def _schedule_expiry(self):
+        """Make sure the repeat counts are logged when their window ends, even if nothing else is logged"""
+        loop = asyncio.get_running_loop()
+        if self._expiry is not None and self._expiry_loop is loop:
+            return
+        first_seen = next(iter(self._recent.values()))[0]
+        delay = max(first_seen + self.dedupe_seconds - self._now(), 0)
+        self._expiry, self._expiry_loop = loop.call_later(delay, self._on_expiry), loop
+
+    def _on_expiry(self):
+        self._expiry = None
+        self._expire_repeats(self._now())
+        if any(repeats for _, repeats, _, _, _ in self._recent.values()):
+            self._schedule_expiry()
+
+    def _cancel_expiry(self):
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+    def _expire_repeats(self, now):
+        """Forget records first seen over a window ago (all of them if now is None), logging their repeat counts"""
+        while self._recent:
+            key, (first_seen, repeats, level, subsystem, message) = next(iter(self._recent.items()))
+            if now is not None and now - first_seen < self.dedupe_seconds:
+                break
+            del self._recent[key]
+            if repeats:
+                self._fan_out(
+                    level,
+                    f"{message} (repeated {repeats} more time{'s' if repeats > 1 else ''} "
+                    f"within {self.dedupe_seconds:.0f} seconds)",
+                    subsystem,
+                )
+
+    def _fan_out(self, level, message, subsystem):
+        record = {
+            "time": time.now(pytz.utc).timestamp(),
+            "level": level,
+            "subsystem": subsystem,
+            "guild": config.guild_id,
+            "message": message,
+        }
+        value = LEVELS[level]
+        for sink in self.sinks:
+            if value < sink.level:
+                continue
+            try:
+                sink.emit(record)
+            except Exception as e:
+                print(f"Failed to log to {type(sink).__name__}: {e}")
+
+
+class ForwardHandler(logging.Handler):
+    """
+    Forwards the records of the "eventsbot.<subsystem>" standard loggers to a
+    Logger. Storage, backups and persistence log this way because config,
+    which this module imports, imports them.
+    """
+
+    def __init__(self, logger):
+        super().__init__()
+        self.logger = logger
+
+    def emit(self, record):
+        if record.levelno >= logging.ERROR:
+            level = "error"
+        elif record.levelno >= logging.WARNING:
+            level = "warn"
+        else:
+            level = "info" if record.levelno >= logging.INFO else "debug"
+        self.logger.log(level, record.getMessage(), record.name.rpartition(".")[2])
+
+
+def create_logger():
+    """
+    Create the logger configured in the environment: LOG_LEVEL and LOG_LEVELS
+    (e.g. "voice=info,roles=warn"), LOG_CHANNEL_LEVEL, LOG_DEDUPE_SECONDS and
+    LOG_SUMMARY_THRESHOLD, plus the optional sinks LOG_FILE_PATH (a rotated
+    JSONL file) and LOG_WEBHOOK_URL (a webhook, LOG_WEBHOOK_LEVEL)
+    """
+    logger = Logger(
+        level=os.getenv("LOG_LEVEL", "debug").lower(),
+        dedupe_seconds=float(os.getenv("LOG_DEDUPE_SECONDS", str(DEDUPE_SECONDS))),
+        summary_threshold=int(os.getenv("LOG_SUMMARY_THRESHOLD", str(SUMMARY_THRESHOLD))),
+    )
+    for item in filter(None, os.getenv("LOG_LEVELS", "").split(",")):
+        subsystem, level = item.split("=", 1)
+        logger.set_level(level.strip().lower(), subsystem.strip())
+    logger.channel_sink.level = LEVELS[os.getenv("LOG_CHANNEL_LEVEL", "debug").lower()]
+    if os.getenv("LOG_FILE_PATH"):
+        logger.add_sink(
+            JSONLFileSink(
+                os.getenv("LOG_FILE_PATH"),
+                max_bytes=int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024))),
+                backups=int(os.getenv("LOG_FILE_BACKUPS", "5")),
+            )
+        )
+    if os.getenv("LOG_WEBHOOK_URL"):
+        logger.add_sink(
+            WebhookSink(
+                os.getenv("LOG_WEBHOOK_URL"), level=os.getenv("LOG_WEBHOOK_LEVEL", "info").lower()
+            )
+        )
+    return logger
 
 
-log_channel = config.log_channel
-logger = Logger(log_channel)
+# Logs go to the log channel of whichever guild the running task works on
+logger = create_logger()
+logging.getLogger("eventsbot").addHandler(ForwardHandler(logger))
+logging.getLogger("eventsbot").setLevel(logging.DEBUG)
+logging.getLogger("eventsbot").propagate = False  # Logged once, not again by discord.py's root handler
@@ -7,6 +7,7 @@ from discord.ext import commands
 from bot import bot
 from config import config
 from logger import logger
+from role_executor import RoleOperation, role_executor
 
 # Global lock to prevent race conditions with long haul data
 lh_lock = asyncio.Lock()
@@ -501,6 +502,20 @@ async def start_lh_checkin(ctx):
     config.save()
 
 
+async def remove_role_from_all(role):
+    """Remove a role from every member holding it through the role executor and return its report"""
+    report = await role_executor.run(
+        f"Clearing {role.name}",
+        [
+            RoleOperation(member, lambda member=member: member.remove_roles(role))
+            for member in role.members
+        ],
+    )
+    for operation, error in report.failed:
+        await logger.error(f"Failed to remove {role.name} from {operation.member.mention}: {error}")
+    return report
+
+
 @bot.command()
 async def stop_lh_checkin(ctx):
     """
@@ -536,7 +551,8 @@ async def stop_lh_checkin(ctx):
     
     # Remove the check-in role from all members
     checkin_role = config.guild.get_role(config.lh_mh_checkin_role_id)
-    for member in checkin_role.members: await member.remove_roles(checkin_role)
+    report = await remove_role_from_all(checkin_role)
+    await logger.info(report.summary())
 
     # Save the updated configuration
     config.save()
@@ -665,11 +681,13 @@ async def checkin(ctx):
         
         await ctx.send(f"{ctx.message.author.mention}, please enable DMs to continue check-in.")
         return
-    await logger.info(f"Boarding pass sent to {ctx.message.author.mention}.")
+    await logger.debug(f"Boarding pass sent to {ctx.message.author.mention}.", "checkin")
 
     # Add the member to the check-in role
     await ctx.message.author.add_roles(checkin_role)
-    await logger.info(f"{ctx.message.author.mention} was assigned the check-in role for the long haul event.")
+    await logger.debug(
+        f"{ctx.message.author.mention} was assigned the check-in role for the long haul event.", "checkin"
+    )
 
     # Save the updated configuration
     config.save()
@@ -694,11 +712,11 @@ async def clear_lh_checkin_role(ctx):
 
     # Clear the check-in role from all members
     checkin_role = config.guild.get_role(config.lh_mh_checkin_role_id)
+    report = await remove_role_from_all(checkin_role)
     msg = "The following members have been removed from the check-in role:\n"
-    for member in checkin_role.members:
-        await member.remove_roles(checkin_role)
-        msg += f"- {member.mention}\n"
+    msg += "".join(f"- {operation.member.mention}\n" for operation in report.succeeded)
     await logger.info(msg)
+    await logger.info(report.summary())
 
     # Save the updated configuration
     config.save()
@@ -718,11 +736,11 @@ async def clear_lh_security_role(ctx):
 
     # Clear the security role from all members
     security_role = config.guild.get_role(config.lh_mh_security_role_id)
+    report = await remove_role_from_all(security_role)
     msg = "The following members have been removed from the security role:\n"
-    for member in security_role.members:
-        await member.remove_roles(security_role)
-        msg += f"- {member.mention}\n"
+    msg += "".join(f"- {operation.member.mention}\n" for operation in report.succeeded)
     await logger.info(msg)
+    await logger.info(report.summary())
 
     # Save the updated configuration
     config.save()
\ No newline at end of file
@@ -43,6 +43,7 @@ from member_commands import (
     ping,
     quack,
     spam,
+    view_archive,
     view_event_history,
     view_member_history,
 )
@@ -77,6 +78,7 @@ from mod_commands import (
     add_event_vc,
     add_flight_time,
     blacklist,
+    log_level,
     remove_event_attendance,
     remove_event_vc,
     remove_flight_time,
@@ -87,6 +89,7 @@ from mod_commands import (
     view_event_vc,
     view_flight_time,
     view_restricted_channels,
+    view_voice_queue,
     whitelist,
 )
 from monthly_roles import clear_flight_logs, update_roles
@@ -1,4 +1,5 @@
 # Import Discord Python Libraries
+import asyncio
 import time
 
 # Import Other External Libraries
@@ -11,7 +12,7 @@ from discord.ext import commands
 from bot import bot
 
 # Import Necessary Local Files
-from config import config, flight_hours_manager
+from config import archive, config, flight_hours_manager, partitions
 from logger import logger
 
 
@@ -123,8 +124,6 @@ async def flighttime(ctx, member: discord.Member = None):
         None
     """
     try:
-        flight_time = flight_hours_manager.flight_hours.copy()
-
         # Retrieve the message author as the member name
         if member is None:
             member = ctx.message.author
@@ -141,10 +140,8 @@ async def flighttime(ctx, member: discord.Member = None):
             highest_role = max(member.roles, key=lambda role: role.position)
             embed_color = highest_role.color
 
-        # Check if the member has flight hours recorded
-        hours, minutes = 0, 0
-        if str(member.id) in flight_time.keys():
-            hours, minutes = divmod(flight_time[str(member.id)], 60)
+        # Get the member's flight hours (0 if none are recorded)
+        hours, minutes = divmod(flight_hours_manager.minutes(member.id), 60)
 
         # Format flight hours as a string
         flight_time_str = f"{int(hours)} hours {int(minutes)} minutes"
@@ -158,6 +155,16 @@ async def flighttime(ctx, member: discord.Member = None):
             name="Expected Role", value=expected_role((hours * 60 + minutes))
         )
 
+        # Add the flight time from previous months (only reads the member's partitions)
+        archived = await asyncio.to_thread(archive.member_minutes, member.id)
+        all_time_hours, all_time_minutes = divmod(
+            sum(archived.values()) + hours * 60 + minutes, 60
+        )
+        embed.add_field(
+            name="All-Time Flight Hours",
+            value=f"{int(all_time_hours)} hours {int(all_time_minutes)} minutes",
+        )
+
         # Safely get avatar URL
         try:
             avatar_url = (
@@ -195,18 +202,9 @@ async def leaderboard(ctx):
         None
     """
     try:
-        flight_time = flight_hours_manager.flight_hours.copy()
-
-        # Sort the Dictionary by Highest flight hours
-        sorted_flight_hours = dict(
-            sorted(flight_time.items(), key=lambda item: item[1], reverse=True)
-        )
-
-        # Convert the sorted dictionary items into a list of tuples
-        sorted_items = list(sorted_flight_hours.items())
-
-        # Display the top 10 values
-        limit = min(10, len(sorted_items))
+        # Retrieve the members with the highest flight hours (top 10)
+        sorted_items = flight_hours_manager.top_flight_hours(10)
+        limit = len(sorted_items)
 
         # Print No Members Found if Limit is 0
         if limit == 0:
@@ -261,6 +259,10 @@ async def on_message_delete(message):
         None
     """
 
+    # Work on the message's guild (ignoring guilds that are not configured)
+    if await partitions.enter(message.guild) is None:
+        return
+
     # Don't send "SAW" if the channel is a restricted channel
     if message.channel.id in config.restricted_channels:
         return
@@ -291,6 +293,10 @@ async def on_reaction_remove(reaction, user):
         None
     """
 
+    # Work on the message's guild (ignoring guilds that are not configured)
+    if await partitions.enter(reaction.message.guild) is None:
+        return
+
     # Don't send "SAW" if the channel is a restricted channel
     if reaction.message.channel.id in config.restricted_channels:
         return
@@ -480,27 +486,19 @@ async def view_member_history(ctx, member: discord.Member = None):
         return
 
     # Check if the member has attended at least one event
-    if not flight_hours_manager.member_history:
-        await ctx.send(
-            f"{member.name} has not attended any events for the current month."
-        )
-        return
-    if str(member.id) not in flight_hours_manager.member_history:
-        await ctx.send(
-            f"{member.name} has not attended any events for the current month."
-        )
-        return
-    if not flight_hours_manager.member_history[str(member.id)]:
+    await flight_hours_manager.wait_until_loaded()  # Attendance is read from memory
+    member_events = flight_hours_manager.member_events(member.id)
+    if not member_events:
         await ctx.send(
             f"{member.name} has not attended any events for the current month."
         )
         return
 
     # Otherwise print all the channels
-    num_events = len(flight_hours_manager.member_history[str(member.id)])
+    num_events = len(member_events)
     events_str = f"## Events Attended for {member.name}\n"
     events_str += f"-# This member has attended a total of {num_events} event(s)."
-    for event_name in flight_hours_manager.member_history[str(member.id)]:
+    for event_name in member_events:
         events_str += f"\n- {event_name}"
     await ctx.send(events_str)
 
@@ -526,20 +524,21 @@ async def view_event_history(ctx, event_index: int = 0):
         await ctx.send("ERROR: Event index must be a valid integer.")
         return
 
+    # Get the list of all events that took place (now ordered consistently)
+    await flight_hours_manager.wait_until_loaded()  # Attendance is read from memory
+    events = flight_hours_manager.event_names()
+
     # Check if there have been any events in the current month
-    if not flight_hours_manager.event_history:
+    if not events:
         await ctx.send("There have not been any events in the current month.")
         return
 
     # Check if the event index is valid
-    num_events = len(flight_hours_manager.event_history)
+    num_events = len(events)
     if event_index < 0 or event_index > num_events:
         await ctx.send(f"ERROR: Event Index Must be Between 0 and {num_events}.")
         return
 
-    # Get the list of all events that took place (now ordered consistently)
-    events = list(flight_hours_manager.event_history.keys())
-
     # If the event index is 0, simply print out all of the events that happened during the current month
     if not event_index:
 
@@ -555,8 +554,9 @@ async def view_event_history(ctx, event_index: int = 0):
     event_name = events[(event_index - 1)]
 
     # Create a list of member names
+    member_ids = flight_hours_manager.event_members(event_name)
     member_names = []
-    for member_id in flight_hours_manager.event_history[event_name]:
+    for member_id in member_ids:
         try:
             member = await bot.fetch_user(member_id)
             member_names.append(f"- {member.name}")
@@ -566,6 +566,55 @@ async def view_event_history(ctx, event_index: int = 0):
 
     # Send a message containing the people who attended the event
     attend_str = f"## Attendance for Event '{event_name}'\n"
-    attend_str += f"-# This event had a total of {len(flight_hours_manager.event_history[event_name])} participant(s).\n"
+    attend_str += f"-# This event had a total of {len(member_ids)} participant(s).\n"
     attend_str += "\n".join(member_names)
     await ctx.send(attend_str)
+
+
+@bot.command()
+@commands.cooldown(1, 10, commands.BucketType.user)  # 10 second cooldown per user
+async def view_archive(ctx, period: str = None):
+    """
+    Description:
+        Shows the archived months, or the leaderboard and events of an archived month
+
+    Arguments:
+        ctx : The command object
+        period : The archived month to view (YYYY-MM)
+
+    Return:
+        None
+    """
+
+    # If no month is given, list every archived month
+    periods = archive.periods()
+    if period is None:
+        if not periods:
+            await ctx.send("There are no archived months yet.")
+            return
+        archive_str = "## Archived Months\n"
+        archive_str += "-# View a month by passing it to the command. (Example: !view_archive 2025-01)"
+        for archived_period in periods:
+            archive_str += f"\n- {archived_period}"
+        await ctx.send(archive_str)
+        return
+
+    # Check that the month has been archived
+    if period not in periods:
+        await ctx.send(f"There is no archive for '{period}'. Use the format YYYY-MM.")
+        return
+
+    # Read only the partitions of the requested month
+    summary = await asyncio.to_thread(archive.period_summary, period)
+
+    # Send the leaderboard and event attendance of the month
+    archive_str = f"## Archive for {period}\n"
+    archive_str += f"-# {summary['members']} member(s) logged flight time across {len(summary['events'])} event(s).\n"
+    archive_str += "### Leaderboard"
+    for i, (member_id, minutes) in enumerate(summary["top_members"], start=1):
+        hours, minutes = divmod(minutes, 60)
+        archive_str += f"\n{i}. <@{member_id}>: {int(hours)} hours {int(minutes)} minutes"
+    archive_str += "\n### Events"
+    for event_name, attendees in summary["events"].items():
+        archive_str += f"\n- {event_name}: {attendees} members"
+    await ctx.send(archive_str)
@@ -0,0 +1,220 @@
+# Import Necessary Libraries
+import heapq
+import math
+from array import array
+from collections.abc import Mapping
+from datetime import datetime as time
+
+import pytz
+
+NO_MINUTES = -1  # Minutes column value of a member with no recorded flight time
+NO_SESSION = math.nan  # Start column value of a member who is not in a session
+
+
+class MemberStore:
+    """
+    Per-member flight state for the current month in array-backed columns.
+    Members are keyed by their integer snowflake and given a row; the flight
+    minutes, the session start (epoch seconds) and the minutes already credited
+    for the open session of every member live in flat machine-typed arrays
+    instead of one Python object per value. Open sessions are also indexed by
+    row so that walking them does not scan every member.
+    """
+
+    def __init__(self):
+        self._rows = {}  # Key: Member ID (int) | Value: Row (int)
+        self._ids = array("Q")  # Index: Row | Value: Member ID
+        self._minutes = array("q")  # Index: Row | Value: Minutes Flown (NO_MINUTES if none)
+        self._starts = array("d")  # Index: Row | Value: Session Start Epoch (NO_SESSION if none)
+        self._accrued = array("q")  # Index: Row | Value: Minutes Credited for the Open Session
+        self._open = {}  # Key: Row (int) | Value: None (rows with an open session, in start order)
+        self._with_minutes = 0  # Number of rows with recorded flight time
+        self._version = 0  # Incremented whenever any member's minutes change
+        self._top = None  # Cached (version, limit, ranking) of the last top() call
+
+    def _row(self, member_id):
+        """Return the row of a member, adding one if the member is new"""
+        row = self._rows.get(member_id)
+        if row is None:
+            row = len(self._ids)
+            self._rows[member_id] = row
+            self._ids.append(member_id)
+            self._minutes.append(NO_MINUTES)
+            self._starts.append(NO_SESSION)
+            self._accrued.append(0)
+        return row
+
+    # Flight Time
+
+    def minutes(self, member_id):
+        """Return a member's minutes this month (0 if none are recorded)"""
+        row = self._rows.get(int(member_id))
+        return max(self._minutes[row], 0) if row is not None else 0
+
+    def has_minutes(self, member_id):
+        row = self._rows.get(int(member_id))
+        return row is not None and self._minutes[row] != NO_MINUTES
+
+    def add_minutes(self, member_id, minutes, floor=None):
+        """Add minutes to a member (optionally not going below floor) and return the total"""
+        row = self._row(int(member_id))
+        current = self._minutes[row]
+        if current == NO_MINUTES:
+            self._with_minutes += 1
+            current = 0
+        total = current + minutes
+        if floor is not None:
+            total = max(total, floor)
+        self._minutes[row] = total
+        self._version += 1
+        return total
+
+    def minutes_items(self):
+        """Yield (member ID, minutes) for every member with recorded flight time"""
+        for member_id, minutes in zip(self._ids, self._minutes):
+            if minutes != NO_MINUTES:
+                yield member_id, minutes
+
+    def top(self, limit):
+        """Return the (member ID, minutes) pairs with the most flight time"""
+        # The ranking only changes when minutes do, so repeated calls are free
+        if self._top is None or self._top[:2] != (self._version, limit):
+            ranking = heapq.nlargest(limit, self.minutes_items(), key=lambda item: item[1])
+            self._top = (self._version, limit, ranking)
+        return list(self._top[2])
+
+    # Sessions
+
+    def start_session(self, member_id, epoch, accrued=0):
+        """Open a session (moving the start of an open one keeps its credited minutes)"""
+        row = self._row(int(member_id))
+        if row not in self._open:
+            self._open[row] = None
+            self._accrued[row] = accrued
+        self._starts[row] = epoch
+
+    def end_session(self, member_id):
+        row = self._rows.get(int(member_id))
+        if row is not None and row in self._open:
+            del self._open[row]
+            self._starts[row] = NO_SESSION
+            self._accrued[row] = 0
+
+    def accrue(self, member_id, minutes):
+        """Credit minutes flown so far in an open session to the member"""
+        row = self._rows.get(int(member_id))
+        if row is not None and row in self._open:
+            self._accrued[row] += minutes
+            self.add_minutes(member_id, minutes)
+
+    def accrued(self, member_id):
+        """Return the minutes already credited for a member's open session"""
+        row = self._rows.get(int(member_id))
+        return self._accrued[row] if row is not None and row in self._open else 0
+
+    def session_start(self, member_id):
+        """Return the epoch a member's session started at (None if not in a session)"""
+        row = self._rows.get(int(member_id))
+        if row is None or math.isnan(self._starts[row]):
+            return None
+        return self._starts[row]
+
+    def session_items(self):
+        """Yield (member ID, start epoch) for every open session"""
+        for row in self._open:
+            yield self._ids[row], self._starts[row]
+
+    def accrued_items(self):
+        """Yield (member ID, minutes credited) for every open session with credited minutes"""
+        for row in self._open:
+            if self._accrued[row]:
+                yield self._ids[row], self._accrued[row]
+
+    def clear_sessions(self):
+        self._starts = array("d", [NO_SESSION]) * len(self._ids)
+        self._accrued = array("q", [0]) * len(self._ids)
+        self._open = {}
+
+    def clear(self):
+        """Remove every member"""
+        self.__init__()
+
+    def copy(self):
+        """Return an independent copy (the columns are copied as raw memory)"""
+        store = MemberStore.__new__(MemberStore)
+        store._rows = self._rows.copy()
+        store._ids = self._ids[:]
+        store._minutes = self._minutes[:]
+        store._starts = self._starts[:]
+        store._accrued = self._accrued[:]
+        store._open = self._open.copy()
+        store._with_minutes = self._with_minutes
+        store._version = self._version
+        store._top = self._top
+        return store
+
+    # Read-only views keyed by str(member_id) in the shape of the old dictionaries
+
+    @property
+    def minutes_view(self):
+        """Member ID (str) -> minutes, for members with recorded flight time"""
+        return _MinutesView(self)
+
+    @property
+    def sessions_view(self):
+        """Member ID (str) -> session start (datetime), for members in a session"""
+        return _SessionView(self)
+
+
+def _member_key(key):
+    """Convert a view key to a snowflake (or None if it cannot be one)"""
+    try:
+        return int(key)
+    except (TypeError, ValueError):
+        return None
+
+
+class _MinutesView(Mapping):
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, key):
+        member_id = _member_key(key)
+        if member_id is None or not self._store.has_minutes(member_id):
+            raise KeyError(key)
+        return self._store.minutes(member_id)
+
+    def __contains__(self, key):
+        member_id = _member_key(key)
+        return member_id is not None and self._store.has_minutes(member_id)
+
+    def __iter__(self):
+        return (str(member_id) for member_id, _ in self._store.minutes_items())
+
+    def items(self):
+        return [(str(member_id), minutes) for member_id, minutes in self._store.minutes_items()]
+
+    def __len__(self):
+        return self._store._with_minutes
+
+
+class _SessionView(Mapping):
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, key):
+        member_id = _member_key(key)
+        start = self._store.session_start(member_id) if member_id is not None else None
+        if start is None:
+            raise KeyError(key)
+        return time.fromtimestamp(start, pytz.utc)
+
+    def __contains__(self, key):
+        member_id = _member_key(key)
+        return member_id is not None and self._store.session_start(member_id) is not None
+
+    def __iter__(self):
+        return (str(member_id) for member_id, _ in self._store.session_items())
+
+    def __len__(self):
+        return len(self._store._open)
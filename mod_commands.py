@@ -10,11 +10,11 @@ import pandas as pd
 from discord.ext import commands
 
 # Import Bot & Logger Objects
-from bot import bot
+from bot import bot, voice_events
 
 # Import Necessary Local Files
 from config import config, flight_hours_manager
-from logger import logger
+from logger import LEVELS, logger
 from validation import sanitize_event_name, validate_flight_time, validate_member_id
 
 
@@ -144,14 +144,15 @@ async def view_restricted_channels(ctx):
 
 
 @bot.command()
-async def add_event_vc(ctx, channel: discord.VoiceChannel = None):
+async def add_event_vc(ctx, channel: discord.VoiceChannel = None, *, event_name: str = None):
     """
     Description:
-        Adds the Voice Channel to the tracked list during an Event.
+        Adds the Voice Channel to the tracked list of an active Event.
 
     Arguments:
         ctx : The command object
         channels (discord.TextChannel) : Channel to be added as an Event Voice Channel
+        event_name : The event to add it to (required only while several events are active)
 
     Returns:
         None
@@ -164,34 +165,36 @@ async def add_event_vc(ctx, channel: discord.VoiceChannel = None):
         return
 
     # Check if there is an active event
-    if not flight_hours_manager.active_event:
+    if not flight_hours_manager.events:
         await ctx.send(
             f"You cannot add {channel.mention} as an event VC. There is currently no active event."
         )
         return
 
+    # Check which event the voice channel is for
+    event = flight_hours_manager.resolve_event(event_name)
+    if event is None:
+        await ctx.send(
+            f"'{event_name}' is not an active event." if event_name else
+            "Several events are active. Please name the event to add the voice channel to."
+        )
+        return
+
     # Check if the voice channel is already in the list of logged channels
-    if channel in flight_hours_manager.voice_channels:
+    if flight_hours_manager.is_event_channel(channel):
         await ctx.send(f"{channel.mention} is already an event voice channel.")
         return
 
     # Add the voice channel to the list of logged voice channels
-    flight_hours_manager.voice_channels.append(channel)
-    await ctx.send(f"{channel.mention} was added as an event voice channel.")
+    flight_hours_manager.add_voice_channel(channel, event)
+    await ctx.send(f"{channel.mention} was added as a voice channel for event '{event}'.")
     await logger.info(
-        f"{channel.mention} was added as an event voice channel by {ctx.message.author.mention}."
+        f"{channel.mention} was added as a voice channel for event '{event}' by {ctx.message.author.mention}."
     )
 
     # Log any members who might be in the event voice channel
-    for member in channel.members:
-        if member.bot:
-            continue  # Skip bots
-        await logger.info(
-            f"{member.mention} joined {channel.mention}. Starting Logging..."
-        )
-        success = flight_hours_manager.log_start_time(member.id, member)
-        if not success:
-            continue  # Bot was filtered out
+    started = flight_hours_manager.start_sessions(channel.members, event_name=event)
+    await logger.sessions_started(channel.mention, started)
 
     # Save the updated flight hours to the file
     flight_hours_manager.save()
@@ -218,36 +221,29 @@ async def remove_event_vc(ctx, channel: discord.VoiceChannel = None):
         return
 
     # Check if there is an active event
-    if not flight_hours_manager.active_event:
+    if not flight_hours_manager.events:
         await ctx.send(
             f"You cannot remove {channel.mention} as an event VC. There is currently no active event."
         )
         return
 
     # Check if the voice channel is already in the list of logged channels
-    if channel not in flight_hours_manager.voice_channels:
+    if not flight_hours_manager.is_event_channel(channel):
         await ctx.send(f"{channel.mention} is not an event voice channel.")
         return
 
-    # Add the voice channel to the list of logged voice channels
-    flight_hours_manager.voice_channels.remove(channel)
+    # Remove the voice channel from the list of logged voice channels
+    flight_hours_manager.remove_voice_channel(channel)
     await ctx.send(f"{channel.mention} was removed as an event voice channel.")
     await logger.info(
         f"{channel.mention} was removed as an event voice channel by {ctx.message.author.mention}."
     )
 
-    # Log any members who might be in the event voice channel
-    for member in channel.members:
-        if member.bot:
-            continue  # Skip bots
-        elapsed_minutes = flight_hours_manager.log_end_time(member.id, member)
-        if elapsed_minutes == 0:
-            continue  # Bot was filtered out or no time logged
-        await logger.info(f"{member.mention} left {channel.mention}. Ending Logging...")
-        await logger.info(
-            f"{int(elapsed_minutes)} minutes of flight time were added to {member.mention}. "
-            f"{member.mention} has a total flight time of {int(flight_hours_manager.flight_hours[str(member.id)])} minutes."
-        )
+    # End the logging of any members who might be in the event voice channel
+    ended = flight_hours_manager.end_sessions(
+        member.id for member in channel.members if not member.bot
+    )
+    await logger.sessions_ended(channel.mention, ended)
 
     # Save the updated flight hours to the file
     flight_hours_manager.save()
@@ -257,7 +253,7 @@ async def remove_event_vc(ctx, channel: discord.VoiceChannel = None):
 async def view_event_vc(ctx):
     """
     Description:
-        Shows all the Voice Channels being tracked for logging during an Event.
+        Shows the Voice Channels being tracked for logging, grouped by their active Event.
 
     Arguments:
         ctx : The command object
@@ -273,23 +269,89 @@ async def view_event_vc(ctx):
         return
 
     # Check if there is an active event
-    if not flight_hours_manager.active_event:
+    if not flight_hours_manager.events:
         await ctx.send(f"There is currently no active event.")
         return
 
     # Check if there is at least one event VC being tracked
-    if not flight_hours_manager.voice_channels:
+    if not flight_hours_manager.channel_events:
         await ctx.send(f"There are no voice channels currently being tracked.")
         return
 
-    # Send the list of voice channels being tracked
+    # Send the list of voice channels being tracked for each event
     channels_str = f"## Event Voice Channels"
-    channels_str += "".join(
-        f"\n- <#{channel.id}>" for channel in flight_hours_manager.voice_channels
-    )
+    for event_name, channel_ids in flight_hours_manager.events.items():
+        channels_str += f"\n**{event_name}**"
+        channels_str += "".join(f"\n- <#{channel_id}>" for channel_id in channel_ids)
     await ctx.send(channels_str)
 
 
+@bot.command()
+async def view_voice_queue(ctx):
+    """
+    Description:
+        Shows the depth, processing latency and dropped events of the voice event queue.
+
+    Arguments:
+        ctx : The command object
+
+    Returns:
+        None
+    """
+
+    # Verify that the member is a first officer
+    manager_role = config.guild.get_role(config.first_officer_role_id)
+    if manager_role not in ctx.message.author.roles:
+        await ctx.send("Your role is not high enough to use this command.")
+        return
+
+    # Send the queue metrics
+    stats = voice_events.stats()
+    await ctx.send(
+        f"## Voice Event Queue"
+        f"\n- Queued: {stats['depth']} (deepest: {stats['max_depth']})"
+        f"\n- Log messages waiting: {stats['log_backlog']}"
+        f"\n- Processed: {stats['processed']}"
+        f"\n- Dropped: {stats['dropped']}"
+        f"\n- Latency: {stats['avg_latency_ms']:.1f} ms average, {stats['max_latency_ms']:.1f} ms max"
+    )
+
+
+@bot.command()
+async def log_level(ctx, level: str, subsystem: str = None):
+    """
+    Description:
+        Sets the lowest level (debug, info, warn or error) logged for one subsystem
+        (e.g. voice, roles, checkin), or for every subsystem without its own level.
+
+    Arguments:
+        ctx : The command object
+        level : The lowest level to log
+        subsystem (optional) : The subsystem to set the level of
+
+    Returns:
+        None
+    """
+
+    # Verify that the member is a captain
+    captain_role = config.guild.get_role(config.captain_role_id)
+    if captain_role not in ctx.message.author.roles:
+        await ctx.send("Your role is not high enough to use this command.")
+        return
+
+    # Validate the level
+    level = level.lower()
+    if level not in LEVELS:
+        await ctx.send(f"Unknown log level `{level}`. Use one of: {', '.join(LEVELS)}.")
+        return
+
+    # Set the level
+    logger.set_level(level, subsystem)
+    target = f"the `{subsystem}` subsystem" if subsystem else "all subsystems without their own level"
+    await ctx.send(f"Log level set to `{level}` for {target}.")
+    await logger.info(f"{ctx.message.author.mention} set the log level to {level} for {target}.")
+
+
 @bot.command()
 async def add_flight_time(ctx, member: discord.Member, minutes: int):
     """
@@ -325,12 +387,8 @@ async def add_flight_time(ctx, member: discord.Member, minutes: int):
         validated_minutes = validate_flight_time(minutes)
         validated_member_id = validate_member_id(member.id)
 
-        # If the member is not in the flight hours dictionary, create an entry
-        if validated_member_id not in flight_hours_manager.flight_hours.keys():
-            flight_hours_manager.flight_hours[validated_member_id] = 0
-
         # Add the flight hours to the member
-        flight_hours_manager.flight_hours[validated_member_id] += validated_minutes
+        flight_hours_manager.adjust_flight_time(validated_member_id, validated_minutes)
 
         # Send a Message to the Channel and the Logger
         await ctx.send(
@@ -382,13 +440,13 @@ async def remove_flight_time(ctx, member: discord.Member, minutes: int):
         return
 
     # If the member is not in the flight hours dictionary, create an entry
-    if str(member.id) not in flight_hours_manager.flight_hours.keys():
+    if not flight_hours_manager.members.has_minutes(member.id):
         await ctx.send(f"{member.mention} does not have any flight time.")
         return
 
     # Subtract the flight time from the member
-    flight_hours_manager.flight_hours[str(member.id)] -= min(
-        minutes, flight_hours_manager.flight_hours[str(member.id)]
+    flight_hours_manager.adjust_flight_time(
+        member.id, -min(minutes, flight_hours_manager.minutes(member.id))
     )
 
     # Send a Message to the Channel and the Logger
@@ -450,19 +508,13 @@ async def add_event_attendance(ctx, member: discord.Member, *, event_name: str):
         return
 
     # Check if the event exists
+    await flight_hours_manager.wait_until_loaded()  # Attendance is read from memory
     if event_name not in flight_hours_manager.event_history.keys():
         await ctx.send(f"Event '{event_name}' could not be found in the database")
         return
 
-    # Add the Member to the Event Attendance
-    flight_hours_manager.event_history[event_name].add(str(member.id))
-
-    # Check if the member has a member history entry
-    if str(member.id) not in flight_hours_manager.member_history.keys():
-        flight_hours_manager.member_history[str(member.id)] = set([])
-
-    # Add the Event to the Member History
-    flight_hours_manager.member_history[str(member.id)].add(event_name)
+    # Add the Member to the Event Attendance and the Event to the Member History
+    flight_hours_manager.add_attendance(event_name, member.id)
 
     # Update Logger Information
     await ctx.send(
@@ -505,16 +557,13 @@ async def remove_event_attendance(ctx, member: discord.Member, *, event_name: st
         await ctx.send(f"Event '{event_name}' could not be found in the database")
         return
 
-    # Remove the Member from the Event Attendance
-    flight_hours_manager.event_history[event_name].remove(str(member.id))
-
-    # Check if the member has a member history entry
-    if str(member.id) not in flight_hours_manager.member_history.keys():
+    # Check if the member attended the event
+    if not flight_hours_manager.attendance.attended(event_name, member.id):
+        await ctx.send(f"{member.mention} did not attend event '{event_name}'")
         return
 
-    # Remove the event name from the list of events attended for the member
-    if event_name in flight_hours_manager.member_history[str(member.id)]:
-        flight_hours_manager.member_history[str(member.id)].remove(event_name)
+    # Remove the Member from the Event Attendance and the Event from the Member History
+    flight_hours_manager.remove_attendance(event_name, member.id)
 
     # Update Logger Information
     await ctx.send(
@@ -557,14 +606,15 @@ async def view_event_attendance(ctx, *, event_name: str):
         return
 
     # Create a list of member namess
+    member_ids = flight_hours_manager.event_members(event_name)
     member_names = []
-    for member_id in flight_hours_manager.event_history[event_name]:
+    for member_id in member_ids:
         member = await bot.fetch_user(member_id)
         member_names.append(f"- {member.name}")
 
     # Send a message containing the people who attended the event
     attend_str = f"## Attendance for Event '{event_name}'\n"
-    attend_str += f"-# This event had a total of {len(flight_hours_manager.event_history[event_name])} participant(s).\n"
+    attend_str += f"-# This event had a total of {len(member_ids)} participant(s).\n"
     attend_str += "\n".join(member_names)
     await ctx.send(attend_str)
 
@@ -713,7 +763,7 @@ async def add_event(ctx, *, event_name: str):
             return
 
         # Add the event to the event history
-        flight_hours_manager.event_history[sanitized_event_name] = set()
+        flight_hours_manager.add_event(sanitized_event_name)
         await ctx.send(
             f"Event '{sanitized_event_name}' was successfully added to the event history database."
         )
@@ -757,12 +807,8 @@ async def remove_event(ctx, *, event_name: str):
         await ctx.send("This event is not in the event history.")
         return
 
-    # Remove all the atendees of the event
-    for member_id in flight_hours_manager.event_history[event_name]:
-        flight_hours_manager.member_history[member_id].remove(event_name)
-
-    # Add the event to the event history
-    del flight_hours_manager.event_history[event_name]
+    # Remove the event and all of its attendees from the event history
+    flight_hours_manager.remove_event(event_name)
     await ctx.send(
         f"Event '{event_name}' was successfully removed from the event history database."
     )
@@ -779,7 +825,7 @@ async def remove_event(ctx, *, event_name: str):
 async def start_event(ctx, *, event_name: str):
     """
     Description:
-        Starts an unofficial event with the given name
+        Starts an unofficial event with the given name (alongside any other active events)
 
     Arguments:
         ctx : The command object
@@ -795,11 +841,9 @@ async def start_event(ctx, *, event_name: str):
         await ctx.send("Your role is not high enough to use this command.")
         return
 
-    # Check if there is a current active event
-    if flight_hours_manager.active_event:
-        await ctx.send(
-            "There is already an ongoing event. You cannot start another event."
-        )
+    # Check if an event with this name is already active
+    if event_name in flight_hours_manager.events:
+        await ctx.send(f"Event '{event_name}' is already ongoing.")
         return
 
     # Check that the event does not already exist in the database
@@ -813,22 +857,22 @@ async def start_event(ctx, *, event_name: str):
     await ctx.send(f"Logging for event '{event_name}' has started.")
     await logger.info(f"Starting Logging for Event '{event_name}'.")
 
-    # Set the active event and add the event VC to the voice channel list
-    flight_hours_manager.active_event = event_name
-    flight_hours_manager.event_history[event_name] = set()
+    # Mark the event as active (its voice channels are added with add_event_vc)
+    flight_hours_manager.start_event(event_name)
 
     # Export the updated data back to the file
     flight_hours_manager.save()
 
 
 @bot.command()
-async def end_event(ctx):
+async def end_event(ctx, *, event_name: str = None):
     """
     Description:
-        Ends any event that is currently ongoing
+        Ends an ongoing event, leaving any other active events running
 
     Arguments:
         ctx : The command object
+        event_name : The event to end (required only while several events are active)
 
     Returns:
         None
@@ -841,39 +885,34 @@ async def end_event(ctx):
         return
 
     # Check if there is a current active event
-    if not flight_hours_manager.active_event:
+    if not flight_hours_manager.events:
         await ctx.send("There is currently no active event.")
         return
 
-    # End the Logging for all members who joined the event
-    for member_id in list(flight_hours_manager.start_time.keys()):
-
-        # Log the left member and get the elapsed time
-        elapsed_minutes = flight_hours_manager.log_end_time(str(member_id))
-
-        # Update the logger information to the log channel
-        #        member = config.guild.get_member(int(member_id))
-        #        vc_channel = member.voice.channel.mention if member.voice else "the event"
-        await logger.info(f"<@{member_id}> left the event. Ending Logging...")
-        total_flight_time = flight_hours_manager.flight_hours.get(str(member_id), 0)
-        await logger.info(
-            f"{int(elapsed_minutes)} minutes of flight time were added to <@{member_id}>. "
-            f"<@{member_id}> has a total flight time of {int(total_flight_time)} minutes."
+    # Check which event to end
+    event = flight_hours_manager.resolve_event(event_name)
+    if event is None:
+        await ctx.send(
+            f"'{event_name}' is not an active event." if event_name else
+            "Several events are active. Please name the event to end."
         )
+        return
+    event_name = event
+
+    # End the Logging for all members who joined the event
+    ended = flight_hours_manager.end_sessions(event_name=event_name)
+    await logger.sessions_ended(f"'{event_name}'", ended)
 
     # Update logger information to the log channel
-    event_name = flight_hours_manager.active_event
     await logger.info(
-        f"Ending Logging for Event '{event_name}'. A total of {len(flight_hours_manager.event_history[event_name])} members joined."
+        f"Ending Logging for Event '{event_name}'. A total of {flight_hours_manager.attendance.event_count(event_name)} members joined."
     )
     await ctx.send(
-        f"Logging for event '{event_name}' has ended. A total of {len(flight_hours_manager.event_history[event_name])} members joined."
+        f"Logging for event '{event_name}' has ended. A total of {flight_hours_manager.attendance.event_count(event_name)} members joined."
     )
 
-    # Reset the active event and clear out the event VCs
-    flight_hours_manager.active_event = None
-    flight_hours_manager.voice_channels.clear()
-    flight_hours_manager.start_time.clear()
+    # Stop tracking the event and its VCs
+    flight_hours_manager.end_event(event_name)
 
     # Export the updated data back to the file
     flight_hours_manager.save()
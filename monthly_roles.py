@@ -1,5 +1,4 @@
 # Import Discord Python Libraries
-import asyncio
 import csv
 
 # Import Other Necessary Libraries
@@ -13,16 +12,19 @@ from discord.ext import commands
 from bot import bot
 
 # Import from Local Files
-from config import config, flight_hours_manager
+from config import archive, config, flight_hours_manager, persistence
 from logger import logger
+from role_executor import RoleOperation, role_executor
 
 
-def calculate_earned_role(minutes):
+def calculate_earned_role(minutes, sorted_roles=None):
     """
     Calculate the earned role based on flight time in minutes.
 
     Args:
         minutes (int): Flight time in minutes
+        sorted_roles (list): (Role ID, threshold) pairs, highest threshold first
+            (sorted from the configuration if not given)
 
     Returns:
         int: Role ID for the earned role, or None if no role earned
@@ -34,7 +36,8 @@ def calculate_earned_role(minutes):
     hours = (minutes // 60) + 1
 
     # Sort roles by threshold (highest first) to find the best role
-    sorted_roles = sorted(config.roles.items(), key=lambda x: x[1], reverse=True)
+    if sorted_roles is None:
+        sorted_roles = sorted(config.roles.items(), key=lambda x: x[1], reverse=True)
 
     # Find the highest role threshold met
     for role_id, threshold in sorted_roles:
@@ -44,12 +47,140 @@ def calculate_earned_role(minutes):
     return None
 
 
+class RolePlan:
+    """
+    The rank role changes that bring every member to the tier earned by their
+    flight time, computed against the roles they hold now
+    """
+
+    def __init__(self):
+        self.changes = []  # (Member, roles to add, roles to remove), one entry per changed member
+        self.unchanged = 0  # Members already holding exactly their earned role
+        self.fetched = 0  # Members looked up through the API because they were not cached
+        self.missing = []  # IDs of members with flight time who are no longer in the guild
+        self.role_count = {}  # Key: Role ID | Value: Members holding it once the plan is applied
+
+        # API calls the remove-everything-then-re-add approach would have made
+        self.full_reset_calls = 0
+
+    def api_calls(self):
+        """Return the API calls the plan takes (one per changed member, plus fetches)"""
+        return len(self.changes) + self.fetched
+
+
+async def plan_role_changes(guild, rank_roles, flight_hours):
+    """
+    Compute the target rank role of every member in one pass over the flight
+    hours and compare it with the rank roles members hold (from the member
+    cache, so only members missing from it are fetched). Returns a RolePlan.
+    """
+    plan = RolePlan()
+    plan.role_count = {role_id: 0 for role_id in rank_roles}
+    sorted_roles = sorted(config.roles.items(), key=lambda x: x[1], reverse=True)
+
+    # Rank roles each member holds now
+    members = {}  # Key: Member ID | Value: Member
+    held = {}  # Key: Member ID | Value: Set of Rank Role IDs
+    for role_id, role in rank_roles.items():
+        for member in role.members:
+            if member.bot:
+                continue  # Skip bots
+            members[member.id] = member
+            held.setdefault(member.id, set()).add(role_id)
+            plan.full_reset_calls += 1
+
+    # Rank role each member has earned this month
+    earned = {}  # Key: Member ID | Value: Rank Role ID
+    for member_id_str, minutes in flight_hours.items():
+        role_id = calculate_earned_role(minutes, sorted_roles)
+        if role_id in rank_roles:
+            earned[int(member_id_str)] = role_id
+
+    for member_id in held.keys() | earned.keys():
+        target = {earned[member_id]} if member_id in earned else set()
+        current = held.get(member_id, set())
+        member = members.get(member_id)
+        if target:
+            plan.full_reset_calls += 1  # Fetching the member before adding the role
+
+        # Members with flight time but no rank role may not be cached
+        if member is None:
+            member = guild.get_member(member_id)
+            if member is None:
+                plan.fetched += 1
+                try:
+                    member = await guild.fetch_member(member_id)
+                except discord.NotFound:
+                    plan.missing.append(member_id)
+                    continue
+                except Exception as e:
+                    await logger.error(f"Failed to process member {member_id}: {e}")
+                    continue
+            if member.bot:
+                continue
+        if target:
+            plan.full_reset_calls += 1  # Adding the role
+            plan.role_count[earned[member_id]] += 1
+
+        if target == current:
+            plan.unchanged += 1
+            continue
+        plan.changes.append(
+            (
+                member,
+                [rank_roles[role_id] for role_id in target - current],
+                [rank_roles[role_id] for role_id in current - target],
+            )
+        )
+    return plan
+
+
+async def log_roles(message):
+    """Log one applied role change"""
+    await logger.debug(message, "roles")
+
+
+async def log_role_summary(changes):
+    """Log applied role changes ((member, added roles, removed roles)) as one record of counts per role"""
+    counts = {}  # Key: Role Name | Value: [Members added, Members removed]
+    for member, add, remove in changes:
+        for role in add:
+            counts.setdefault(role.name, [0, 0])[0] += 1
+        for role in remove:
+            counts.setdefault(role.name, [0, 0])[1] += 1
+    await logger.info(
+        f"Updated the rank roles of {len(changes)} members: "
+        + ", ".join(f"{name} +{added} -{removed}" for name, (added, removed) in counts.items()),
+        "roles",
+    )
+
+
+async def apply_role_change(member, add, remove):
+    """Change a member's rank roles with one API call"""
+    if len(add) + len(remove) == 1:
+        # A single role change leaves the member's other roles untouched
+        if add:
+            await member.add_roles(*add)
+        else:
+            await member.remove_roles(*remove)
+        return
+    remove_ids = {role.id for role in remove}
+    await member.edit(
+        roles=[
+            role
+            for role in member.roles
+            if not role.is_default() and role.id not in remove_ids
+        ]
+        + add
+    )
+
+
 @bot.command()
 async def update_roles(ctx):
     """
     Description:
-        Efficiently updates roles for all members using a role-based approach.
-        This algorithm is much more efficient than the previous member-based approach.
+        Updates the rank roles of all members to the tiers earned by their flight time.
+        Only members whose tier changed are updated, with one API call each.
 
     Arguments:
         ctx : The context of the command
@@ -93,65 +224,41 @@ async def update_roles(ctx):
             await logger.error("No rank roles found! Please check your configuration.")
             return
 
-        # Step 2: Remove all rank roles from members who have them
-        logger.info("Removing roles earned during the previous month...")
-        for role_id, role in rank_roles.items():
-
-            # Get all members with the role
-            members_with_role = role.members
-
-            # Remove the role from each member
-            for member in members_with_role:
-                if member.bot:
-                    continue  # Skip bots
-                while True:
-                    try:
-                        await member.remove_roles(role)
-                        await logger.info(
-                            f"- Removed {role.name} from {member.mention}"
-                        )
-                        break
-                    except Exception as e:
-                        await asyncio.sleep(0.05)
-
-            # Small delay to prevent rate limiting
-            await asyncio.sleep(0.05)
-
-        # Initialize role count dictionary
-        role_count = {role_id: 0 for role_id in rank_roles.keys()}
-
-        # Step 3: Add earned roles to members with flight time
-        logger.info("Adding roles earned during the current month...")
-        for member_id_str, minutes in flight_hours_manager.flight_hours.items():
-
-            # Calculate earned role
-            earned_role_id = calculate_earned_role(minutes)
-            if not earned_role_id or earned_role_id not in rank_roles:
-                continue
-            earned_role = rank_roles[earned_role_id]
-
-            try:
-
-                # Get member object
-                member = await config.guild.fetch_member(int(member_id_str))
-                if not member or member.bot:
-                    continue
-
-                # Add the earned role
-                await member.add_roles(earned_role)
-                role_count[earned_role_id] += 1
+        # Step 2: Compare the roles members hold with the roles they earned
+        await logger.info("Comparing member roles with the roles earned during the current month...")
+        plan = await plan_role_changes(
+            config.guild, rank_roles, flight_hours_manager.flight_hours
+        )
+        await logger.info(
+            f"Role plan: {len(plan.changes)} members to update, {plan.unchanged} unchanged, "
+            f"{len(plan.missing)} no longer in the server. {plan.api_calls()} API calls "
+            f"instead of {plan.full_reset_calls} "
+            f"({plan.full_reset_calls - plan.api_calls()} saved)."
+        )
 
-                # Log the assignment
-                h, m = divmod(minutes, 60)
-                await logger.info(
-                    f"- Assigned {earned_role.name} to {member.mention} ({h}h {m}m flown)"
+        # Step 3: Apply only the changes (logged one by one, or as counts above the summary threshold)
+        itemized = len(plan.changes) <= logger.summary_threshold
+        report = await role_executor.run(
+            "Role Updates",
+            [
+                RoleOperation(
+                    member,
+                    # Bound per member, so a retry recomputes the roles from the member's current ones
+                    lambda member=member, add=add, remove=remove: apply_role_change(member, add, remove),
+                    f"Updated {member.mention}: "
+                    + ", ".join([f"+{role.name}" for role in add] + [f"-{role.name}" for role in remove]),
                 )
-
-            except Exception as e:
-                await logger.error(f"Failed to process member {member_id_str}: {e}")
-
-            # Small delay to prevent rate limiting
-            await asyncio.sleep(0.05)
+                for member, add, remove in plan.changes
+            ],
+            log=log_roles if itemized else None,
+        )
+        if not itemized:
+            applied = {operation.member.id for operation in report.succeeded}
+            await log_role_summary([change for change in plan.changes if change[0].id in applied])
+        await logger.info(report.summary())
+        for operation, error in report.failed:
+            await logger.error(f"Failed to update the roles of {operation.member.mention}: {error}")
+        role_count = plan.role_count
 
         # Step 4: Send member summary statistics
         num_members = len(flight_hours_manager.flight_hours)
@@ -162,26 +269,25 @@ async def update_roles(ctx):
         await logger.info(summary)
 
         # Step 5: Send event summary statistics
-        num_events = len(flight_hours_manager.event_history)
-        num_members = len(flight_hours_manager.member_history)
+        attendance = flight_hours_manager.attendance
+        num_events = len(attendance)
+        num_members = len(attendance.attendance_counts())
         summary = f"A total of {num_events} events took place during the current month "
         summary += f"and a total of {num_members} members logged flight time."
-        for event_name, members in flight_hours_manager.event_history.items():
-            summary += f"\n- {event_name}: {len(members)} members"
+        for event_name in attendance.events():
+            summary += f"\n- {event_name}: {attendance.event_count(event_name)} members"
         await ctx.send(summary)
         await logger.info(summary)
 
-        # Step 6: Clear flight hours
-        await ctx.send("Clearing Flight Hours...")
+        # Step 6: Archive and clear flight hours
+        await ctx.send("Archiving and Clearing Flight Hours...")
         try:
-            flight_hours_manager.start_time.clear()
-            flight_hours_manager.flight_hours.clear()
-            flight_hours_manager.event_history.clear()
-            flight_hours_manager.member_history.clear()
+            partition_id = await flight_hours_manager.seal_period(archive)
             flight_hours_manager.save()
-            await ctx.send("Flight Hours Cleared.")
+            await persistence.flush()
+            await ctx.send(f"Flight Hours Archived ({partition_id}) and Cleared.")
             await logger.info(
-                f"Flight Hours Were Cleared by {ctx.message.author.mention}"
+                f"Flight Hours Were Archived ({partition_id}) and Cleared by {ctx.message.author.mention}"
             )
         except Exception as e:
             await ctx.send(
@@ -198,8 +304,8 @@ async def update_roles(ctx):
 async def clear_flight_logs(ctx):
     """
     Description:
-        When called by an administrator, this function will reset all of the flight logs by removing
-        every entry in the flight_hours dictionary.
+        When called by an administrator, this function will archive the current flight logs and
+        then reset them by removing every entry in the flight_hours dictionary.
 
     Arguments:
         ctx : The context of the command
@@ -217,17 +323,20 @@ async def clear_flight_logs(ctx):
     # Update logger information
     await ctx.send("Clearing Flight Hours")
 
-    # Clear the Flight Hours Dictionary
+    # Archive and Clear the Flight Hours Dictionary
     try:
-        flight_hours_manager.start_time.clear()
-        flight_hours_manager.flight_hours.clear()
-        flight_hours_manager.event_history.clear()
-        flight_hours_manager.member_history.clear()
+        partition_id = await flight_hours_manager.seal_period(archive)
+        await logger.info(f"Flight Hours Were Archived ({partition_id})")
     except Exception as e:
-        await logger.error(e)
+        await ctx.send(
+            "Error clearing flight hours. Please check the logs for more information."
+        )
+        await logger.error(f"Error clearing flight hours: {e}")
+        return
 
     # Export the updated data back to the file
     flight_hours_manager.save()
+    await persistence.flush()
 
     # Update logger Information
     await ctx.send("Flight Hours Cleared.")
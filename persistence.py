@@ -0,0 +1,89 @@
+# Import Necessary Libraries
+import asyncio
+import logging
+
+# Forwarded to the bot's logger once it is loaded
+log = logging.getLogger("eventsbot.persistence")
+
+
+class PersistenceScheduler:
+    """
+    Coalesces bursts of save requests into one write per file per interval
+    and performs the serialization and disk I/O in a worker thread so the
+    event loop never blocks on the disk.
+    """
+
+    def __init__(self, interval=2.0):
+        self.interval = interval  # Seconds to wait for more changes before writing
+        self._dirty = {}  # Key: File Path (str) | Value: Write Callback (callable)
+        self._task = None
+        self._wake = None
+        self._flush_lock = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        if self._dirty:
+            self._wake.set()
+
+    async def stop(self):
+        """Stop the background task and write everything that is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def mark_dirty(self, file_path, callback):
+        """Schedule a write for a file (the latest callback for the file wins)"""
+        self._dirty[file_path] = callback
+        if self._wake is not None:
+            self._wake.set()
+
+    async def flush(self, file_paths=None):
+        """Immediately write every pending file (or only file_paths) and wait until it is on disk"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if file_paths is None:
+                pending, self._dirty = self._dirty, {}
+            else:
+                pending = {
+                    file_path: self._dirty.pop(file_path)
+                    for file_path in file_paths
+                    if file_path in self._dirty
+                }
+            failed = []
+            for file_path, callback in pending.items():
+                try:
+                    await asyncio.to_thread(callback)
+                except Exception as e:
+                    log.error(f"Failed to write {file_path}: {e}")
+                    failed.append((file_path, callback))
+
+            # Retry failed writes on the next flush unless a newer write replaced them
+            for file_path, callback in failed:
+                self._dirty.setdefault(file_path, callback)
+            if failed and self._wake is not None:
+                self._wake.set()
+            return not failed
+
+    async def _run(self):
+        while True:
+            # Sleep until something changes, then let the burst settle
+            await self._wake.wait()
+            await asyncio.sleep(self.interval)
+            self._wake.clear()
+            await self.flush()
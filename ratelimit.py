@@ -0,0 +1,33 @@
+# Import Necessary Libraries
+import contextvars
+
+# Called with (remaining, reset_after) for every response of a rate limited
+# route, by whoever is pacing the requests of the current task (see observe_bucket)
+bucket_observer = contextvars.ContextVar("bucket_observer", default=None)
+
+
+def observe_bucket(remaining, reset_after):
+    """Hand a route bucket's state after a request (its rate limit headers) to the current task's observer"""
+    observer = bucket_observer.get()
+    if observer is not None:
+        observer(remaining, reset_after)
+
+
+class RateWindow:
+    """A fixed rate limit window of `limit` requests every `per` seconds, like Discord's"""
+
+    def __init__(self, limit, per):
+        self.limit = limit
+        self.per = per
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def wait(self, now):
+        """Take a request from the window and return 0, or the seconds until the window resets"""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.per
+        if self.remaining > 0:
+            self.remaining -= 1
+            return 0.0
+        return self.reset_at - now
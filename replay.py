@@ -0,0 +1,444 @@
+# Import Necessary Libraries
+import argparse
+import asyncio
+import contextlib
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time as clock
+from datetime import datetime as time
+
+import discord
+import pytz
+from discord.enums import EventStatus
+
+from simulator import FakeHTTP, SimContext, SimGuild, SimScheduledEvent, write_report
+
+# Forwarded to the bot's logger once it is loaded
+log = logging.getLogger("eventsbot.replay")
+
+# Version of the recording format (written in the first line of every recording)
+RECORD_VERSION = 1
+
+# Configured IDs are recorded by attribute name, so a replay resolves them
+# against its own configuration instead of treating them as anonymous IDs
+CONFIGURED_IDS = (
+    "log_channel_id",
+    "moderator_role_id",
+    "captain_role_id",
+    "first_officer_role_id",
+    "first_class_role_id",
+    "business_class_role_id",
+    "premium_economy_role_id",
+    "economy_class_role_id",
+    "server_booster_role_id",
+    "lh_mh_checkin_role_id",
+    "lh_mh_security_role_id",
+)
+
+# Guild ID the replayed guild is served under (above any real snowflake)
+REPLAY_GUILD_ID = 2**63 - 1
+
+
+def _open(path, mode):
+    """Open a recording (gzip-compressed if its name ends in .gz)"""
+    return gzip.open(path, mode) if path.endswith(".gz") else open(path, mode)
+
+
+def configured_ids(config):
+    """Return {ID: attribute name} of a configuration's roles and channels"""
+    return {getattr(config, name): name for name in CONFIGURED_IDS}
+
+
+class EventRecorder:
+    """
+    Writes a guild's voice state updates, scheduled event updates and completed
+    commands to a compact JSON-lines file. Times are seconds since the recording
+    started, and every Discord ID and event name is replaced by a small number,
+    except the configured roles and channels, which are recorded by name.
+    Records are queued and written from a background thread, so recording
+    never waits on the disk.
+    """
+
+    def __init__(self, path, guild_id, configured=None):
+        self.path = path
+        self.guild_id = guild_id  # Only this guild's events are recorded
+        self.configured = configured or {}  # Key: ID | Value: Configuration attribute name
+        self.ids = {}  # Key: Discord ID | Value: Anonymous ID
+        self.names = {}  # Key: Event name | Value: Anonymous name
+        self.started = time.now(pytz.utc).timestamp()
+        self.count = 0
+        self._queue = queue.Queue()
+        self._file = _open(path, "wt")
+        self._thread = threading.Thread(target=self._run, name="gateway-recorder", daemon=True)
+        self._thread.start()
+        self._write({"v": RECORD_VERSION, "started": self.started})
+
+    def anonymize(self, snowflake):
+        """Return the anonymous ID (or configuration name) recorded for a Discord ID"""
+        if snowflake is None:
+            return None
+        snowflake = int(snowflake)
+        if snowflake in self.configured:
+            return self.configured[snowflake]
+        return self.ids.setdefault(snowflake, len(self.ids) + 1)
+
+    def anonymize_name(self, name):
+        return self.names.setdefault(name, f"Event {len(self.names) + 1}")
+
+    def _channel(self, state):
+        return self.anonymize(state.channel.id) if state.channel is not None else None
+
+    def _argument(self, value):
+        """Return a command argument in a JSON-compatible form"""
+        if isinstance(value, discord.Role):
+            return {"role": self.anonymize(value.id)}
+        if isinstance(value, (discord.Member, discord.User)):
+            return {"member": self.anonymize(value.id)}
+        if isinstance(value, discord.abc.GuildChannel):
+            return {"channel": self.anonymize(value.id)}
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        return str(value)
+
+    def voice(self, member, before, after):
+        """Record a voice state update"""
+        self._write(
+            {
+                "k": "voice",
+                "t": self._elapsed(),
+                "m": self.anonymize(member.id),
+                "bot": member.bot,
+                "b": self._channel(before),
+                "a": self._channel(after),
+            }
+        )
+
+    def scheduled_event(self, before, after):
+        """Record a scheduled event update"""
+        self._write(
+            {
+                "k": "event",
+                "t": self._elapsed(),
+                "e": self.anonymize(after.id),
+                "n": self.anonymize_name(before.name),
+                "s": after.status.name,
+                "c": self.anonymize(after.channel.id) if after.channel else None,
+            }
+        )
+
+    def command(self, ctx):
+        """Record a completed command with its parsed arguments and the author's roles"""
+        author = ctx.message.author
+        self._write(
+            {
+                "k": "cmd",
+                "t": round(ctx.message.created_at.timestamp() - self.started, 3),
+                "name": ctx.command.qualified_name,
+                "m": self.anonymize(author.id),
+                "roles": [self.anonymize(role.id) for role in getattr(author, "roles", [])],
+                "c": self.anonymize(ctx.channel.id),
+                "args": [self._argument(value) for value in ctx.args[1:]],
+                "kwargs": {key: self._argument(v) for key, v in ctx.kwargs.items()},
+            }
+        )
+
+    def flush(self):
+        """Wait until every record so far is written"""
+        self._queue.join()
+
+    def close(self):
+        """Write every pending record and close the file"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _elapsed(self):
+        return round(time.now(pytz.utc).timestamp() - self.started, 3)
+
+    def _write(self, record):
+        self._queue.put(record)
+        self.count += 1
+
+    def _run(self):
+        try:
+            while True:
+                record = self._queue.get()
+                try:
+                    if record is None:
+                        return
+                    self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    # Flushed once the burst is written, not after every record
+                    if self._queue.empty():
+                        self._file.flush()
+                except Exception as e:
+                    log.error(f"Failed to write a gateway record: {e}")
+                finally:
+                    self._queue.task_done()
+        finally:
+            self._file.close()
+
+
+def install_recorder(bot, recorder):
+    """Record the recorder's guild's gateway events and commands as the bot receives them"""
+
+    async def on_voice_state_update(member, before, after):
+        if member.guild.id == recorder.guild_id and before.channel != after.channel:
+            recorder.voice(member, before, after)
+
+    async def on_scheduled_event_update(before, after):
+        if after.guild.id == recorder.guild_id:
+            recorder.scheduled_event(before, after)
+
+    async def on_command_completion(ctx):
+        if ctx.guild is not None and ctx.guild.id == recorder.guild_id:
+            recorder.command(ctx)
+
+    bot.add_listener(on_voice_state_update)
+    bot.add_listener(on_scheduled_event_update)
+    bot.add_listener(on_command_completion)
+
+
+def read_recording(path):
+    """Return (header, records) of a recording, records ordered by time"""
+    records = []
+    with _open(path, "rt") as file:
+        try:
+            for line in file:
+                records.append(json.loads(line))
+        except (EOFError, json.JSONDecodeError):
+            pass  # The bot stopped mid-write; keep what was recorded
+    if not records or records[0].get("v") != RECORD_VERSION:
+        raise ValueError(f"{path} is not a version {RECORD_VERSION} recording")
+    return records[0], sorted(records[1:], key=lambda record: record["t"])
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class ReplayDriver:
+    """
+    Feeds a recording into the real handlers against a SimGuild, at the
+    recorded pace divided by `speed` (0 replays as fast as possible). The
+    flight hours run on a virtual clock that follows the recorded times and
+    each record is fully applied before the next, so the final state, and
+    its hash, are the same at any speed.
+    """
+
+    def __init__(self, partition, handlers, get_command, speed=0.0, seed=0):
+        self.partition = partition  # GuildPartition the guild's state is kept in
+        self.handlers = handlers  # Key: "voice" or "event" | Value: Gateway event handler
+        self.get_command = get_command  # Command name -> Command (None if unknown)
+        self.speed = speed
+        self.seed = seed
+        self.guild = SimGuild(partition.guild_id, FakeHTTP())  # Rate limits are counted, not slept
+        self.virtual_now = 0.0
+        self.latencies = {}  # Key: Handler | Value: Seconds per call
+        self.errors = 0
+
+    def resolve(self, token):
+        """Return the ID a recorded ID or configuration name stands for"""
+        return getattr(self.partition.config, token) if isinstance(token, str) else token
+
+    def _argument(self, value):
+        if isinstance(value, dict):
+            kind, token = next(iter(value.items()))
+            if kind == "member":
+                return self.guild.member(self.resolve(token))
+            if kind == "role":
+                return self.guild.role(self.resolve(token))
+            return self.guild.channel(self.resolve(token))
+        return value
+
+    def _voice(self, record):
+        member = self.guild.member(self.resolve(record["m"]), record.get("bot", False))
+        before = self.guild.channel(self.resolve(record["b"]))
+        if (member.voice.channel if member.voice else None) is not before:
+            self.guild.move_member(member, before)  # Joined before the recording started
+        before, after = self.guild.move_member(member, self.guild.channel(self.resolve(record["a"])))
+        return "voice", self.handlers["voice"](member, before, after)
+
+    def _event(self, record):
+        channel = self.guild.channel(self.resolve(record["c"]))
+        before = SimScheduledEvent(self.guild, record["e"], record["n"], channel)
+        after = SimScheduledEvent(self.guild, record["e"], record["n"], channel)
+        after.status = EventStatus[record["s"]]
+        return "event", self.handlers["event"](before, after)
+
+    def _command(self, record):
+        command = self.get_command(record["name"])
+        if command is None:
+            return None, None
+        author = self.guild.member(self.resolve(record["m"]))
+        for token in record.get("roles", []):
+            author._add_role(self.guild.role(self.resolve(token)))
+        ctx = SimContext(self.guild, author, self.guild.channel(self.resolve(record["c"])), command)
+        args = [self._argument(value) for value in record.get("args", [])]
+        kwargs = {key: self._argument(value) for key, value in record.get("kwargs", {}).items()}
+        return f"cmd:{record['name']}", command.callback(ctx, *args, **kwargs)
+
+    async def run(self, header, records, partitions):
+        """Replay the records and return the report"""
+        from logger import logger
+
+        partition = self.partition
+        partitions.add(partition)
+        partition.config.guild = self.guild
+        partition.config.log_channel = self.guild.channel(partition.config.log_channel_id)
+        partition.flight_hours.writer.bind()
+        partition.flight_hours.clock = lambda: self.virtual_now
+        random.seed(self.seed)
+
+        # FakeHTTP counts the log channel's rate limit, so the logger sends unpaced
+        rate_limit, logger.rate_limit = logger.rate_limit, None
+        started = clock.perf_counter()
+        try:
+            with partitions.use(partition):
+                for record in records:
+                    # Wait for the record's time (scaled by the speed) before delivering it
+                    if self.speed:
+                        delay = record["t"] / self.speed - (clock.perf_counter() - started)
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    self.virtual_now = header["started"] + record["t"]
+
+                    build = {"voice": self._voice, "event": self._event}.get(record["k"], self._command)
+                    name, call = build(record)
+                    if call is None:
+                        continue
+                    call_started = clock.perf_counter()
+                    try:
+                        await call
+                    except Exception as e:
+                        self.errors += 1
+                        log.error(f"Replayed {name} failed: {e}")
+                    self.latencies.setdefault(name, []).append(clock.perf_counter() - call_started)
+
+                    # Apply queued voice changes before the next record, so the
+                    # outcome does not depend on how fast the records arrive
+                    await partition.voice_events.drain()
+
+                # Let the voice event queue apply everything it was handed
+                await partition.voice_events.stop()
+                await logger.flush()
+                elapsed = clock.perf_counter() - started
+                return self.report(len(records), elapsed)
+        finally:
+            logger.rate_limit = rate_limit
+            partitions.remove(partition.guild_id)
+            partition.flight_hours.storage.close()
+
+    def state_hash(self):
+        """Return a SHA-256 of the flight state, the long haul settings and the members' roles"""
+        state = self.partition.flight_hours.snapshot_state()
+        state.pop("period", None)  # The month the replay runs in
+        config = self.partition.config
+        data = {
+            "flight_hours": state,
+            "config": {
+                "restricted_channels": config.restricted_channels,
+                "blacklist": config.blacklist,
+                "lh_mh_attributes": config.lh_mh_attributes,
+                "checkin_start": config.checkin_start,
+            },
+            "roles": {
+                str(member_id): sorted(role.id for role in member.roles)
+                for member_id, member in sorted(self.guild.members.items())
+            },
+        }
+        encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def report(self, count, elapsed):
+        """Return the throughput, per-handler latency and final state hash"""
+        return {
+            "records": count,
+            "seconds": round(elapsed, 3),
+            "records_per_second": round(count / elapsed, 1) if elapsed else None,
+            "errors": self.errors,
+            "http": self.guild.http.stats(),
+            "voice_queue": self.partition.voice_events.stats(),
+            "handlers": {
+                name: {
+                    "count": len(values),
+                    "p50_ms": round(_percentile(values, 0.5) * 1000, 3),
+                    "p99_ms": round(_percentile(values, 0.99) * 1000, 3),
+                    "max_ms": round(max(values) * 1000, 3),
+                }
+                for name, values in sorted(self.latencies.items())
+            },
+            "state_hash": self.state_hash(),
+        }
+
+
+def replay_partition(work_dir, guild_id=REPLAY_GUILD_ID):
+    """Create an empty partition in work_dir with the environment's role and channel IDs"""
+    from archive import MonthlyArchive
+    from config import Configurations, FlightHours
+    from guilds import GuildPartition
+    from storage import create_storage
+
+    guild_config = Configurations(
+        {**os.environ, "GUILD_ID": guild_id}, os.path.join(work_dir, "bot_settings.json")
+    )
+    return GuildPartition(
+        guild_id,
+        guild_config,
+        FlightHours(create_storage(os.path.join(work_dir, "flight_hours"))),
+        MonthlyArchive(os.path.join(work_dir, "archive")),
+    )
+
+
+async def replay(path, speed=0.0, seed=0, work_dir=None):
+    """Replay a recording against the bot's real handlers and return the report"""
+    # Importing the command modules registers their commands on the bot
+    import flight_logs
+    import longhauls
+    import member_commands
+    import mod_commands
+    import monthly_roles
+    from bot import bot
+    from config import partitions
+
+    header, records = read_recording(path)
+    with tempfile.TemporaryDirectory(dir=work_dir) as directory:
+        driver = ReplayDriver(
+            replay_partition(directory),
+            {
+                "voice": flight_logs.on_voice_state_update,
+                "event": flight_logs.on_scheduled_event_update,
+            },
+            bot.get_command,
+            speed=speed,
+            seed=seed,
+        )
+        return await driver.run(header, records, partitions)
+
+
+if __name__ == "__main__":
+    # Usage: python replay.py night.jsonl.gz [--speed 60] [--expect-hash HASH] [--output report.json]
+    parser = argparse.ArgumentParser(description="Replay a recorded event night")
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=0.0, help="0 replays as fast as possible")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for seat and gate assignment")
+    parser.add_argument("--expect-hash", help="Fail unless the final state has this hash")
+    parser.add_argument("--output", default="-", help="Report file (- for stdout)")
+    options = parser.parse_args()
+
+    # Anything the bot prints goes to stderr, so stdout holds only the report
+    with contextlib.redirect_stdout(sys.stderr):
+        result = asyncio.run(replay(options.recording, options.speed, options.seed))
+    write_report(result, options.output)
+    if options.expect_hash and result["state_hash"] != options.expect_hash:
+        print(f"State hash {result['state_hash']} does not match {options.expect_hash}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,205 @@
+# Import Necessary Libraries
+import asyncio
+import os
+import random
+import time as clock
+
+import aiohttp
+import discord
+
+from logger import logger
+from ratelimit import bucket_observer, observe_bucket
+
+# Retries of one operation before it is reported as failed
+MAX_RETRIES = 5
+
+# Backoff of transient errors: base * 2^attempt seconds, capped, with full jitter
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# Pacing between operations (seconds): starts unpaced, widens on every rate
+# limit and narrows again as operations succeed
+MAX_INTERVAL = 2.0
+INTERVAL_DECAY = 0.9
+
+# discord.py parses the rate limit headers of every response into its route
+# bucket (X-RateLimit-Remaining and X-RateLimit-Reset-After); hand them to the
+# executor whose operation made the request
+_original_ratelimit_update = discord.http.Ratelimit.update
+
+
+def _observe_ratelimit_update(self, response, **kwargs):
+    _original_ratelimit_update(self, response, **kwargs)
+    observe_bucket(self.remaining, self.reset_after)
+
+
+discord.http.Ratelimit.update = _observe_ratelimit_update
+
+
+class RoleOperation:
+    """One role change of a bulk job: `call` is a coroutine function making one API call"""
+
+    __slots__ = ("member", "call", "description", "attempts")
+
+    def __init__(self, member, call, description=""):
+        self.member = member
+        self.call = call
+        self.description = description  # Logged on success (e.g. "Removed Check-In from <@1>")
+        self.attempts = 0
+
+
+class RoleJobReport:
+    """The outcome of a bulk role job"""
+
+    def __init__(self, name, total):
+        self.name = name
+        self.total = total  # Operations in the job
+        self.succeeded = []  # RoleOperations applied
+        self.failed = []  # (RoleOperation, Error message) given up on
+        self.retries = 0  # Attempts after the first, across every operation
+        self.rate_limited = 0  # Rate limits hit (429 responses and discord.RateLimited)
+        self.waited = 0.0  # Seconds spent waiting on rate limits and backoff
+        self.started = clock.perf_counter()
+        self.elapsed = 0.0
+
+    def summary(self):
+        """Return a one-line summary of the job"""
+        return (
+            f"{self.name}: {len(self.succeeded)}/{self.total} role changes applied, "
+            f"{len(self.failed)} failed, {self.retries} retries, {self.rate_limited} rate limits "
+            f"({self.elapsed:.1f} seconds, {self.waited:.1f} spent waiting)"
+        )
+
+
+def classify(error):
+    """
+    Return (retry, wait): whether an error is worth retrying, and the seconds
+    Discord asked to wait before doing so (None to back off on our own)
+    """
+    if isinstance(error, discord.RateLimited):
+        return True, error.retry_after
+    if isinstance(error, discord.HTTPException):
+        if error.status == 429:
+            headers = getattr(error.response, "headers", None) or {}
+            wait = headers.get("X-RateLimit-Reset-After") or headers.get("Retry-After")
+            return True, float(wait) if wait is not None else None
+        # Missing members and roles, or permissions, will not fix themselves
+        return error.status >= 500, None
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, OSError)):
+        return True, None
+    return False, None
+
+
+class RoleExecutor:
+    """
+    Applies bulk role changes with a bounded pool of workers. Workers share
+    one pacer: a rate limit pauses every worker for as long as Discord asks
+    and widens the interval between operations, which then narrows again
+    as operations succeed. The rate limit headers of each response pace
+    the workers before that: the last requests of a bucket are spread over
+    its reset, and an empty bucket pauses every worker until it resets. Transient errors are retried with jittered
+    exponential backoff up to `max_retries` times; permanent errors (a
+    member who left, missing permissions) fail the operation immediately.
+    """
+
+    def __init__(self, workers=4, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_cap=BACKOFF_CAP):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.interval = 0.0  # Seconds between the starts of two operations
+        self._next_start = 0.0  # Monotonic time the next operation may start
+        self._paused_until = 0.0  # Monotonic time a rate limit ends
+        self._bucket_interval = 0.0  # Seconds between operations the last response's bucket allows
+
+    def backoff(self, attempt):
+        """Return a jittered wait before retry number `attempt`"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    async def run(self, name, operations, log=None):
+        """
+        Apply every operation and return a RoleJobReport. `log` is an optional
+        coroutine function called with each applied operation's message.
+        """
+        operations = list(operations)
+        report = RoleJobReport(name, len(operations))
+        queue = asyncio.Queue()
+        for operation in operations:
+            queue.put_nowait(operation)
+
+        async def worker():
+            while not queue.empty():
+                operation = queue.get_nowait()
+                await self._apply(operation, report, log)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(operations)))))
+        report.elapsed = clock.perf_counter() - report.started
+        return report
+
+    def observe(self, remaining, reset_after):
+        """Pace by a response's rate limit bucket, so workers slow down before it runs out"""
+        if remaining <= 0:
+            self._paused_until = max(self._paused_until, clock.monotonic() + reset_after)
+            self._bucket_interval = 0.0
+        elif remaining < self.workers:
+            # Fewer requests left than workers: spread them over the rest of the window
+            self._bucket_interval = min(MAX_INTERVAL, reset_after / remaining)
+        else:
+            self._bucket_interval = 0.0
+
+    async def _pace(self, report):
+        """Wait for this worker's turn under the shared pacing"""
+        now = clock.monotonic()
+        start = max(now, self._next_start, self._paused_until)
+        self._next_start = start + max(self.interval, self._bucket_interval)
+        while start > now:
+            report.waited += start - now
+            await asyncio.sleep(start - now)
+            # A bucket emptied meanwhile pauses workers already waiting their turn
+            now = clock.monotonic()
+            start = max(now, self._paused_until)
+
+    async def _call(self, operation):
+        """Make an operation's API call, observing the rate limit buckets of its requests"""
+        observing = bucket_observer.set(self.observe)
+        try:
+            await operation.call()
+        finally:
+            bucket_observer.reset(observing)
+
+    async def _apply(self, operation, report, log):
+        while True:
+            await self._pace(report)
+            operation.attempts += 1
+            try:
+                await self._call(operation)
+            except Exception as e:
+                retry, wait = classify(e)
+                if not retry or operation.attempts > self.max_retries:
+                    report.failed.append((operation, str(e) or type(e).__name__))
+                    return
+                report.retries += 1
+                if wait is not None:
+                    # Every worker waits out a rate limit, and the pace slows down
+                    report.rate_limited += 1
+                    self._paused_until = max(self._paused_until, clock.monotonic() + wait)
+                    self.interval = min(MAX_INTERVAL, max(self.interval * 2, 0.05))
+                else:
+                    delay = self.backoff(operation.attempts - 1)
+                    report.waited += delay
+                    await asyncio.sleep(delay)
+                continue
+
+            self.interval = self.interval * INTERVAL_DECAY if self.interval > 0.001 else 0.0
+            report.succeeded.append(operation)
+            if log is not None and operation.description:
+                try:
+                    await log(f"- {operation.description}")
+                except Exception as e:
+                    await logger.error(f"Failed to log a role change: {e}", "roles")
+            return
+
+
+# Shared by every bulk role command
+role_executor = RoleExecutor(workers=int(os.getenv("ROLE_WORKERS", "4")))
@@ -0,0 +1,563 @@
+# Import Necessary Libraries
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time as clock
+from types import SimpleNamespace
+
+import discord
+from discord.enums import EventStatus
+
+# Routes are paced with the same windows the log sinks pace their messages with
+from ratelimit import RateWindow, observe_bucket
+
+# Requests per window (seconds) of each route bucket, close to the limits
+# Discord reports in its rate limit headers. Buckets are kept per major
+# parameter (the guild or channel), like Discord's.
+DEFAULT_LIMITS = {
+    "member_roles": (10, 10.0),  # PUT/DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}
+    "edit_member": (10, 10.0),  # PATCH /guilds/{guild_id}/members/{user_id}
+    "get_member": (10, 1.0),  # GET /guilds/{guild_id}/members/{user_id}
+    "get_user": (30, 1.0),  # GET /users/{user_id}
+    "create_dm": (5, 1.0),  # POST /users/@me/channels
+    "send_message": (5, 5.0),  # POST /channels/{channel_id}/messages
+}
+
+# Requests per second across every route
+GLOBAL_LIMIT = (50, 1.0)
+
+# First IDs handed out by a simulated guild (far from any configured ID)
+FIRST_MEMBER_ID = 100_000_000_000_000_000
+FIRST_CHANNEL_ID = 200_000_000_000_000_000
+
+
+class SimResponse:
+    """The parts of an aiohttp response discord.HTTPException reads"""
+
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+
+
+class FakeHTTP:
+    """
+    Stands in for Discord's REST API. Every request takes a slot from its
+    route bucket and the global bucket, waiting (like discord.py does on a
+    429) when either is used up. Waits are multiplied by `time_scale`; the
+    rest of each wait is skipped by moving the simulated clock forward, so
+    0 runs a whole night of rate limits instantly while still reporting
+    how long they would have taken. Like Discord's rate limit headers, each
+    request reports what is left of its route bucket to observe_bucket().
+    """
+
+    def __init__(self, limits=None, latency=0.0, time_scale=0.0, max_wait=None):
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.latency = latency  # Simulated round trip of each request (seconds)
+        self.time_scale = time_scale  # Fraction of each wait actually slept
+        self.max_wait = max_wait  # Longest wait before raising discord.RateLimited
+        self.global_bucket = RateWindow(*GLOBAL_LIMIT)
+        self.buckets = {}  # Key: (Route, Major parameter) | Value: RateWindow
+
+        self.requests = {}  # Key: Route | Value: Requests made
+        self.rate_limited = {}  # Key: Route | Value: Requests that had to wait
+        self.waited = 0.0  # Simulated seconds spent waiting on rate limits
+        self._skipped = 0.0  # Simulated seconds not actually slept
+        self._started = clock.monotonic()
+
+    def now(self):
+        """Return the simulated seconds since the HTTP layer was created"""
+        return clock.monotonic() - self._started + self._skipped
+
+    async def _wait(self, seconds):
+        self._skipped += seconds * (1 - self.time_scale)
+        await asyncio.sleep(seconds * self.time_scale)
+
+    async def request(self, route, major):
+        """Make one request on a route, waiting for its bucket and the global bucket"""
+        self.requests[route] = self.requests.get(route, 0) + 1
+        bucket = self.buckets.get((route, major))
+        if bucket is None:
+            bucket = self.buckets[(route, major)] = RateWindow(*self.limits[route])
+
+        limited = False
+        for current in (bucket, self.global_bucket):
+            while True:
+                retry_after = current.wait(self.now())
+                if not retry_after:
+                    break
+                if self.max_wait is not None and retry_after > self.max_wait:
+                    raise discord.RateLimited(retry_after)
+                limited = True
+                self.waited += retry_after
+                await self._wait(retry_after)
+        if limited:
+            self.rate_limited[route] = self.rate_limited.get(route, 0) + 1
+        observe_bucket(bucket.remaining, (bucket.reset_at - self.now()) * self.time_scale)
+        await self._wait(self.latency)
+
+    def stats(self):
+        """Return the requests made, the requests that waited and the time spent waiting, per route"""
+        return {
+            "requests": dict(sorted(self.requests.items())),
+            "rate_limited": dict(sorted(self.rate_limited.items())),
+            "waited_seconds": round(self.waited, 3),
+        }
+
+
+class SimRole:
+    """A role of a SimGuild; its members are indexed as roles are added and removed"""
+
+    def __init__(self, guild, role_id, name=None, position=0):
+        self.guild = guild
+        self.id = role_id
+        self.name = name or f"role-{role_id}"
+        self.mention = f"<@&{role_id}>"
+        self.position = position
+        self.color = self.colour = discord.Color.default()
+        self._members = {}  # Key: Member ID | Value: SimMember
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def is_default(self):
+        return self.id == self.guild.id
+
+    def __repr__(self):
+        return f"<SimRole id={self.id} name={self.name!r}>"
+
+
+class SimTextChannel:
+    """A text channel of a SimGuild"""
+
+    def __init__(self, guild, channel_id, name=None):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name or f"channel-{channel_id}"
+        self.mention = f"<#{channel_id}>"
+        self.messages = 0  # Messages sent to the channel
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.http.request("send_message", self.id)
+        self.messages += 1
+
+    def __repr__(self):
+        return f"<SimTextChannel id={self.id}>"
+
+
+class SimVoiceChannel(SimTextChannel):
+    """A voice channel of a SimGuild; its members are the members whose voice state is in it"""
+
+    def __init__(self, guild, channel_id, name=None):
+        super().__init__(guild, channel_id, name)
+        self._members = {}  # Key: Member ID | Value: SimMember
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def __repr__(self):
+        return f"<SimVoiceChannel id={self.id}>"
+
+
+class SimMember:
+    """A member of a SimGuild, with the guild's default role like every Discord member"""
+
+    def __init__(self, guild, member_id, name=None, bot=False):
+        self.guild = guild
+        self.id = member_id
+        self.name = self.display_name = name or f"member-{member_id}"
+        self.mention = f"<@{member_id}>"
+        self.bot = bot
+        self.avatar = self.display_avatar = SimpleNamespace(url="")
+        self.roles = [guild.default_role]
+        self.voice = None  # SimpleNamespace(channel=...) while in a voice channel
+        self.dm_closed = False  # Direct messages fail with discord.Forbidden
+        self.dm_messages = 0  # Direct messages received
+        self._dm_channel_id = None
+
+    def _add_role(self, role):
+        if self.id not in role._members:
+            self.roles.append(role)
+            role._members[self.id] = self
+
+    def _remove_role(self, role):
+        if role._members.pop(self.id, None) is not None:
+            self.roles.remove(role)
+
+    async def add_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.guild.http.request("member_roles", self.guild.id)
+            self._add_role(role)
+
+    async def remove_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.guild.http.request("member_roles", self.guild.id)
+            self._remove_role(role)
+
+    async def edit(self, roles=None, reason=None):
+        await self.guild.http.request("edit_member", self.guild.id)
+        if roles is not None:
+            roles = {role.id: role for role in roles if not role.is_default()}
+            for role in [role for role in self.roles[1:] if role.id not in roles]:
+                self._remove_role(role)
+            for role in roles.values():
+                self._add_role(role)
+
+    async def send(self, content=None, **kwargs):
+        if self._dm_channel_id is None:
+            await self.guild.http.request("create_dm", None)
+            self._dm_channel_id = self.id
+        await self.guild.http.request("send_message", self._dm_channel_id)
+        if self.dm_closed:
+            raise discord.Forbidden(
+                SimResponse(403, "Forbidden"), "Cannot send messages to this user"
+            )
+        self.dm_messages += 1
+
+    def __repr__(self):
+        return f"<SimMember id={self.id} name={self.name!r}>"
+
+
+class SimScheduledEvent:
+    """A scheduled event of a SimGuild"""
+
+    def __init__(self, guild, event_id, name, channel=None):
+        self.guild = guild
+        self.id = event_id
+        self.name = name
+        self.channel = channel
+        self.status = EventStatus.scheduled
+
+
+class SimGuild:
+    """
+    An in-memory guild with the attributes and coroutines the bot's handlers
+    use on discord.Guild. Lookups are by ID; members, roles and channels
+    can also be created on first mention (as replays need).
+    """
+
+    def __init__(self, guild_id, http=None):
+        self.id = guild_id
+        self.name = f"guild-{guild_id}"
+        self.http = http or FakeHTTP()
+        self.icon = SimpleNamespace(url="")
+        self.default_role = SimRole(self, guild_id, "@everyone")
+        self.members = {}  # Key: Member ID | Value: SimMember
+        self.channels = {}  # Key: Channel ID | Value: SimTextChannel or SimVoiceChannel
+        self.roles = {guild_id: self.default_role}  # Key: Role ID | Value: SimRole
+        self.scheduled_events = []
+
+    @property
+    def member_count(self):
+        return len(self.members)
+
+    def add_member(self, member_id, name=None, bot=False):
+        member = self.members[member_id] = SimMember(self, member_id, name, bot)
+        return member
+
+    def add_role(self, role_id, name=None, position=None):
+        position = len(self.roles) if position is None else position
+        role = self.roles[role_id] = SimRole(self, role_id, name, position)
+        return role
+
+    def add_text_channel(self, channel_id, name=None):
+        channel = self.channels[channel_id] = SimTextChannel(self, channel_id, name)
+        return channel
+
+    def add_voice_channel(self, channel_id, name=None):
+        channel = self.channels[channel_id] = SimVoiceChannel(self, channel_id, name)
+        return channel
+
+    def add_scheduled_event(self, event_id, name, channel=None):
+        event = SimScheduledEvent(self, event_id, name, channel)
+        self.scheduled_events.append(event)
+        return event
+
+    def member(self, member_id, bot=False):
+        """Return a member, adding it the first time it is mentioned"""
+        return self.members.get(member_id) or self.add_member(member_id, bot=bot)
+
+    def role(self, role_id):
+        """Return a role, adding it the first time it is mentioned"""
+        return self.roles.get(role_id) or self.add_role(role_id)
+
+    def channel(self, channel_id):
+        """Return a voice channel, adding it the first time it is mentioned (None for None)"""
+        if channel_id is None:
+            return None
+        return self.channels.get(channel_id) or self.add_voice_channel(channel_id)
+
+    def move_member(self, member, channel):
+        """Put a member in a voice channel (None to disconnect) and return the (before, after) voice states"""
+        before = member.voice or SimpleNamespace(channel=None)
+        if before.channel is not None:
+            before.channel._members.pop(member.id, None)
+        member.voice = SimpleNamespace(channel=channel) if channel is not None else None
+        if channel is not None:
+            channel._members[member.id] = member
+        return before, SimpleNamespace(channel=channel)
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+    def get_role(self, role_id):
+        return self.roles.get(role_id)
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+    async def fetch_member(self, member_id):
+        await self.http.request("get_member", self.id)
+        member = self.members.get(member_id)
+        if member is None:
+            raise discord.NotFound(SimResponse(404, "Not Found"), "Unknown Member")
+        return member
+
+
+class SimContext:
+    """The parts of a command context the command callbacks use"""
+
+    def __init__(self, guild, author, channel, command=None):
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+        self.command = command
+        self.message = SimpleNamespace(
+            author=author, channel=channel, guild=guild, jump_url="", content=""
+        )
+
+    async def send(self, content=None, **kwargs):
+        await self.channel.send(content, **kwargs)
+
+
+class Simulator:
+    """
+    A simulated guild and the gateway events that change it. Handlers are
+    registered with listen() and awaited in order as each event is
+    dispatched, the same way the bot's listeners receive them.
+    """
+
+    def __init__(self, guild_id, http=None):
+        self.guild = SimGuild(guild_id, http)
+        self.http = self.guild.http
+        self.listeners = {}  # Key: Event name | Value: Coroutine functions
+
+    def listen(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    async def dispatch(self, event, *args):
+        for handler in self.listeners.get(event, []):
+            await handler(*args)
+
+    def populate(self, config, members=1000, voice_channels=3):
+        """Add the configuration's roles and log channel, `members` members and `voice_channels` voice channels"""
+        from replay import CONFIGURED_IDS
+
+        for position, name in enumerate(CONFIGURED_IDS, start=1):
+            if name.endswith("_role_id"):
+                self.guild.add_role(getattr(config, name), name[: -len("_role_id")], position)
+        self.guild.add_text_channel(config.log_channel_id, "logs")
+        for i in range(voice_channels):
+            self.guild.add_voice_channel(FIRST_CHANNEL_ID + i, f"voice-{i}")
+        for i in range(members):
+            self.guild.add_member(FIRST_MEMBER_ID + i)
+        return self
+
+    def voice_channels(self):
+        return [c for c in self.guild.channels.values() if isinstance(c, SimVoiceChannel)]
+
+    async def move(self, member, channel):
+        """Move a member to a voice channel (None to disconnect) and dispatch voice_state_update"""
+        before, after = self.guild.move_member(member, channel)
+        await self.dispatch("voice_state_update", member, before, after)
+
+    async def set_event_status(self, event, status):
+        """Change a scheduled event's status and dispatch scheduled_event_update"""
+        before = SimScheduledEvent(self.guild, event.id, event.name, event.channel)
+        before.status = event.status
+        event.status = status
+        await self.dispatch("scheduled_event_update", before, event)
+
+    def context(self, author, channel=None, command=None):
+        """Return a command context for a message by `author` in `channel` (the first text channel by default)"""
+        if channel is None:
+            channel = next(
+                c for c in self.guild.channels.values() if not isinstance(c, SimVoiceChannel)
+            )
+        return SimContext(self.guild, author, channel, command)
+
+    async def fetch_user(self, user_id):
+        await self.http.request("get_user", None)
+        member = self.guild.members.get(user_id)
+        if member is None:
+            raise discord.NotFound(SimResponse(404, "Not Found"), "Unknown User")
+        return member
+
+    @contextlib.contextmanager
+    def attached(self, bot):
+        """Serve the bot's guild and user lookups from the simulator inside a with block"""
+        patched = {"get_guild": lambda guild_id: self.guild, "fetch_user": self.fetch_user}
+        for name, function in patched.items():
+            setattr(bot, name, function)
+        try:
+            yield self
+        finally:
+            for name in patched:
+                delattr(bot, name)
+
+
+async def bench_event_start(sim, partition, members):
+    """Fill an event voice channel with members, then start the event and move them out and back"""
+    channel = sim.voice_channels()[0]
+    for member in list(sim.guild.members.values())[:members]:
+        sim.guild.move_member(member, channel)
+    event = sim.guild.add_scheduled_event(1, "Simulated Event", channel)
+    await sim.set_event_status(event, EventStatus.active)
+    other = sim.voice_channels()[1]
+    for member in channel.members:
+        await sim.move(member, other)
+    for member in other.members:
+        await sim.move(member, channel)
+    await partition.voice_events.drain()
+    await sim.set_event_status(event, EventStatus.ended)
+    await partition.voice_events.stop()
+
+
+async def bench_update_roles(sim, partition, members, captain):
+    """Give members flight time and last month's roles, then run !update_roles"""
+    from monthly_roles import update_roles
+
+    ranks = list(partition.config.roles)
+    for i, member in enumerate(list(sim.guild.members.values())[:members]):
+        partition.flight_hours.adjust_flight_time(member.id, (i * 37) % 2400)
+        member._add_role(sim.guild.roles[ranks[i % len(ranks)]])
+    await update_roles.callback(sim.context(captain))
+
+
+async def bench_checkin(sim, partition, members):
+    """Open check-in with enough seats and gates and check members in one after another"""
+    from longhauls import checkin
+
+    attributes = partition.config.lh_mh_attributes
+    attributes["available_economy_seats"] = [f"E{i}" for i in range(members)]
+    attributes["available_gates"] = [f"G{i}" for i in range(members)]
+    partition.config.checkin_start = True
+    for member in list(sim.guild.members.values())[:members]:
+        await checkin.callback(sim.context(member))
+
+
+async def bench_leaderboard(sim, partition, members):
+    """Give members flight time and run !leaderboard"""
+    from member_commands import leaderboard
+
+    for i, member in enumerate(list(sim.guild.members.values())[:members]):
+        partition.flight_hours.adjust_flight_time(member.id, i)
+    author = next(iter(sim.guild.members.values()))
+    await leaderboard.callback(sim.context(author))
+
+
+async def run_benchmark(name, members, time_scale=0.0, latency=0.0, seed=0):
+    """Run one scenario against a fresh simulated guild and return its timing and HTTP report"""
+    # Importing the command modules registers their commands on the bot
+    import flight_logs
+    import longhauls
+    import member_commands
+    import monthly_roles
+    from bot import bot
+    from config import partitions
+    from logger import logger
+    from replay import REPLAY_GUILD_ID, replay_partition
+
+    random.seed(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        partition = replay_partition(directory, REPLAY_GUILD_ID)
+        sim = Simulator(partition.guild_id, FakeHTTP(latency=latency, time_scale=time_scale))
+        sim.populate(partition.config, members=members + 1)
+        sim.listen("voice_state_update", flight_logs.on_voice_state_update)
+        sim.listen("scheduled_event_update", flight_logs.on_scheduled_event_update)
+        captain = sim.guild.add_member(1, "captain")
+        captain._add_role(sim.guild.roles[partition.config.captain_role_id])
+
+        partitions.add(partition)
+        partition.config.guild = sim.guild
+        partition.config.log_channel = sim.guild.get_channel(partition.config.log_channel_id)
+        partition.flight_hours.writer.bind()
+        scenarios = {
+            "event_start": lambda: bench_event_start(sim, partition, members),
+            "update_roles": lambda: bench_update_roles(sim, partition, members, captain),
+            "checkin": lambda: bench_checkin(sim, partition, members),
+            "leaderboard": lambda: bench_leaderboard(sim, partition, members),
+        }
+        # FakeHTTP enforces the log channel's rate limit, so the logger sends unpaced
+        rate_limit, logger.rate_limit = logger.rate_limit, None
+        started = clock.perf_counter()
+        try:
+            with sim.attached(bot), partitions.use(partition):
+                await scenarios[name]()
+                await partition.voice_events.stop()
+                await logger.flush()
+        finally:
+            logger.rate_limit = rate_limit
+            partitions.remove(partition.guild_id)
+            partition.flight_hours.storage.close()
+        return {
+            "scenario": name,
+            "members": members,
+            "seconds": round(clock.perf_counter() - started, 3),
+            "simulated_seconds": round(sim.http.now(), 3),
+            "log_messages": partition.config.log_channel.messages,
+            "http": sim.http.stats(),
+        }
+
+
+def simulated_environment(work_dir):
+    """Return environment defaults that let the bot's modules load without a .env or /data"""
+    from replay import CONFIGURED_IDS
+
+    environment = {"DISCORD_TOKEN": "simulated", "GUILD_ID": "1"}
+    for i, name in enumerate(CONFIGURED_IDS):
+        environment[name.upper()] = str(300_000_000_000_000_000 + i)
+    for name in ("FLIGHT_DATA_DIR", "FLIGHT_BACKUP_DIR", "FLIGHT_ARCHIVE_DIR", "GUILD_CONFIG_DIR"):
+        environment[name] = os.path.join(work_dir, name.lower())
+    return environment
+
+
+def write_report(document, output):
+    """Write a JSON report to a file, or to stdout if output is "-" """
+    if output == "-":
+        json.dump(document, sys.stdout, indent=2)
+        print()
+        return
+    with open(output, "w") as file:
+        json.dump(document, file, indent=2)
+
+
+if __name__ == "__main__":
+    # Usage: python simulator.py update_roles --members 10000 [--output report.json]
+    parser = argparse.ArgumentParser(description="Benchmark the bot against a simulated guild")
+    parser.add_argument("scenario", choices=["event_start", "update_roles", "checkin", "leaderboard"])
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per simulated request")
+    parser.add_argument(
+        "--time-scale", type=float, default=0.0, help="Fraction of rate limit waits actually slept"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="Report file (- for stdout)")
+    options = parser.parse_args()
+
+    # Anything the bot prints goes to stderr, so stdout holds only the report
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(sys.stderr):
+        for key, value in simulated_environment(work_dir).items():
+            os.environ.setdefault(key, value)
+        result = asyncio.run(
+            run_benchmark(
+                options.scenario, options.members, options.time_scale, options.latency, options.seed
+            )
+        )
+    write_report(result, options.output)
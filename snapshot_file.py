@@ -0,0 +1,208 @@
+# Import Necessary Libraries
+import gzip
+import json
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime as time
+
+from backups import read_json
+
+# Header: magic, schema version, flags (unused), payload length, CRC32 of the payload
+# Version 2 added the minutes already credited for each open session
+MAGIC = b"FHSN"
+SCHEMA_VERSION = 2
+HEADER = struct.Struct("<4sHHQI")
+COUNT = struct.Struct("<I")
+NAME_LENGTH = struct.Struct("<H")
+CHUNK_SIZE = 1024 * 1024
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is damaged or of an unknown format"""
+
+
+def _little_endian(values):
+    """Return an array's bytes in little-endian order"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class _ChecksumWriter:
+    """File wrapper that tracks the length and CRC32 of everything written"""
+
+    def __init__(self, file):
+        self.file = file
+        self.length = 0
+        self.crc = 0
+
+    def write(self, data):
+        self.file.write(data)
+        self.length += len(data)
+        self.crc = zlib.crc32(data, self.crc)
+
+
+def write_snapshot(file, state):
+    """
+    Stream a state (in the form of FlightHours.snapshot_state()) to a binary
+    file opened for writing. The header is completed once the payload is written.
+    """
+    start = file.tell()
+    file.write(HEADER.pack(MAGIC, SCHEMA_VERSION, 0, 0, 0))
+    out = _ChecksumWriter(file)
+
+    # Scalar state as minified JSON
+    meta = json.dumps(
+        {
+            "seq": state.get("seq", 0),
+            "period": state.get("period"),
+            "active_event": state.get("active_event"),
+            "voice_channels": list(state.get("voice_channels", [])),
+            "active_events": state.get("active_events"),
+            "session_events": state.get("session_events", {}),
+            "heartbeat": state.get("heartbeat"),
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+    out.write(COUNT.pack(len(meta)))
+    out.write(meta)
+
+    # Flight time and open sessions as integer IDs with parallel value columns
+    flight_hours = state.get("flight_hours", {})
+    out.write(COUNT.pack(len(flight_hours)))
+    out.write(_little_endian(array("Q", map(int, flight_hours.keys()))))
+    out.write(_little_endian(array("q", map(int, flight_hours.values()))))
+
+    start_time = state.get("start_time", {})
+    accrued = state.get("accrued", {})
+    out.write(COUNT.pack(len(start_time)))
+    out.write(_little_endian(array("Q", map(int, start_time.keys()))))
+    out.write(_little_endian(array("d", start_time.values())))
+    out.write(_little_endian(array("q", (accrued.get(str(k), 0) for k in start_time))))
+
+    # Events in order, each with the IDs of its attendees
+    event_history = state.get("event_history", {})
+    out.write(COUNT.pack(len(event_history)))
+    for event_name, member_ids in event_history.items():
+        name = event_name.encode("utf-8")
+        out.write(NAME_LENGTH.pack(len(name)))
+        out.write(name)
+        out.write(COUNT.pack(len(member_ids)))
+        out.write(_little_endian(array("Q", map(int, member_ids))))
+
+    # Complete the header now that the payload length and checksum are known
+    end = file.tell()
+    file.seek(start)
+    file.write(HEADER.pack(MAGIC, SCHEMA_VERSION, 0, out.length, out.crc))
+    file.seek(end)
+
+
+def read_snapshot(file):
+    """
+    Read a snapshot from a binary file and return the state. The checksum is
+    verified before anything is decoded, so a damaged file raises SnapshotError
+    instead of returning partial state.
+    """
+    header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise SnapshotError("truncated header")
+    magic, version, _, length, crc = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise SnapshotError("not a flight hours snapshot")
+    if version > SCHEMA_VERSION:
+        raise SnapshotError(f"unsupported schema version {version}")
+
+    # Read the payload in chunks while checksumming it
+    chunks, checksum, remaining = [], 0, length
+    while remaining:
+        chunk = file.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise SnapshotError("truncated payload")
+        checksum = zlib.crc32(chunk, checksum)
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    if checksum != crc:
+        raise SnapshotError("checksum mismatch")
+
+    return _decode(memoryview(b"".join(chunks)), version)
+
+
+def _decode(payload, version):
+    offset = 0
+
+    def take(size):
+        nonlocal offset
+        data = payload[offset : offset + size]
+        offset += size
+        return data
+
+    def count():
+        return COUNT.unpack(take(COUNT.size))[0]
+
+    state = json.loads(bytes(take(count())))
+
+    members = count()
+    ids = _from_little_endian("Q", take(8 * members))
+    minutes = _from_little_endian("q", take(8 * members))
+    state["flight_hours"] = {str(k): v for k, v in zip(ids, minutes)}
+
+    sessions = count()
+    ids = _from_little_endian("Q", take(8 * sessions))
+    starts = _from_little_endian("d", take(8 * sessions))
+    state["start_time"] = {str(k): v for k, v in zip(ids, starts)}
+    accrued = _from_little_endian("q", take(8 * sessions)) if version >= 2 else []
+    state["accrued"] = {str(k): v for k, v in zip(ids, accrued) if v}
+
+    event_history = {}
+    for _ in range(count()):
+        name_length = NAME_LENGTH.unpack(take(NAME_LENGTH.size))[0]
+        event_name = bytes(take(name_length)).decode("utf-8")
+        attendees = count()
+        event_history[event_name] = [
+            str(member_id) for member_id in _from_little_endian("Q", take(8 * attendees))
+        ]
+    state["event_history"] = event_history
+    return state
+
+
+def read_state(file_path):
+    """Read a snapshot or a legacy JSON file (either may be gzip-compressed)"""
+    opener = gzip.open if file_path.endswith(".gz") else open
+    with opener(file_path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            return read_json(file_path)
+        file.seek(0)
+        return read_snapshot(file)
+
+
+def convert(json_path, snapshot_path):
+    """Convert a legacy JSON flight hours file to a snapshot"""
+    state = read_json(json_path)
+
+    # Legacy files stored session starts as ISO strings
+    state["start_time"] = {
+        member_id: (
+            start if isinstance(start, (int, float)) else time.fromisoformat(start).timestamp()
+        )
+        for member_id, start in state.get("start_time", {}).items()
+    }
+    with open(snapshot_path, "wb") as file:
+        write_snapshot(file, state)
+    return state
+
+
+if __name__ == "__main__":
+    # Usage: python snapshot_file.py current.json current.snap
+    convert(sys.argv[1], sys.argv[2])
+    print(f"Converted {sys.argv[1]} to {sys.argv[2]}")
@@ -0,0 +1,121 @@
+# Import Necessary Libraries
+import asyncio
+import concurrent.futures
+import functools
+import threading
+
+
+class SingleWriter:
+    """
+    Confines every FlightHours mutation to one thread: the bot's event loop.
+    Coroutines already run there one at a time, so they mutate directly and
+    without locks; calls from worker threads are handed to the loop and wait
+    for their result, so they can never interleave with a mutation.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread_id = None
+
+    def bind(self):
+        """Make the running event loop the writer (call from a coroutine)"""
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+
+    def call(self, function):
+        """Run function on the writer and return its result"""
+        loop = self.loop
+        if (
+            loop is None
+            or not loop.is_running()
+            or threading.get_ident() == self.thread_id
+        ):
+            return function()
+
+        future = concurrent.futures.Future()
+
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function())
+                except BaseException as e:
+                    future.set_exception(e)
+
+        loop.call_soon_threadsafe(run)
+        return future.result()
+
+
+def on_writer(method):
+    """Decorator that runs a method on the instance's SingleWriter"""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.writer.call(functools.partial(method, self, *args, **kwargs))
+
+    return wrapper
+
+
+class StateSnapshot:
+    """
+    Immutable copy of the flight hours at one version (the sequence number
+    of the last applied record), taken when storage checkpoints. It holds
+    private copies of the member and attendance columns, so a worker thread
+    can serialize it while the writer keeps going.
+    """
+
+    __slots__ = (
+        "version",
+        "period",
+        "events",
+        "session_events",
+        "members",
+        "attendance",
+        "heartbeat",
+    )
+
+    def __init__(
+        self, version, period, events, session_events, members, attendance, heartbeat=None
+    ):
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "period", period)
+        # Active events in the order they started, each with its channel IDs
+        object.__setattr__(
+            self, "events", {name: tuple(ids) for name, ids in events.items()}
+        )
+        object.__setattr__(self, "session_events", dict(session_events))
+        object.__setattr__(self, "members", members)
+        object.__setattr__(self, "attendance", attendance)
+        object.__setattr__(self, "heartbeat", heartbeat)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StateSnapshot is immutable")
+
+    @property
+    def active_event(self):
+        """The most recently started active event"""
+        return next(reversed(self.events), None)
+
+    @property
+    def voice_channels(self):
+        """The channel IDs tracked for any active event"""
+        return tuple(channel_id for ids in self.events.values() for channel_id in ids)
+
+    def minutes(self, member_id):
+        """Return a member's flight time in minutes"""
+        return self.members.minutes(member_id)
+
+    def to_dict(self):
+        """Return the state in a JSON-compatible form"""
+        return {
+            "seq": self.version,
+            "period": self.period,
+            "active_event": self.active_event,
+            "voice_channels": list(self.voice_channels),
+            "active_events": {name: list(ids) for name, ids in self.events.items()},
+            "session_events": {str(k): v for k, v in self.session_events.items()},
+            "flight_hours": {str(k): v for k, v in self.members.minutes_items()},
+            "start_time": {str(k): v for k, v in self.members.session_items()},
+            "accrued": {str(k): v for k, v in self.members.accrued_items()},
+            "heartbeat": self.heartbeat,
+            "event_history": self.attendance.to_dict(),
+        }
@@ -0,0 +1,669 @@
+# Import Necessary Libraries
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from functools import partial
+
+from backups import recover, rotate, sqlite_intact
+from journal import SessionJournal
+from snapshot_file import read_state, write_snapshot
+
+# Forwarded to the bot's logger once it is loaded
+log = logging.getLogger("eventsbot.storage")
+
+
+class StorageBackend:
+    """
+    Interface shared by the flight hour storage engines. FlightHours keeps
+    the current month in memory (and answers queries from it) and hands every
+    mutation record to its backend.
+    """
+
+    path = None
+
+    def load(self, manager):
+        """Restore the manager's state from storage"""
+        raise NotImplementedError
+
+    def append(self, record):
+        """Accept a mutation record (durable after the next write)"""
+        raise NotImplementedError
+
+    def write(self, manager):
+        """Make every accepted record durable"""
+        raise NotImplementedError
+
+    def checkpoint(self, manager):
+        """Persist the manager's full state in place of the accepted records"""
+        raise NotImplementedError
+
+    def backup(self, backup_path):
+        """Write a consistent copy of the stored data to backup_path"""
+        raise NotImplementedError
+
+    def load_core(self, manager):
+        """
+        Restore what is needed to resume logging and return a callable that reads
+        the full state (in the form of FlightHours.snapshot_state()) from any thread,
+        or None if everything was restored already
+        """
+        self.load(manager)
+        return None
+
+    def close(self):
+        pass
+
+
+class JSONStorage(StorageBackend):
+    """Compact checksummed snapshot plus an append-only JSON journal of the records written after it"""
+
+    def __init__(self, path="/data/flight_hours/current.snap", backups=None):
+        self.path = path
+        self.journal_path = f"{os.path.splitext(path)[0]}.journal"
+        self.legacy_path = f"{os.path.splitext(path)[0]}.json"  # Pretty-printed JSON snapshot of older versions
+        self.compact_threshold = 1024 * 1024  # Journal size (bytes) before compaction
+        self.backups = backups  # BackupManager with snapshots to recover from
+        self.manager = None
+
+        self._journal = None
+        self._io_lock = threading.Lock()
+        self._snapshot_version = -1  # Version of the last snapshot written
+
+    def load(self, manager):
+        """Load the latest snapshot and replay the journal written after it"""
+        self.manager = manager
+
+        # Use the first intact copy: the snapshot, its previous version, the backups,
+        # then a JSON snapshot of an older version (converted by the next checkpoint)
+        candidates = [self.path, f"{self.path}.backup"]
+        if self.backups is not None:
+            candidates += self.backups.snapshots(os.path.splitext(self.path)[1])
+        if self.legacy_path != self.path:
+            candidates.append(self.legacy_path)
+        source, data = recover(candidates, read_state)
+        if source != self.path and os.path.exists(self.path):
+            # Set the damaged snapshot aside so it never replaces a good backup
+            os.replace(self.path, f"{self.path}.corrupt")
+            if source is None:
+                log.error("No intact copy of the flight hours, initializing with empty data")
+        if source is not None and source != self.path:
+            log.warning(f"Restored flight hours from {source}")
+        manager.restore_state(data or {})
+
+        # Replay every record the snapshot does not already include
+        journal = SessionJournal(self.journal_path)
+        replayed = 0
+        for record in journal.replay():
+            if record.get("seq", 0) <= manager.seq:
+                continue
+            manager.apply_record(record)
+            replayed += 1
+
+        # Fold replayed records into a fresh snapshot so a torn tail is never appended to
+        self._journal = journal
+        if replayed or source != self.path:
+            self.checkpoint(manager)
+        else:
+            self._journal.truncate()
+
+    def append(self, record):
+        # Records made before the first load or write are covered by its snapshot
+        if self._journal is not None:
+            self._journal.append(record)
+
+    def write(self, manager):
+        """Commit journaled records, compacting into a snapshot once the journal grows"""
+        self.manager = manager
+        with self._io_lock:
+            # Group commit the records appended since the last write
+            if self._journal is not None and self._journal.size < self.compact_threshold:
+                self._journal.commit()
+                return
+
+        # Otherwise fold the journal into a fresh snapshot
+        self.checkpoint(manager)
+
+    def checkpoint(self, manager):
+        """Write a full snapshot and truncate the journal it supersedes"""
+        self.manager = manager
+
+        # Capture on the writer before taking the I/O lock so the writer is never waited on with it held
+        snapshot = manager.writer.call(partial(self._prepare_snapshot, manager))
+        data = snapshot.to_dict()
+
+        with self._io_lock:
+            # A newer snapshot was written (and the journal restarted after it) in the meantime
+            if snapshot.version < self._snapshot_version:
+                return
+            self._write_snapshot(data)
+            self._snapshot_version = snapshot.version
+            self._journal.commit(force=True)
+
+    def backup(self, backup_path):
+        """Copy a complete snapshot to backup_path"""
+        # Fold the journal into the snapshot so the backup is complete
+        if self.manager is not None:
+            self.checkpoint(self.manager)
+        if not os.path.exists(self.path):
+            return None
+        shutil.copy2(self.path, backup_path)
+        return backup_path
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+
+    def _prepare_snapshot(self, manager):
+        """Capture the state for a snapshot and restart the journal after it (on the writer)"""
+        snapshot = manager.snapshot()
+
+        # Records appended from now on are not in the snapshot and stay journaled
+        if self._journal is None:
+            self._journal = SessionJournal(self.journal_path)
+        self._journal.reset()
+        return snapshot
+
+    def _write_snapshot(self, data):
+        """Save flight hours with atomic write and backup"""
+        # Keep the previous snapshot as the backup
+        rotate(self.path)
+
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # Atomic write using temporary file
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=os.path.dirname(self.path), delete=False
+            ) as temp_file:
+                write_snapshot(temp_file, data)
+                temp_path = temp_file.name
+
+            # Atomic move
+            shutil.move(temp_path, self.path)
+
+        except Exception as e:
+            # Clean up temp file if it exists
+            if "temp_path" in locals() and os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise e
+
+
+class SQLiteStorage(StorageBackend):
+    """WAL-mode SQLite database with indexed members, sessions, events and attendance"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS members (
+            member_id INTEGER PRIMARY KEY,
+            minutes INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS members_minutes ON members (minutes DESC);
+
+        CREATE TABLE IF NOT EXISTS sessions (
+            member_id INTEGER PRIMARY KEY,
+            start REAL NOT NULL,
+            accrued INTEGER NOT NULL DEFAULT 0,
+            event TEXT
+        );
+
+        CREATE TABLE IF NOT EXISTS events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        );
+
+        CREATE TABLE IF NOT EXISTS attendance (
+            event_id INTEGER NOT NULL REFERENCES events (event_id) ON DELETE CASCADE,
+            member_id INTEGER NOT NULL,
+            PRIMARY KEY (event_id, member_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS attendance_member ON attendance (member_id, event_id);
+
+        CREATE TABLE IF NOT EXISTS state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    # Moving the start of an open session keeps the minutes already credited for it
+    START_SESSION = (
+        "INSERT INTO sessions (member_id, start, event) VALUES (?, ?, ?) "
+        "ON CONFLICT (member_id) DO UPDATE SET start = excluded.start, "
+        "event = COALESCE(excluded.event, sessions.event)"
+    )
+
+    def __init__(
+        self, path="/data/flight_hours/flight_hours.db", legacy_path=None, backups=None
+    ):
+        self.path = path
+        self.legacy_path = legacy_path  # JSON snapshot to import on first start
+        self.backups = backups  # BackupManager with snapshots to recover from
+        self.manager = None
+
+        self._conn = None
+        self._pending = []  # Records accepted but not yet executed
+        self._pending_lock = threading.Lock()
+        self._conn_lock = threading.RLock()
+
+    def _connect(self):
+        if self._conn is not None:
+            return self._conn
+
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # Replace a damaged database with the newest intact backup
+        if os.path.exists(self.path) and not sqlite_intact(self.path):
+            self._recover()
+
+        # Commits happen in the persistence worker thread, queries on the event loop
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+
+        # Databases created before session checkpoints have no accrued column,
+        # and those created before concurrent events no event column
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")]
+        if "accrued" not in columns:
+            self._conn.execute(
+                "ALTER TABLE sessions ADD COLUMN accrued INTEGER NOT NULL DEFAULT 0"
+            )
+        if "event" not in columns:
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN event TEXT")
+            self._conn.execute(
+                "UPDATE sessions SET event = ?", (self._get_state("active_event", None),)
+            )
+        return self._conn
+
+    def load(self, manager):
+        """Restore the current month from the database (importing JSON on first start)"""
+        self.manager = manager
+        with self._conn_lock:
+            if self._import_legacy(manager):
+                return
+            manager.restore_state(self._read_state())
+
+    def load_core(self, manager):
+        """Restore only the active event, voice channels and open sessions"""
+        self.manager = manager
+        with self._conn_lock:
+            if self._import_legacy(manager):
+                return None
+            self._drain()  # Records accepted but not yet committed are part of the state
+            conn = self._connect()
+            state = dict(conn.execute("SELECT key, value FROM state"))
+            manager.restore_state(
+                {
+                    "seq": int(state.get("seq", 0)),
+                    "period": json.loads(state.get("period", "null")),
+                    "active_event": json.loads(state.get("active_event", "null")),
+                    "voice_channels": json.loads(state.get("voice_channels", "[]")),
+                    "active_events": self._get_events(),
+                    "heartbeat": json.loads(state.get("heartbeat", "null")),
+                    **self._read_sessions(),
+                }
+            )
+        return self.load_history
+
+    def load_history(self):
+        """Read the full state, including flight time and attendance (any thread)"""
+        with self._conn_lock:
+            return self._read_state()
+
+    def _import_legacy(self, manager):
+        """Import the JSON snapshot and journal on first start and return whether it did (connection lock held)"""
+        conn = self._connect()
+        if conn.execute("SELECT value FROM state WHERE key = 'seq'").fetchone():
+            return False
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            legacy = JSONStorage(self.legacy_path)
+            legacy.load(manager)
+            legacy.close()
+        self.checkpoint(manager)
+        return True
+
+    def _read_state(self):
+        """Read the whole state in the form of FlightHours.snapshot_state() (connection lock held)"""
+        self._drain()
+        conn = self._connect()
+        state = dict(conn.execute("SELECT key, value FROM state"))
+        events = conn.execute(
+            "SELECT event_id, name FROM events ORDER BY event_id"
+        ).fetchall()
+        event_names = {event_id: name for event_id, name in events}
+        event_history = {name: [] for _, name in events}
+        for event_id, member_id in conn.execute(
+            "SELECT event_id, member_id FROM attendance"
+        ):
+            event_history[event_names[event_id]].append(str(member_id))
+
+        return {
+            "seq": int(state.get("seq", 0)),
+            "period": json.loads(state.get("period", "null")),
+            "active_event": json.loads(state.get("active_event", "null")),
+            "voice_channels": json.loads(state.get("voice_channels", "[]")),
+            "active_events": self._get_events(),
+            "heartbeat": json.loads(state.get("heartbeat", "null")),
+            "flight_hours": {
+                str(member_id): minutes
+                for member_id, minutes in conn.execute(
+                    "SELECT member_id, minutes FROM members"
+                )
+            },
+            **self._read_sessions(),
+            "event_history": event_history,
+        }
+
+    def _read_sessions(self):
+        """Read the open sessions as start_time, accrued and session_events (connection lock held)"""
+        sessions = self._connect().execute(
+            "SELECT member_id, start, accrued, event FROM sessions"
+        ).fetchall()
+        return {
+            "start_time": {str(member_id): start for member_id, start, _, _ in sessions},
+            "accrued": {
+                str(member_id): accrued for member_id, _, accrued, _ in sessions if accrued
+            },
+            "session_events": {
+                str(member_id): event for member_id, _, _, event in sessions if event
+            },
+        }
+
+    def append(self, record):
+        with self._pending_lock:
+            self._pending.append(record)
+
+    def write(self, manager):
+        """Execute the accepted records and commit them in a single transaction"""
+        self.manager = manager
+        with self._conn_lock:
+            self._drain()
+
+    def checkpoint(self, manager):
+        """Replace every table with the manager's full state"""
+        self.manager = manager
+
+        # Take the snapshot before the connection lock so the writer is never waited on with it held
+        snapshot = manager.snapshot()
+        data = snapshot.to_dict()
+
+        with self._conn_lock:
+            conn = self._connect()
+
+            # Records drained since the snapshot already moved the database past it
+            if self._get_state("seq", -1) > snapshot.version:
+                self._drain()
+                return
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("attendance", "events", "sessions", "members", "state"):
+                    conn.execute(f"DELETE FROM {table}")
+                conn.executemany(
+                    "INSERT INTO members (member_id, minutes) VALUES (?, ?)",
+                    ((int(k), v) for k, v in data["flight_hours"].items()),
+                )
+                conn.executemany(
+                    "INSERT INTO sessions (member_id, start, accrued, event) VALUES (?, ?, ?, ?)",
+                    (
+                        (int(k), v, data["accrued"].get(k, 0), data["session_events"].get(k))
+                        for k, v in data["start_time"].items()
+                    ),
+                )
+                for event_name, member_ids in data["event_history"].items():
+                    event_id = conn.execute(
+                        "INSERT INTO events (name) VALUES (?)", (event_name,)
+                    ).lastrowid
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO attendance (event_id, member_id) VALUES (?, ?)",
+                        ((event_id, int(member_id)) for member_id in member_ids),
+                    )
+                self._set_state("seq", data["seq"])
+                self._set_state("period", data["period"])
+                self._set_events(data["active_events"])
+                self._set_state("heartbeat", data["heartbeat"])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            # Keep only the records made after the snapshot
+            with self._pending_lock:
+                self._pending = [r for r in self._pending if r["seq"] > snapshot.version]
+            self._drain()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _recover(self):
+        """Set a damaged database aside and restore the newest intact backup"""
+        log.error(f"{self.path} failed its integrity check")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.replace(self.path + suffix, f"{self.path}{suffix}.corrupt")
+        if self.backups is not None:
+            source = self.backups.restore_latest(self.path, ".db", sqlite_intact)
+            if source is not None:
+                log.warning(f"Restored flight hours from {source}")
+
+    def backup(self, backup_path):
+        """Copy a consistent image of the database to backup_path"""
+        with self._conn_lock:
+            self._drain()
+            target = sqlite3.connect(backup_path)
+            try:
+                self._connect().backup(target)
+            finally:
+                target.close()
+        return backup_path
+
+    def close(self):
+        with self._conn_lock:
+            if self._conn is not None:
+                self._drain()
+                self._conn.close()
+                self._conn = None
+
+    def _drain(self):
+        """Execute and commit every pending record (connection lock held)"""
+        with self._pending_lock:
+            records, self._pending = self._pending, []
+        if not records:
+            return
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record in records:
+                self._execute(record)
+            self._set_state("seq", records[-1]["seq"])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            with self._pending_lock:
+                self._pending = records + self._pending
+            raise
+
+    def _set_state(self, key, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+            (key, json.dumps(value)),
+        )
+
+    def _get_state(self, key, default):
+        row = self._conn.execute(
+            "SELECT value FROM state WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _get_events(self):
+        """Return {active event: [channel IDs]} (older databases stored one event)"""
+        events = self._get_state("active_events", None)
+        if events is None:
+            active_event = self._get_state("active_event", None)
+            events = {active_event: self._get_state("voice_channels", [])} if active_event else {}
+        return events
+
+    def _set_events(self, events):
+        """Store the active events (and the latest one and every channel, as older versions did)"""
+        self._set_state("active_events", events)
+        self._set_state("active_event", next(reversed(events), None))
+        self._set_state("voice_channels", [c for ids in events.values() for c in ids])
+
+    def _session_event(self, record):
+        """Return the event a session record belongs to (the latest event if it names none)"""
+        return record.get("ev") or next(reversed(self._get_events()), None)
+
+    def _event_id(self, event_name):
+        self._conn.execute(
+            "INSERT OR IGNORE INTO events (name) VALUES (?)", (event_name,)
+        )
+        return self._conn.execute(
+            "SELECT event_id FROM events WHERE name = ?", (event_name,)
+        ).fetchone()[0]
+
+    def _execute(self, record):
+        """Translate a single mutation record into SQL"""
+        conn = self._conn
+        op = record["op"]
+
+        if op == "start":
+            conn.execute(
+                self.START_SESSION, (int(record["m"]), record["t"], self._session_event(record))
+            )
+
+        elif op == "start_many":
+            event_name = self._session_event(record)
+            conn.executemany(
+                self.START_SESSION,
+                [(int(member_id), record["t"], event_name) for member_id in record["ms"]],
+            )
+
+        elif op == "end":
+            member_id = int(record["m"])
+            conn.execute(
+                "INSERT INTO members (member_id, minutes) VALUES (?, ?) "
+                "ON CONFLICT (member_id) DO UPDATE SET minutes = minutes + excluded.minutes",
+                (member_id, record["min"]),
+            )
+            conn.execute("DELETE FROM sessions WHERE member_id = ?", (member_id,))
+            if record.get("ev") is not None:
+                conn.execute(
+                    "INSERT OR IGNORE INTO attendance (event_id, member_id) VALUES (?, ?)",
+                    (self._event_id(record["ev"]), member_id),
+                )
+
+        elif op == "end_many":
+            for member_id, minutes, event_name in record["ends"]:
+                self._execute({"op": "end", "m": member_id, "min": minutes, "ev": event_name})
+
+        elif op == "accrue":
+            conn.executemany(
+                "INSERT INTO members (member_id, minutes) VALUES (?, ?) "
+                "ON CONFLICT (member_id) DO UPDATE SET minutes = minutes + excluded.minutes",
+                [(int(member_id), minutes) for member_id, minutes in record["ac"]],
+            )
+            conn.executemany(
+                "UPDATE sessions SET accrued = accrued + ? WHERE member_id = ?",
+                [(minutes, int(member_id)) for member_id, minutes in record["ac"]],
+            )
+            self._set_state("heartbeat", record["hb"])
+
+        elif op == "adjust":
+            conn.execute(
+                "INSERT INTO members (member_id, minutes) VALUES (?, MAX(?, 0)) "
+                "ON CONFLICT (member_id) DO UPDATE SET minutes = MAX(minutes + ?, 0)",
+                (int(record["m"]), record["min"], record["min"]),
+            )
+
+        elif op == "attend":
+            conn.execute(
+                "INSERT OR IGNORE INTO attendance (event_id, member_id) VALUES (?, ?)",
+                (self._event_id(record["ev"]), int(record["m"])),
+            )
+
+        elif op == "unattend":
+            conn.execute(
+                "DELETE FROM attendance WHERE member_id = ? AND event_id = "
+                "(SELECT event_id FROM events WHERE name = ?)",
+                (int(record["m"]), record["ev"]),
+            )
+
+        elif op == "add_event":
+            self._event_id(record["ev"])
+
+        elif op == "remove_event":
+            conn.execute("DELETE FROM events WHERE name = ?", (record["ev"],))
+
+        elif op == "start_event":
+            event_id = self._event_id(record["ev"])
+            conn.execute("DELETE FROM attendance WHERE event_id = ?", (event_id,))
+            events = self._get_events()
+            events.setdefault(record["ev"], [])
+            for channel_id in record.get("vc", []):
+                self._move_channel(events, record["ev"], channel_id)
+            self._set_events(events)
+
+        elif op == "end_event":
+            # Records written before concurrent events ended every event
+            events = self._get_events()
+            if record.get("ev") is not None:
+                events.pop(record["ev"], None)
+                conn.execute("DELETE FROM sessions WHERE event = ?", (record["ev"],))
+            else:
+                events = {}
+            if not events:
+                conn.execute("DELETE FROM sessions")
+            self._set_events(events)
+
+        elif op == "vc_add":
+            events = self._get_events()
+            event_name = record.get("ev") or next(reversed(events), None)
+            if event_name in events:
+                self._move_channel(events, event_name, record["c"])
+                self._set_events(events)
+
+        elif op == "vc_remove":
+            self._set_events(
+                {
+                    name: [c for c in channel_ids if c != record["c"]]
+                    for name, channel_ids in self._get_events().items()
+                }
+            )
+
+        elif op == "clear":
+            for table in ("attendance", "events", "sessions", "members"):
+                conn.execute(f"DELETE FROM {table}")
+            self._set_state("period", record.get("period"))
+
+    @staticmethod
+    def _move_channel(events, event_name, channel_id):
+        """Route a channel to an event in {event: [channel IDs]}, taking it from any other"""
+        for channel_ids in events.values():
+            if channel_id in channel_ids:
+                channel_ids.remove(channel_id)
+        events[event_name].append(channel_id)
+
+    def _query(self, sql, params=()):
+        """Run a read query that also sees records not yet committed (for inspection, not commands)"""
+        with self._conn_lock:
+            self._drain()
+            return self._connect().execute(sql, params).fetchall()
+
+
+def create_storage(data_dir=None, backups=None):
+    """Create the storage backend selected by the FLIGHT_STORAGE environment variable"""
+    data_dir = data_dir or os.getenv("FLIGHT_DATA_DIR", "/data/flight_hours")
+    snapshot_path = os.path.join(data_dir, "current.snap")
+
+    backend = os.getenv("FLIGHT_STORAGE", "sqlite").lower()
+    if backend == "json":
+        return JSONStorage(snapshot_path, backups)
+    if backend == "sqlite":
+        return SQLiteStorage(os.path.join(data_dir, "flight_hours.db"), snapshot_path, backups)
+    raise ValueError(f"Unknown FLIGHT_STORAGE backend: {backend}")
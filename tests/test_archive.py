@@ -0,0 +1,150 @@
+"""
+Tests for archive.py module and period sealing in FlightHours.
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from archive import MonthlyArchive
+from config import FlightHours
+from storage import JSONStorage
+
+
+def make_state(period, flight_hours, event_history):
+    """Build a state dictionary as returned by FlightHours.snapshot_state()."""
+    return {
+        "period": period,
+        "flight_hours": flight_hours,
+        "event_history": {name: sorted(ids) for name, ids in event_history.items()},
+    }
+
+
+class TestMonthlyArchive:
+    """Test cases for MonthlyArchive class."""
+
+    @pytest.fixture
+    def archive(self, tmp_path):
+        """Create an archive in a temporary directory."""
+        return MonthlyArchive(str(tmp_path / "archive"))
+
+    def test_seal_and_read(self, archive):
+        """Test that a sealed period can be read back."""
+        partition_id = archive.seal(
+            make_state("2025-01", {"111": 90, "222": 30}, {"Event A": {"111", "333"}})
+        )
+
+        assert partition_id == "2025-01"
+        partition = archive.read(partition_id)
+        assert partition["members"] == [111, 222, 333]
+        assert partition["minutes"] == [90, 30, 0]
+        assert partition["events"] == ["Event A"]
+        assert partition["attendance"] == [[0, 2]]
+
+    def test_partitions_are_compressed(self, archive):
+        """Test that partitions are written as gzip files."""
+        archive.seal(make_state("2025-01", {"111": 90}, {}))
+
+        with open(os.path.join(archive.root, "2025-01.json.gz"), "rb") as file:
+            assert file.read(2) == b"\x1f\x8b"
+
+    def test_resealing_a_period_adds_a_partition(self, archive):
+        """Test that sealing the same period twice never overwrites a partition."""
+        assert archive.seal(make_state("2025-01", {"111": 90}, {})) == "2025-01"
+        assert archive.seal(make_state("2025-01", {"111": 15}, {})) == "2025-01.2"
+
+        assert archive.periods() == ["2025-01"]
+        assert archive.member_minutes(111) == {"2025-01": 105}
+
+    def test_member_queries(self, archive):
+        """Test the per-member history across periods."""
+        archive.seal(make_state("2025-01", {"111": 90}, {"Event A": {"111"}}))
+        archive.seal(make_state("2025-02", {"222": 60}, {"Event B": {"222"}}))
+        archive.seal(make_state("2025-03", {"111": 45}, {"Event C": {"111", "222"}}))
+
+        assert archive.member_minutes(111) == {"2025-01": 90, "2025-03": 45}
+        assert archive.member_events("222") == {"2025-02": ["Event B"], "2025-03": ["Event C"]}
+        assert archive.member_minutes(999) == {}
+
+    def test_member_queries_only_read_their_partitions(self, archive, monkeypatch):
+        """Test that the index limits which partitions are decoded."""
+        archive.seal(make_state("2025-01", {"111": 90}, {}))
+        archive.seal(make_state("2025-02", {"222": 60}, {}))
+        archive._cache.clear()
+
+        read = []
+        original_read = archive.read
+        monkeypatch.setattr(archive, "read", lambda pid: read.append(pid) or original_read(pid))
+
+        archive.member_minutes(222)
+        assert read == ["2025-02"]
+
+    def test_period_summary(self, archive):
+        """Test the leaderboard and event attendance of a period."""
+        archive.seal(
+            make_state(
+                "2025-01",
+                {"111": 30, "222": 90, "333": 60},
+                {"Event A": {"111", "222"}, "Event B": {"333"}},
+            )
+        )
+
+        summary = archive.period_summary("2025-01", limit=2)
+        assert summary["members"] == 3
+        assert summary["minutes"] == 180
+        assert summary["top_members"] == [("222", 90), ("333", 60)]
+        assert summary["events"] == {"Event A": 2, "Event B": 1}
+
+    def test_index_survives_reload(self, archive):
+        """Test that a new archive instance reads the persisted index."""
+        archive.seal(make_state("2025-01", {"111": 90}, {}))
+
+        reloaded = MonthlyArchive(archive.root)
+        assert reloaded.periods() == ["2025-01"]
+        assert reloaded.member_minutes(111) == {"2025-01": 90}
+
+
+class TestFlightHoursSealPeriod:
+    """Test cases for archiving and clearing FlightHours."""
+
+    @pytest.mark.asyncio
+    async def test_seal_period(self, tmp_path):
+        """Test that sealing archives the month and then clears it."""
+        archive = MonthlyArchive(str(tmp_path / "archive"))
+        manager = FlightHours(JSONStorage(str(tmp_path / "current.snap")))
+        manager.load()
+        manager.period = "2025-01"
+        manager.add_event("Event A")
+        manager.adjust_flight_time(123456789012345678, 90)
+        manager.add_attendance("Event A", 123456789012345678)
+
+        partition_id = await manager.seal_period(archive)
+
+        assert partition_id == "2025-01"
+        assert manager.flight_hours == {}
+        assert manager.event_history == {}
+        assert manager.period != "2025-01"
+        assert archive.member_minutes(123456789012345678) == {"2025-01": 90}
+        assert archive.member_events(123456789012345678) == {"2025-01": ["Event A"]}
+
+    @pytest.mark.asyncio
+    async def test_seal_period_writes_off_the_event_loop(self, tmp_path, monkeypatch):
+        """Test that the partition is written in a worker thread, not on the event loop."""
+        archive = MonthlyArchive(str(tmp_path / "archive"))
+        manager = FlightHours(JSONStorage(str(tmp_path / "current.snap")))
+        manager.load()
+        manager.adjust_flight_time(123456789012345678, 90)
+
+        threads = []
+        seal = archive.seal
+        monkeypatch.setattr(
+            archive, "seal", lambda state: threads.append(threading.get_ident()) or seal(state)
+        )
+        await manager.seal_period(archive)
+
+        assert threads and threads[0] != threading.get_ident()
+        assert manager.flight_hours == {}
@@ -0,0 +1,102 @@
+"""
+Tests for attendance.py module.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from attendance import AttendanceMatrix
+
+MEMBER_A = "123456789012345678"
+MEMBER_B = "234567890123456789"
+MEMBER_C = "345678901234567890"
+
+
+class TestAttendanceMatrix:
+    """Test cases for AttendanceMatrix class."""
+
+    @pytest.fixture
+    def matrix(self):
+        """Create a matrix with three events."""
+        return AttendanceMatrix.from_dict(
+            {
+                "Event A": [MEMBER_A, MEMBER_B],
+                "Event B": [MEMBER_B],
+                "Event C": [MEMBER_B, MEMBER_C],
+            }
+        )
+
+    def test_both_directions(self, matrix):
+        """Test that attendance can be read by event and by member."""
+        assert matrix.events() == ["Event A", "Event B", "Event C"]
+        assert matrix.members("Event A") == [MEMBER_A, MEMBER_B]
+        assert matrix.member_events(MEMBER_B) == ["Event A", "Event B", "Event C"]
+        assert matrix.attended("Event C", MEMBER_C)
+        assert not matrix.attended("Event A", MEMBER_C)
+
+    def test_member_ids_are_normalized(self, matrix):
+        """Test that integer member IDs refer to the same member."""
+        matrix.add("Event B", int(MEMBER_A))
+        assert matrix.member_events(MEMBER_A) == ["Event A", "Event B"]
+
+    def test_discard(self, matrix):
+        """Test that removing attendance updates both directions."""
+        matrix.discard("Event A", MEMBER_B)
+
+        assert matrix.members("Event A") == [MEMBER_A]
+        assert matrix.member_events(MEMBER_B) == ["Event B", "Event C"]
+
+    def test_remove_event(self, matrix):
+        """Test that removing an event removes it from every member."""
+        matrix.remove_event("Event B")
+
+        assert matrix.events() == ["Event A", "Event C"]
+        assert matrix.member_events(MEMBER_B) == ["Event A", "Event C"]
+
+    def test_reset_event_keeps_its_position(self, matrix):
+        """Test that resetting an event clears its attendance in place."""
+        matrix.reset_event("Event A")
+
+        assert matrix.events() == ["Event A", "Event B", "Event C"]
+        assert matrix.members("Event A") == []
+        assert matrix.member_events(MEMBER_A) == []
+
+    def test_counts(self, matrix):
+        """Test the per-event and per-member counts."""
+        assert matrix.event_count("Event C") == 2
+        assert matrix.member_count(MEMBER_B) == 3
+        assert matrix.attendance_counts() == {MEMBER_A: 1, MEMBER_B: 3, MEMBER_C: 1}
+        assert matrix.event_count("Missing") == 0
+
+    def test_frequent_members(self, matrix):
+        """Test finding members who attended k of the last n events."""
+        assert matrix.frequent_members(2, 2) == [MEMBER_B]
+        assert matrix.frequent_members(1, 1) == [MEMBER_B, MEMBER_C]
+        assert matrix.frequent_members(1, 0) == []
+
+    def test_overlap(self, matrix):
+        """Test finding members who attended all of several events."""
+        assert matrix.overlap("Event A", "Event C") == [MEMBER_B]
+        assert matrix.overlap("Event A", "Missing") == []
+
+    def test_views(self, matrix):
+        """Test the dictionary-shaped read views."""
+        assert list(matrix.by_event) == ["Event A", "Event B", "Event C"]
+        assert matrix.by_event["Event B"] == {MEMBER_B}
+        assert "Event B" in matrix.by_event
+        assert matrix.by_member[MEMBER_C] == {"Event C"}
+        assert len(matrix.by_member) == 3
+
+    def test_round_trip(self, matrix):
+        """Test that to_dict and from_dict preserve the attendance."""
+        assert AttendanceMatrix.from_dict(matrix.to_dict()).to_dict() == matrix.to_dict()
+
+    def test_clear(self, matrix):
+        """Test that clearing removes all events and members."""
+        matrix.clear()
+        assert matrix.events() == []
+        assert matrix.attendance_counts() == {}
@@ -0,0 +1,204 @@
+"""
+Tests for backups.py module.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import pytz
+
+from backups import BackupManager, read_json, recover, rotate, sqlite_intact
+from config import FlightHours
+from storage import JSONStorage, SQLiteStorage
+
+MEMBER_A = "123456789012345678"
+
+
+def write_json(file_path, data):
+    with open(file_path, "w") as file:
+        json.dump(data, file)
+
+
+class TestRotation:
+    """Test cases for rotating and recovering single files."""
+
+    def test_rotate_links_previous_version(self, tmp_path):
+        """Test that the previous version is kept without copying it."""
+        file_path = str(tmp_path / "bot_settings.json")
+        write_json(file_path, {"version": 1})
+
+        rotate(file_path)
+
+        assert os.path.samefile(file_path, f"{file_path}.backup")
+        write_json(f"{file_path}.new", {"version": 2})
+        os.replace(f"{file_path}.new", file_path)
+        assert read_json(f"{file_path}.backup") == {"version": 1}
+
+    def test_rotate_missing_file(self, tmp_path):
+        """Test that rotating a file that does not exist does nothing."""
+        rotate(str(tmp_path / "missing.json"))
+        assert os.listdir(tmp_path) == []
+
+    def test_recover_skips_damaged_files(self, tmp_path):
+        """Test that the first readable candidate is used."""
+        damaged, intact = str(tmp_path / "a.json"), str(tmp_path / "b.json")
+        with open(damaged, "w") as file:
+            file.write('{"flight_hours": {')
+        write_json(intact, {"seq": 3})
+
+        assert recover([damaged, str(tmp_path / "missing.json"), intact], read_json) == (
+            intact,
+            {"seq": 3},
+        )
+        assert recover([damaged], read_json) == (None, None)
+
+    def test_sqlite_intact(self, tmp_path):
+        """Test the quick integrity check of SQLite databases."""
+        db_path = str(tmp_path / "flight_hours.db")
+        sqlite3.connect(db_path).close()
+        assert sqlite_intact(db_path)
+
+        with open(db_path, "wb") as file:
+            file.write(b"not a database" * 100)
+        assert not sqlite_intact(db_path)
+
+
+class TestBackupManager:
+    """Test cases for BackupManager class."""
+
+    @pytest.fixture
+    def backups(self, tmp_path):
+        """Create a backup manager in a temporary directory."""
+        return BackupManager(str(tmp_path / "backups"), hourly=24, daily=30)
+
+    def make_snapshot(self, backups, taken):
+        """Create an empty snapshot with a given timestamp."""
+        os.makedirs(backups.backup_dir, exist_ok=True)
+        path = os.path.join(
+            backups.backup_dir, f"flight_hours_{taken:%Y%m%d_%H%M%S}.json.gz"
+        )
+        with gzip.open(path, "wt") as file:
+            file.write("{}")
+        return path
+
+    def test_create_compresses_a_copy(self, backups, tmp_path):
+        """Test that a snapshot is a gzip-compressed copy."""
+        source = str(tmp_path / "current.json")
+        write_json(source, {"seq": 7})
+
+        def write_copy(path):
+            with open(source) as src, open(path, "w") as dst:
+                dst.write(src.read())
+            return path
+
+        snapshot_path = backups.create(write_copy, ".json")
+
+        assert snapshot_path.endswith(".json.gz")
+        assert read_json(snapshot_path) == {"seq": 7}
+        assert backups.verify(snapshot_path)
+        assert backups.snapshots(".json") == [snapshot_path]
+
+    def test_create_without_data(self, backups):
+        """Test that nothing is written if there is nothing to copy."""
+        assert backups.create(lambda path: None, ".json") is None
+        assert backups.snapshots() == []
+
+    def test_retention_policy(self, backups):
+        """Test that one snapshot per hour and per day is kept."""
+        now = datetime(2025, 3, 31, 12, 30, tzinfo=pytz.utc)
+        latest = self.make_snapshot(backups, now)
+        same_hour = self.make_snapshot(backups, now - timedelta(minutes=20))
+        earlier_hour = self.make_snapshot(backups, now - timedelta(hours=2))
+        two_days_ago = self.make_snapshot(backups, now - timedelta(days=2))
+        two_days_ago_earlier = self.make_snapshot(backups, now - timedelta(days=2, hours=3))
+        expired = self.make_snapshot(backups, now - timedelta(days=45))
+
+        deleted = backups.prune(now)
+
+        assert sorted(deleted) == sorted([same_hour, two_days_ago_earlier, expired])
+        assert backups.snapshots() == [latest, earlier_hour, two_days_ago]
+
+    def test_newest_snapshot_is_always_kept(self, backups):
+        """Test that an old snapshot survives if it is the only one."""
+        now = datetime(2025, 3, 31, tzinfo=pytz.utc)
+        only = self.make_snapshot(backups, now - timedelta(days=90))
+
+        assert backups.prune(now) == []
+        assert backups.snapshots() == [only]
+
+    def test_verify_detects_truncation(self, backups):
+        """Test that a truncated snapshot fails verification."""
+        path = self.make_snapshot(backups, datetime(2025, 3, 31, tzinfo=pytz.utc))
+        with open(path, "rb") as file:
+            data = file.read()
+        with open(path, "wb") as file:
+            file.write(data[:-6])
+
+        assert not backups.verify(path)
+
+    def test_restore_latest_skips_bad_snapshots(self, backups, tmp_path):
+        """Test that restoring falls back to an older intact snapshot."""
+        now = datetime(2025, 3, 31, tzinfo=pytz.utc)
+        self.make_snapshot(backups, now - timedelta(hours=1))
+        newest = self.make_snapshot(backups, now)
+        with open(newest, "wb") as file:
+            file.write(b"garbage")
+
+        target = str(tmp_path / "restored.json")
+        restored = backups.restore_latest(target, ".json")
+
+        assert restored != newest
+        assert read_json(target) == {}
+
+
+class TestStorageRecovery:
+    """Test cases for recovering flight hours from backups."""
+
+    def test_json_falls_back_to_scheduled_snapshot(self, tmp_path):
+        """Test that a damaged snapshot with no backup copy uses the backups."""
+        backups = BackupManager(str(tmp_path / "backups"))
+        file_path = str(tmp_path / "flight_hours" / "current.snap")
+        manager = FlightHours(JSONStorage(file_path, backups))
+        manager.load()
+        manager.adjust_flight_time(MEMBER_A, 90)
+        manager.create_backup()
+        manager.storage.close()
+
+        with open(file_path, "w") as file:
+            file.write('{"flight_hours": {')
+        os.remove(f"{file_path}.backup")
+        os.remove(manager.storage.journal_path)
+
+        restored = FlightHours(JSONStorage(file_path, backups))
+        restored.load()
+        assert restored.flight_hours == {MEMBER_A: 90}
+        assert os.path.exists(f"{file_path}.corrupt")
+        restored.storage.close()
+
+    def test_sqlite_restores_latest_intact_backup(self, tmp_path):
+        """Test that a damaged database is replaced by the newest backup."""
+        backups = BackupManager(str(tmp_path / "backups"))
+        db_path = str(tmp_path / "flight_hours" / "flight_hours.db")
+        manager = FlightHours(SQLiteStorage(db_path, backups=backups))
+        manager.load()
+        manager.adjust_flight_time(MEMBER_A, 45)
+        manager.create_backup()
+        manager.storage.close()
+
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        with open(db_path, "wb") as file:
+            file.write(b"not a database" * 100)
+
+        restored = FlightHours(SQLiteStorage(db_path, backups=backups))
+        restored.load()
+        assert restored.flight_hours == {MEMBER_A: 45}
+        restored.storage.close()
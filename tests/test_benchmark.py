@@ -0,0 +1,113 @@
+"""
+Tests for benchmark.py module.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from benchmark import ITERATIONS, compare, confirmed_regressions, run_dataset, synthetic_state
+
+
+def document(ops_per_sec, p99_us, iterations=200, key="10k/save"):
+    return {
+        "results": {
+            key: {
+                "iterations": iterations,
+                "ops_per_sec": ops_per_sec,
+                "p50_us": round(1e6 / ops_per_sec, 1),
+                "p99_us": p99_us,
+            }
+        }
+    }
+
+
+def hot_paths(scale=1.0, jitter=0.0):
+    """Return results like a 10k run's, `scale` times slower and off by up to +/- `jitter`"""
+    measured = {  # Key: Operation | Value: (ops/s, p99 us)
+        "log_start_time": (250000, 9.0),
+        "log_end_time": (140000, 15.0),
+        "save": (9000, 400.0),
+        "load": (40, 28000.0),
+        "export": (60, 18000.0),
+    }
+    results = {}
+    for i, (operation, (ops_per_sec, p99_us)) in enumerate(measured.items()):
+        noise = 1 + jitter * (-1) ** i
+        results[f"10k/{operation}"] = {
+            "iterations": ITERATIONS[operation],
+            "ops_per_sec": round(ops_per_sec / scale / noise, 1),
+            "p50_us": round(1e6 / ops_per_sec * scale * noise, 1),
+            "p99_us": round(p99_us * scale * noise, 1),
+        }
+    return {"results": results}
+
+
+class TestBenchmark:
+    """Test cases for the FlightHours benchmark suite."""
+
+    def test_synthetic_state(self):
+        """Test that every member has flight time and attends three events."""
+        state = synthetic_state(100, 10)
+        assert len(state["flight_hours"]) == 100
+        assert sum(len(members) for members in state["event_history"].values()) == 300
+        assert synthetic_state(100, 10) == state
+
+    @pytest.mark.parametrize("storage", ["sqlite", "json"])
+    def test_run_dataset(self, storage):
+        """Test that each operation reports throughput, latency and memory."""
+        results = run_dataset(
+            (200, 5), storage, iterations={name: 2 for name in ITERATIONS}
+        )
+        assert set(results) == set(ITERATIONS)
+        for measurement in results.values():
+            assert measurement["iterations"] == 2
+            assert measurement["ops_per_sec"] > 0
+            assert measurement["p99_us"] >= measurement["p50_us"]
+            assert measurement["peak_rss_mib"] > 0
+
+    def test_compare(self):
+        """Test that only changes beyond the operation's threshold are regressions."""
+        baseline = document(1000, 100)
+        assert compare(baseline, document(600, 140)) == []
+        assert len(compare(baseline, document(400, 100))) == 1
+        assert len(compare(baseline, document(1000, 200), {"save": 0.5})) == 1
+        assert compare(baseline, document(1000, 200, iterations=5)) == []
+        assert compare(baseline, {"results": {"1k/save": {"ops_per_sec": 1, "p99_us": 1}}}) == []
+
+    def test_noise_floor_follows_the_baseline(self):
+        """Test that changes below the timer's resolution are ignored, but not those of fast operations."""
+        # 1.0 us to 1.4 us per call is below the timer's resolution
+        assert compare(document(1000000, 3.0), document(700000, 3.0)) == []
+        # A 28% drop of an 8 us operation is a regression
+        fast = "10k/log_start_time"
+        assert len(compare(document(125000, 12.0, key=fast), document(90000, 12.0, key=fast))) == 1
+
+    def test_slow_hot_paths_are_regressions(self):
+        """Test that a 4x slowdown of every hot path, however fast, is reported."""
+        regressions = compare(hot_paths(), hot_paths(scale=4.0))
+        flagged = {regression.split(":", 1)[0] for regression in regressions}
+        assert flagged == set(hot_paths()["results"])
+
+    def test_regressions_must_show_up_again(self):
+        """Test that a regression is only reported if a second run measures it too."""
+        baseline = document(1000, 100)
+        regressions, current = confirmed_regressions(
+            baseline, document(400, 100), lambda: document(990, 100)
+        )
+        assert regressions == []
+        assert current["results"]["10k/save"]["ops_per_sec"] == 990
+        regressions, _ = confirmed_regressions(
+            baseline, document(400, 100), lambda: document(450, 100)
+        )
+        assert len(regressions) == 1
+
+    def test_unchanged_code_passes(self):
+        """Test that runs of the same code, 10% apart either way, report no regression."""
+        baseline, current = hot_paths(jitter=0.1), hot_paths(jitter=-0.1)
+        assert compare(baseline, current) == []
+        assert compare(current, baseline) == []
+        assert confirmed_regressions(baseline, current, hot_paths)[0] == []
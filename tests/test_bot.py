@@ -0,0 +1,88 @@
+"""
+Tests for bot.py module.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import bot
+from config import partitions
+from replay import replay_partition
+from simulator import SimGuild
+
+NOW = 1700000000.0
+CHANNEL_ID = 5
+MEMBER_A = 111111111111111111
+MEMBER_B = 222222222222222222
+
+
+class TestReconcileVoiceSessions:
+    """Test cases for reconciling open sessions with the event voice channels."""
+
+    @pytest.fixture
+    def partition(self, tmp_path, monkeypatch):
+        """Serve an empty guild partition with an active event in one voice channel."""
+        monkeypatch.setattr(bot, "time", SimpleNamespace(time=lambda: NOW))
+        partition = replay_partition(str(tmp_path))
+        partitions.add(partition)
+        guild = SimGuild(partition.guild_id)
+        partition.config.guild = guild
+        partition.flight_hours.start_event("Event A", guild.add_voice_channel(CHANNEL_ID))
+        yield partition
+        partitions.remove(partition.guild_id)
+        partition.flight_hours.storage.close()
+
+    async def reconcile(self, partition):
+        with partitions.use(partition):
+            await bot.reconcile_voice_sessions()
+        await partition.voice_events.stop()
+
+    @pytest.mark.asyncio
+    async def test_members_without_a_session_start_one(self, partition):
+        """Test that a member found in an event channel starts a session in the middle of the gap."""
+        guild = partition.config.guild
+        guild.move_member(guild.add_member(MEMBER_A), guild.channel(CHANNEL_ID))
+        partition.voice_synced_at = NOW - 600
+
+        await self.reconcile(partition)
+
+        manager = partition.flight_hours
+        assert manager.members.session_start(MEMBER_A) == NOW - 300
+        assert manager.session_event(MEMBER_A) == "Event A"
+        assert partition.voice_synced_at == NOW
+
+    @pytest.mark.asyncio
+    async def test_members_who_left_end_in_the_middle_of_the_gap(self, partition):
+        """Test that a session whose member is gone ends halfway between the last sync and now."""
+        guild = partition.config.guild
+        manager = partition.flight_hours
+        manager.log_start_time(MEMBER_B, guild.add_member(MEMBER_B), at=NOW - 3600)
+        partition.voice_synced_at = NOW - 1200
+
+        await self.reconcile(partition)
+
+        # Flew from an hour ago until 10 minutes ago
+        assert manager.open_sessions() == []
+        assert manager.minutes(MEMBER_B) == 50
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_caps_credit_after_a_restart(self, partition):
+        """Test that after a restart, members who left are credited only up to the last heartbeat."""
+        guild = partition.config.guild
+        manager = partition.flight_hours
+        manager.log_start_time(MEMBER_B, guild.add_member(MEMBER_B), at=NOW - 3600)
+        manager.accrue_sessions([MEMBER_B], at=NOW - 2400)
+        assert manager.minutes(MEMBER_B) == 20
+        partition.voice_synced_at = None  # Unknown since the restart
+
+        await self.reconcile(partition)
+
+        # The 40 minutes after the heartbeat may not have been flown
+        assert manager.open_sessions() == []
+        assert manager.minutes(MEMBER_B) == 20
+        assert manager.heartbeat == NOW - 2400
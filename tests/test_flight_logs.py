@@ -0,0 +1,68 @@
+"""
+Tests for flight_logs.py module.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import flight_logs
+from config import partitions
+from replay import replay_partition
+
+NOW = 1700000000.0
+FIRST_MEMBER_ID = 100_000_000_000_000_000
+
+
+class TestCheckpointSessions:
+    """Test cases for the periodic checkpoint of open sessions."""
+
+    @pytest.fixture
+    def clock(self):
+        """The flight hours clock (epoch seconds), moved forward by the test."""
+        return [NOW]
+
+    @pytest.fixture
+    def partition(self, tmp_path, clock):
+        """Serve a guild partition with more members flying than one checkpoint batch."""
+        partition = replay_partition(str(tmp_path))
+        partition.flight_hours.clock = lambda: clock[0]
+        partitions.add(partition)
+        members = [
+            SimpleNamespace(id=FIRST_MEMBER_ID + i, bot=False)
+            for i in range(flight_logs.CHECKPOINT_BATCH * 2 + 100)
+        ]
+        partition.flight_hours.start_event("Event A")
+        partition.flight_hours.start_sessions(members, event_name="Event A")
+        yield partition
+        partitions.remove(partition.guild_id)
+        partition.flight_hours.storage.close()
+
+    @pytest.mark.asyncio
+    async def test_checkpoints_credit_whole_minutes_once(self, partition, clock):
+        """Test that checkpoints credit whole minutes in batches and the end credits only the rest."""
+        manager = partition.flight_hours
+        member_ids = manager.open_sessions()
+        version = manager.seq
+
+        clock[0] = NOW + 150
+        await flight_logs.checkpoint_sessions()
+        assert manager.seq == version + 3  # One record per batch of 500
+        assert manager.heartbeat == NOW + 150
+        assert {manager.minutes(member_id) for member_id in member_ids} == {2}
+
+        clock[0] = NOW + 270
+        await flight_logs.checkpoint_sessions()
+        assert manager.heartbeat == NOW + 270
+        assert {manager.minutes(member_id) for member_id in member_ids} == {4}
+
+        # Ending at 5 minutes 30 seconds adds only the minute not yet credited
+        clock[0] = NOW + 330
+        ended = manager.end_sessions()
+        assert set(ended.values()) == {5}
+        assert {manager.minutes(member_id) for member_id in member_ids} == {5}
+        assert manager.open_sessions() == []
@@ -0,0 +1,146 @@
+"""
+Tests for guilds.py module.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from config import Configurations, FlightHours, create_partition
+from guilds import GuildPartition, GuildPartitions, GuildProxy, current_guild
+from storage import JSONStorage
+
+HOME_ID = 100
+PARTNER_ID = 200
+
+
+class TestGuildPartitions:
+    """Test cases for GuildPartitions and GuildProxy classes."""
+
+    def partition(self, tmp_path, guild_id):
+        storage = JSONStorage(str(tmp_path / str(guild_id) / "current.snap"))
+        guild_config = SimpleNamespace(load=lambda: None, guild_id=guild_id)
+        return GuildPartition(guild_id, guild_config, FlightHours(storage), archive=None)
+
+    @pytest.fixture
+    def built(self):
+        """Guild IDs the factory was called for."""
+        return []
+
+    @pytest.fixture
+    def partitions(self, tmp_path, built):
+        """Partitions with a home guild and one configured partner guild."""
+
+        def factory(guild_id):
+            built.append(guild_id)
+            return self.partition(tmp_path, guild_id) if guild_id == PARTNER_ID else None
+
+        partitions = GuildPartitions(self.partition(tmp_path, HOME_ID), factory, idle_minutes=30)
+        yield partitions
+        for partition in partitions.loaded():
+            partition.flight_hours.storage.close()
+
+    def test_partner_guilds_load_on_first_use(self, partitions, built):
+        """Test that only the home guild is in memory until another guild is used."""
+        assert [p.guild_id for p in partitions.loaded()] == [HOME_ID]
+
+        partner = partitions.get(PARTNER_ID)
+        assert partitions.get(PARTNER_ID) is partner
+        assert built == [PARTNER_ID]
+        assert [p.guild_id for p in partitions.loaded()] == [HOME_ID, PARTNER_ID]
+
+    def test_unconfigured_guilds_are_ignored(self, partitions, built):
+        """Test that a guild without configuration has no partition and is not retried."""
+        assert asyncio.run(partitions.enter(SimpleNamespace(id=300))) is None
+        assert partitions.get(300) is None
+        assert built == [300]
+
+    def test_partitions_load_off_the_event_loop(self, partitions, built, monkeypatch):
+        """Test that a partner guild loads once, in a worker thread, however many events arrive."""
+        threads = []
+        partner_load = GuildPartition.load
+
+        def load(partition):
+            threads.append(threading.current_thread())
+            partner_load(partition)
+
+        async def arrive():
+            return await asyncio.gather(
+                *(partitions.enter(SimpleNamespace(id=PARTNER_ID)) for _ in range(3))
+            )
+
+        monkeypatch.setattr(GuildPartition, "load", load)
+        entered = asyncio.run(arrive())
+        assert entered[0] is entered[1] is entered[2] is partitions.get(PARTNER_ID)
+        assert built == [PARTNER_ID]
+        assert len(threads) == 1 and threads[0] is not threading.main_thread()
+
+    def test_proxy_follows_the_current_guild(self, partitions):
+        """Test that a proxy reaches the partition of the guild being worked on."""
+        flight_hours = GuildProxy(partitions, "flight_hours")
+        partner = partitions.get(PARTNER_ID)
+
+        flight_hours.adjust_flight_time(1, 30)
+        with partitions.use(partner):
+            flight_hours.adjust_flight_time(1, 45)
+            assert flight_hours.minutes(1) == 45
+        assert flight_hours.minutes(1) == 30
+        assert current_guild.get() is None
+
+    def test_idle_partitions_are_evicted(self, partitions):
+        """Test that idle partner guilds are unloaded unless an event is running."""
+        partner = partitions.get(PARTNER_ID)
+        later = partner.last_used + 31 * 60
+
+        partner.flight_hours.start_event("Event A")
+        assert partitions.evict_idle(later) == []
+
+        partner.flight_hours.end_event("Event A")
+        assert partitions.evict_idle(later) == [partner]
+        assert [p.guild_id for p in partitions.loaded()] == [HOME_ID]
+        partner.flight_hours.storage.close()
+
+
+class TestCreatePartition:
+    """Test cases for building a partner guild's partition."""
+
+    @pytest.fixture
+    def guild_dirs(self, tmp_path, monkeypatch):
+        """Point the configuration and flight data directories at tmp_path."""
+        monkeypatch.setenv("GUILD_CONFIG_DIR", str(tmp_path / "config"))
+        monkeypatch.setenv("FLIGHT_DATA_DIR", str(tmp_path / "flight_hours"))
+        monkeypatch.setenv("FLIGHT_BACKUP_DIR", str(tmp_path / "backups"))
+        monkeypatch.setenv("FLIGHT_ARCHIVE_DIR", str(tmp_path / "archive"))
+        monkeypatch.setenv("FLIGHT_STORAGE", "json")
+        return tmp_path
+
+    def test_partner_configuration(self, guild_dirs, mock_config):
+        """Test that a partner guild uses its own IDs and its own data directory."""
+        ids = {
+            key.upper(): value
+            for key, value in mock_config.items()
+            if key.endswith("_id") and key != "guild_id"
+        }
+        ids["LOG_CHANNEL_ID"] = 555
+        os.makedirs(guild_dirs / "config" / str(PARTNER_ID))
+        with open(guild_dirs / "config" / str(PARTNER_ID) / "ids.json", "w") as file:
+            json.dump(ids, file)
+
+        partition = create_partition(PARTNER_ID)
+        assert isinstance(partition.config, Configurations)
+        assert partition.config.guild_id == PARTNER_ID
+        assert partition.config.log_channel_id == 555
+        assert partition.flight_hours.storage.path == str(
+            guild_dirs / "flight_hours" / "guilds" / str(PARTNER_ID) / "current.snap"
+        )
+
+    def test_unconfigured_guild(self, guild_dirs):
+        """Test that a guild without an ids.json has no partition."""
+        assert create_partition(PARTNER_ID) is None
@@ -0,0 +1,181 @@
+"""
+Tests for journal.py module and journal replay in FlightHours.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from config import FlightHours
+from journal import SessionJournal
+from storage import JSONStorage
+
+
+class TestSessionJournal:
+    """Test cases for SessionJournal class."""
+
+    @pytest.fixture
+    def journal(self, tmp_path):
+        """Create a journal in a temporary directory."""
+        journal = SessionJournal(str(tmp_path / "current.journal"), commit_batch=2)
+        yield journal
+        journal.close()
+
+    def test_append_and_replay(self, journal):
+        """Test that appended records are replayed in order."""
+        journal.append({"op": "start", "seq": 1, "m": "1", "t": 0})
+        journal.append({"op": "end", "seq": 2, "m": "1", "min": 10, "ev": None})
+        journal.commit()
+
+        records = list(journal.replay())
+        assert [record["seq"] for record in records] == [1, 2]
+
+    def test_records_are_compact(self, journal):
+        """Test that each record is a single minified line."""
+        journal.append({"op": "adjust", "seq": 1, "m": "1", "min": 5})
+        journal.commit()
+
+        with open(journal.file_path) as file:
+            lines = file.readlines()
+        assert lines == ['{"op":"adjust","seq":1,"m":"1","min":5}\n']
+        assert journal.size == len(lines[0])
+
+    def test_group_commit(self, journal):
+        """Test that fsync is only issued once per batch."""
+        journal.commit_interval = 3600
+        journal.append({"op": "clear", "seq": 1})
+        assert journal.commit() is False
+
+        journal.append({"op": "clear", "seq": 2})
+        assert journal.commit() is True
+        assert journal.commit() is False
+
+    def test_forced_commit(self, journal):
+        """Test that a forced commit always syncs pending records."""
+        journal.commit_interval = 3600
+        journal.append({"op": "clear", "seq": 1})
+        assert journal.commit(force=True) is True
+
+    def test_replay_stops_at_torn_record(self, journal):
+        """Test that a partially written tail record is ignored."""
+        journal.append({"op": "clear", "seq": 1})
+        journal.close()
+        with open(journal.file_path, "a") as file:
+            file.write('{"op":"start","se')
+
+        records = list(journal.replay())
+        assert len(records) == 1
+
+    def test_truncate(self, journal):
+        """Test that truncating discards all records."""
+        journal.append({"op": "clear", "seq": 1})
+        journal.truncate()
+
+        assert list(journal.replay()) == []
+        assert journal.size == 0
+
+    def test_replay_missing_file(self, tmp_path):
+        """Test replaying a journal that was never written."""
+        journal = SessionJournal(str(tmp_path / "missing.journal"))
+        assert list(journal.replay()) == []
+
+
+class TestFlightHoursJournal:
+    """Test cases for snapshot + journal persistence of FlightHours."""
+
+    @pytest.fixture
+    def file_path(self, tmp_path):
+        """Path of the flight hours snapshot."""
+        return str(tmp_path / "flight_hours" / "current.snap")
+
+    def test_mutations_survive_reload(self, file_path):
+        """Test that journaled mutations are rebuilt by load()."""
+        manager = FlightHours(JSONStorage(file_path))
+        manager.load()
+        manager.add_event("Event A")
+        manager.adjust_flight_time(123456789012345678, 90)
+        manager.add_attendance("Event A", 123456789012345678)
+        manager.save()
+
+        restored = FlightHours(JSONStorage(file_path))
+        restored.load()
+        assert restored.flight_hours == {"123456789012345678": 90}
+        assert restored.event_history["Event A"] == {"123456789012345678"}
+        assert restored.member_history["123456789012345678"] == {"Event A"}
+
+    def test_save_appends_instead_of_rewriting(self, file_path):
+        """Test that save() leaves the snapshot untouched below the threshold."""
+        manager = FlightHours(JSONStorage(file_path))
+        manager.load()
+        snapshot_mtime = os.stat(file_path).st_mtime_ns
+
+        manager.adjust_flight_time(123456789012345678, 15)
+        manager.save()
+
+        assert os.stat(file_path).st_mtime_ns == snapshot_mtime
+        assert os.path.getsize(manager.storage.journal_path) > 0
+
+    def test_compaction(self, file_path):
+        """Test that a large journal is folded into the snapshot."""
+        manager = FlightHours(JSONStorage(file_path))
+        manager.load()
+        manager.storage.compact_threshold = 1
+        manager.adjust_flight_time(123456789012345678, 15)
+        manager.save()
+
+        assert os.path.getsize(manager.storage.journal_path) == 0
+
+        restored = FlightHours(JSONStorage(file_path))
+        restored.load()
+        assert restored.flight_hours == {"123456789012345678": 15}
+
+    def test_records_already_in_snapshot_are_skipped(self, file_path):
+        """Test that a crash between snapshot and truncate does not double count."""
+        manager = FlightHours(JSONStorage(file_path))
+        manager.load()
+        manager.adjust_flight_time(123456789012345678, 30)
+        manager.save()
+
+        # Simulate a snapshot written without truncating the journal
+        snapshot = manager.storage._prepare_snapshot(manager)
+        manager.storage._write_snapshot(snapshot.to_dict())
+
+        restored = FlightHours(JSONStorage(file_path))
+        restored.load()
+        assert restored.flight_hours == {"123456789012345678": 30}
+
+    def test_event_channels_survive_reload(self, file_path):
+        """Test that event voice channels are restored by ID without the guild."""
+        manager = FlightHours(JSONStorage(file_path))
+        manager.load()
+        manager.start_event("Event A", SimpleNamespace(id=111))
+        manager.add_voice_channel(SimpleNamespace(id=222))
+        manager.remove_voice_channel(SimpleNamespace(id=111))
+        manager.save()
+
+        restored = FlightHours(JSONStorage(file_path))
+        restored.load()
+        assert list(restored.voice_channel_ids) == [222]
+        assert restored.is_event_channel(SimpleNamespace(id=222))
+        assert not restored.is_event_channel(SimpleNamespace(id=111))
+        assert not restored.is_event_channel(None)
+
+    def test_concurrent_events_survive_snapshot(self, file_path):
+        """Test that each event's channels and sessions are kept in the snapshot."""
+        manager = FlightHours(JSONStorage(file_path))
+        manager.load()
+        manager.start_event("Event A", SimpleNamespace(id=111))
+        manager.start_event("Event B", SimpleNamespace(id=222))
+        manager.add_voice_channel(SimpleNamespace(id=333), "Event A")
+        manager.log_start_time(123456789012345678, at=1700000000.0, event_name="Event A")
+        manager.checkpoint()
+
+        restored = FlightHours(JSONStorage(file_path))
+        restored.load()
+        assert restored.events == {"Event A": {111: None, 333: None}, "Event B": {222: None}}
+        assert restored.active_event == "Event B"
+        assert restored.session_event(123456789012345678) == "Event A"
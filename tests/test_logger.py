@@ -2,6 +2,9 @@
 Tests for logger.py module.
 """
 
+import asyncio
+import json
+import logging
 import os
 import sys
 
@@ -9,9 +12,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import discord
 import pytest
 
-from logger import Logger
+from logger import LEVELS, ForwardHandler, JSONLFileSink, Logger, WebhookSink
 
 
 class TestLogger:
@@ -44,6 +48,7 @@ class TestLogger:
         new_channel.mention = "<#123456789012345680>"
 
         await logger.setChannel(new_channel)
+        await logger.flush()
 
         assert logger.log_channel == new_channel
         new_channel.send.assert_called_once()
@@ -54,6 +59,7 @@ class TestLogger:
         message = "Test info message"
 
         await logger.info(message)
+        await logger.flush()
 
         mock_channel.send.assert_called_once_with(message)
 
@@ -63,6 +69,7 @@ class TestLogger:
         message = "Test error message"
 
         await logger.error(message)
+        await logger.flush()
 
         mock_channel.send.assert_called_once_with(f"**ERROR:** {message}")
 
@@ -91,6 +98,7 @@ class TestLogger:
         # Should not raise an exception, should handle gracefully
         with patch("builtins.print") as mock_print:
             await logger.info("Test message")
+            await logger.flush()
             mock_print.assert_called_once()
 
     @pytest.mark.asyncio
@@ -102,6 +110,7 @@ class TestLogger:
         # Should not raise an exception, should handle gracefully
         with patch("builtins.print") as mock_print:
             await logger.error("Test message")
+            await logger.flush()
             mock_print.assert_called_once()
 
     @pytest.mark.asyncio
@@ -109,8 +118,9 @@ class TestLogger:
         """Test sending empty message."""
         await logger.info("")
         await logger.error("")
+        await logger.flush()
 
-        assert mock_channel.send.call_count == 2
+        mock_channel.send.assert_called_once_with("**ERROR:** \n")
 
     @pytest.mark.asyncio
     async def test_long_message(self, logger, mock_channel):
@@ -119,7 +129,295 @@ class TestLogger:
 
         await logger.info(long_message)
         await logger.error(long_message)
+        await logger.flush()
+
+        messages = [call.args[0] for call in mock_channel.send.call_args_list]
+        assert all(len(message) <= 2000 for message in messages)
+        assert "".join(messages) == f"**ERROR:** {long_message}{long_message}"
+
+    @pytest.mark.asyncio
+    async def test_summary_is_split_at_the_message_limit(self, logger, mock_channel):
+        """Test that a summary of 200 members takes a few messages, not 200."""
+        lines = [f"- <@{123456789012345678 + i}>" for i in range(200)]
+
+        await logger.summary("200 members joined. Starting Logging...", lines)
+        await logger.flush()
+
+        messages = [call.args[0] for call in mock_channel.send.call_args_list]
+        assert 1 < len(messages) <= 5
+        assert all(len(message) <= 2000 for message in messages)
+        assert "\n".join(messages).splitlines()[1:] == lines
+
+    @pytest.mark.asyncio
+    async def test_sessions_started_without_members(self, logger, mock_channel):
+        """Test that nothing is logged when no session was started."""
+        await logger.sessions_started(mock_channel.mention, [])
+        await logger.flush()
+
+        mock_channel.send.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_callers_do_not_wait_for_discord(self, logger, mock_channel):
+        """Test that logging only buffers the record until the flush."""
+        await logger.info("Member joined")
+        mock_channel.send.assert_not_called()
+        assert logger.pending() == 1
+
+        await logger.stop()
+        mock_channel.send.assert_called_once_with("Member joined")
+        assert logger.pending() == 0
+
+    @pytest.mark.asyncio
+    async def test_records_are_packed(self, mock_channel):
+        """Test that consecutive records share messages, with errors first."""
+        logger = Logger(mock_channel, rate_limit=None)
+        for i in range(300):
+            await logger.info(f"- Removed Captain from <@{123456789012345678 + i}>")
+        await logger.error("Role not found")
+        await logger.flush()
+
+        messages = [call.args[0] for call in mock_channel.send.call_args_list]
+        assert len(messages) <= 10
+        assert all(len(message) <= 2000 for message in messages)
+        assert messages[0].startswith("**ERROR:** Role not found\n- Removed Captain")
+        assert len("\n".join(messages).splitlines()) == 301
+
+    @pytest.mark.asyncio
+    async def test_sent_after_max_delay(self, mock_channel):
+        """Test that a lone record is sent once it has waited max_delay."""
+        logger = Logger(mock_channel, max_delay=0.01)
+        await logger.info("Member joined")
+        await asyncio.sleep(0.1)
+
+        mock_channel.send.assert_called_once_with("Member joined")
+        await logger.stop()
+
+    @pytest.mark.asyncio
+    async def test_channel_rate_limit(self, mock_channel):
+        """Test that full messages are not sent faster than the channel allows."""
+        logger = Logger(mock_channel, rate_limit=(2, 0.5), dedupe_seconds=0)
+        for _ in range(3):
+            await logger.info("a" * 2000)
+        await asyncio.sleep(0.05)
 
         assert mock_channel.send.call_count == 2
-        mock_channel.send.assert_any_call(long_message)
-        mock_channel.send.assert_any_call(f"**ERROR:** {long_message}")
+        await logger.stop()
+        assert mock_channel.send.call_count == 3
+
+
+class TestLogSinks:
+    """Test cases for the file and webhook log sinks."""
+
+    @pytest.fixture
+    def mock_channel(self):
+        channel = MagicMock()
+        channel.send = AsyncMock()
+        return channel
+
+    @pytest.fixture
+    def webhook(self):
+        webhook = MagicMock()
+        webhook.send = AsyncMock()
+        return webhook
+
+    @pytest.mark.asyncio
+    async def test_file_sink_writes_json_lines(self, tmp_path, mock_channel):
+        """Test that every record is written as one JSON line."""
+        path = str(tmp_path / "logs" / "bot.jsonl")
+        logger = Logger(mock_channel, sinks=[JSONLFileSink(path)])
+        await logger.info("Event started")
+        await logger.error("Role not found")
+        await logger.stop()
+
+        with open(path) as file:
+            records = [json.loads(line) for line in file]
+        assert [(r["level"], r["message"]) for r in records] == [
+            ("info", "Event started"),
+            ("error", "Role not found"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_file_sink_rotates(self, tmp_path):
+        """Test that the file is rotated by size, keeping `backups` older files."""
+        path = str(tmp_path / "bot.jsonl")
+        sink = JSONLFileSink(path, max_bytes=500, backups=2)
+        logger = Logger(None, sinks=[sink])
+        for i in range(40):
+            await logger.debug(f"<@{123456789012345678 + i}> joined <#1>. Starting Logging...")
+        await logger.stop()
+
+        assert os.path.exists(f"{path}.1") and os.path.exists(f"{path}.2")
+        assert not os.path.exists(f"{path}.3")
+        assert all(os.path.getsize(p) < 700 for p in (path, f"{path}.1", f"{path}.2"))
+
+    @pytest.mark.asyncio
+    async def test_sink_levels(self, tmp_path, mock_channel):
+        """Test that debug records reach the file but not a channel set to info."""
+        path = str(tmp_path / "bot.jsonl")
+        logger = Logger(mock_channel, sinks=[JSONLFileSink(path)])
+        logger.channel_sink.level = LEVELS["info"]
+        await logger.debug("<@1> joined <#2>. Starting Logging...")
+        await logger.info("1 members joined <#2>.")
+        await logger.stop()
+
+        mock_channel.send.assert_called_once_with("1 members joined <#2>.")
+        with open(path) as file:
+            assert len(file.readlines()) == 2
+
+    @pytest.mark.asyncio
+    async def test_webhook_batches_embeds(self, webhook):
+        """Test that a webhook request carries up to 10 embeds, with errors first in red."""
+        sink = WebhookSink("https://discord.invalid/api/webhooks/1/token", webhook, rate_limit=None)
+        logger = Logger(None, sinks=[sink])
+        await logger.error("Role not found")
+        for i in range(400):
+            await logger.info(f"- Assigned Captain to <@{123456789012345678 + i}> (10h 0m flown)")
+        await logger.flush()
+
+        batches = [call.kwargs["embeds"] for call in webhook.send.call_args_list]
+        assert all(len(embeds) <= 10 for embeds in batches)
+        assert all(sum(len(e.description) for e in embeds) <= 6000 for embeds in batches)
+        assert batches[0][0].description.startswith("[")
+        assert "**ERROR:** Role not found" in batches[0][0].description
+        assert batches[0][0].color == discord.Color.red()
+        lines = "\n".join(e.description for embeds in batches for e in embeds).splitlines()
+        assert len(lines) == 401
+        await logger.stop()
+
+
+class TestLogLevels:
+    """Test cases for subsystem levels, deduplication and event summaries."""
+
+    @pytest.fixture
+    def mock_channel(self):
+        """Create a mock Discord channel."""
+        channel = MagicMock()
+        channel.send = AsyncMock()
+        return channel
+
+    @pytest.fixture
+    def logger(self, mock_channel):
+        """Create a Logger that sends without pacing."""
+        return Logger(mock_channel, rate_limit=None)
+
+    def sent(self, channel):
+        return "\n".join(call.args[0] for call in channel.send.call_args_list).splitlines()
+
+    @pytest.mark.asyncio
+    async def test_subsystem_levels(self, logger, mock_channel):
+        """Test that each subsystem drops records below its own level."""
+        logger.set_level("warn", "voice")
+        await logger.debug("<@1> joined <#2>. Starting Logging...", "voice")
+        await logger.warn("Voice event queue is full", "voice")
+        await logger.debug("- Assigned Captain to <@1>", "roles")
+        await logger.flush()
+
+        assert self.sent(mock_channel) == [
+            "**WARNING:** Voice event queue is full",
+            "- Assigned Captain to <@1>",
+        ]
+        assert not logger.enabled("info", "voice")
+        with pytest.raises(KeyError):
+            logger.set_level("verbose")
+
+    @pytest.mark.asyncio
+    async def test_repeats_are_counted(self, logger, mock_channel):
+        """Test that repeats of a key within the window are logged once with a count."""
+        for channel_id in (2, 3, 2, 3):
+            await logger.debug(
+                f"<@1> switched to <#{channel_id}>. Resuming Logging...", "voice", key="switch:1"
+            )
+        await logger.debug("<@2> joined <#2>. Starting Logging...", "voice")
+        await logger.flush()
+
+        assert self.sent(mock_channel) == [
+            "<@1> switched to <#2>. Resuming Logging...",
+            "<@2> joined <#2>. Starting Logging...",
+            "<@1> switched to <#3>. Resuming Logging... (repeated 3 more times within 60 seconds)",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_repeats_after_the_window_are_logged(self, mock_channel):
+        """Test that a repeat after the window has expired is logged again."""
+        logger = Logger(mock_channel, rate_limit=None, dedupe_seconds=60)
+        now = [0.0]
+        logger.clock = lambda: now[0]
+        for now[0] in (0.0, 30.0, 90.0):
+            await logger.info("Event A ended", key="end:Event A")
+        await logger.flush()
+
+        assert self.sent(mock_channel) == [
+            "Event A ended",
+            "Event A ended (repeated 1 more time within 60 seconds)",
+            "Event A ended",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_only_keyed_debug_and_info_records_are_deduplicated(self, logger, mock_channel):
+        """Test that errors, warnings and records without a key are always logged."""
+        for _ in range(2):
+            await logger.error("Role not found", key="role")
+            await logger.warn("Voice event queue is full", key="queue")
+            await logger.info("Check-in process started")
+        await logger.flush()
+
+        assert len(self.sent(mock_channel)) == 6
+
+    @pytest.mark.asyncio
+    async def test_repeat_counts_are_logged_when_the_window_ends(self, mock_channel):
+        """Test that a burst followed by silence still logs its count once the window ends."""
+        logger = Logger(mock_channel, max_delay=0.01, rate_limit=None, dedupe_seconds=0.05)
+        for _ in range(4):
+            await logger.debug("<@1> switched to <#2>. Resuming Logging...", "voice", key="switch:1")
+        await asyncio.sleep(0.2)
+
+        assert self.sent(mock_channel) == [
+            "<@1> switched to <#2>. Resuming Logging...",
+            "<@1> switched to <#2>. Resuming Logging... (repeated 3 more times within 0 seconds)",
+        ]
+        await logger.stop()
+
+    @pytest.mark.asyncio
+    async def test_records_from_threads_and_lower_layers(self, logger, mock_channel):
+        """Test that synchronous code, worker threads and standard loggers reach the sinks."""
+        standard = logging.getLogger("test_logger.storage")
+        standard.addHandler(ForwardHandler(logger))
+        standard.setLevel(logging.DEBUG)
+        try:
+            logger.log("warn", "Voice event queue is full", "voice")
+            await asyncio.to_thread(logger.log, "info", "Written from a thread", "persistence")
+            await asyncio.to_thread(standard.error, "flight_hours.db failed its integrity check")
+            await asyncio.sleep(0)
+            await logger.flush()
+        finally:
+            standard.handlers.clear()
+
+        # Errors are sent first
+        assert self.sent(mock_channel) == [
+            "**ERROR:** flight_hours.db failed its integrity check",
+            "**WARNING:** Voice event queue is full",
+            "Written from a thread",
+        ]
+
+    def test_records_without_a_loop_go_to_stderr(self, logger, capsys):
+        """Test that records logged before the bot runs are written to stderr."""
+        logger.log("warn", "Restored flight hours from backup", "storage")
+        assert "[warn] storage: Restored flight hours from backup" in capsys.readouterr().err
+
+    @pytest.mark.asyncio
+    async def test_large_events_are_summarized(self, mock_channel):
+        """Test that sessions above the summary threshold are logged as counts."""
+        logger = Logger(mock_channel, rate_limit=None, summary_threshold=3)
+        await logger.sessions_started("<#2>", [1, 2, 3])
+        await logger.sessions_started("<#2>", list(range(10, 50)))
+        await logger.sessions_ended("<#2>", {member_id: 30 for member_id in range(10, 50)})
+        await logger.flush()
+
+        assert self.sent(mock_channel) == [
+            "3 members joined <#2>. Starting Logging...",
+            "- <@1>",
+            "- <@2>",
+            "- <@3>",
+            "40 members joined <#2>. Starting Logging...",
+            "40 members left <#2>. Ending Logging... 1200 minutes were added in total.",
+        ]
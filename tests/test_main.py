@@ -284,6 +284,30 @@ class TestMainIntegration:
 
         print("✅ All module imports and main.py structure validation successful")
 
+    def test_main_imports_added_commands(self):
+        """Test that main.py imports the commands added since launch, and that they register."""
+        import ast
+        import importlib
+
+        main_path = os.path.join(os.path.dirname(__file__), "..", "main.py")
+        with open(main_path, "r") as f:
+            tree = ast.parse(f.read())
+        imported = {}
+        for node in tree.body:
+            if isinstance(node, ast.ImportFrom):
+                imported.setdefault(node.module, set()).update(alias.name for alias in node.names)
+
+        expected = {
+            "member_commands": ["view_archive"],
+            "mod_commands": ["view_voice_queue", "log_level"],
+        }
+        for module_name, names in expected.items():
+            module = importlib.import_module(module_name)
+            for name in names:
+                assert name in imported.get(module_name, set()), f"main.py does not import {name}"
+                assert isinstance(getattr(module, name), commands.Command)
+                assert module.bot.get_command(name) is getattr(module, name)
+
     @pytest.mark.asyncio
     async def test_bot_latency_check(self):
         """Test bot latency measurement."""
@@ -0,0 +1,118 @@
+"""
+Tests for members.py module.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from members import MemberStore
+
+MEMBER_A = 123456789012345678
+MEMBER_B = 234567890123456789
+
+
+class TestMemberStore:
+    """Test cases for MemberStore class."""
+
+    @pytest.fixture
+    def store(self):
+        """Create an empty member store."""
+        return MemberStore()
+
+    def test_add_minutes(self, store):
+        """Test that minutes accumulate per member."""
+        assert store.add_minutes(MEMBER_A, 30) == 30
+        assert store.add_minutes(str(MEMBER_A), 15) == 45
+        assert store.minutes(MEMBER_A) == 45
+        assert store.minutes(MEMBER_B) == 0
+
+    def test_floor(self, store):
+        """Test that an adjustment never goes below the floor."""
+        store.add_minutes(MEMBER_A, 10)
+        assert store.add_minutes(MEMBER_A, -30, floor=0) == 0
+        assert store.has_minutes(MEMBER_A)
+
+    def test_session_without_minutes(self, store):
+        """Test that an open session does not create flight time."""
+        store.start_session(MEMBER_A, 1700000000.0)
+
+        assert store.session_start(MEMBER_A) == 1700000000.0
+        assert not store.has_minutes(MEMBER_A)
+        assert dict(store.minutes_view) == {}
+
+    def test_end_session(self, store):
+        """Test that ending a session closes it."""
+        store.start_session(MEMBER_A, 1700000000.0)
+        store.end_session(MEMBER_A)
+        store.end_session(MEMBER_B)
+
+        assert store.session_start(MEMBER_A) is None
+        assert len(store.sessions_view) == 0
+
+    def test_clear_sessions(self, store):
+        """Test that clearing sessions keeps flight time."""
+        store.add_minutes(MEMBER_A, 30)
+        store.start_session(MEMBER_A, 1700000000.0)
+        store.start_session(MEMBER_B, 1700000000.0)
+        store.clear_sessions()
+
+        assert list(store.session_items()) == []
+        assert store.minutes(MEMBER_A) == 30
+
+    def test_accrue(self, store):
+        """Test that credited minutes count as flight time and belong to the open session."""
+        store.start_session(MEMBER_A, 1700000000.0)
+        store.accrue(MEMBER_A, 5)
+        store.accrue(MEMBER_A, 10)
+        store.accrue(MEMBER_B, 10)  # No open session
+
+        assert store.minutes(MEMBER_A) == 15
+        assert store.accrued(MEMBER_A) == 15
+        assert list(store.accrued_items()) == [(MEMBER_A, 15)]
+        assert not store.has_minutes(MEMBER_B)
+
+        # Moving the start keeps the credit, ending the session drops it
+        store.start_session(MEMBER_A, 1700000060.0)
+        assert store.accrued(MEMBER_A) == 15
+        store.end_session(MEMBER_A)
+        assert store.accrued(MEMBER_A) == 0
+        assert store.minutes(MEMBER_A) == 15
+
+    def test_top(self, store):
+        """Test ranking members by flight time."""
+        store.add_minutes(MEMBER_A, 30)
+        store.add_minutes(MEMBER_B, 90)
+
+        assert store.top(1) == [(MEMBER_B, 90)]
+
+    def test_minutes_view(self, store):
+        """Test the str-keyed view of the flight time."""
+        store.add_minutes(MEMBER_A, 30)
+
+        view = store.minutes_view
+        assert view == {str(MEMBER_A): 30}
+        assert str(MEMBER_A) in view
+        assert view.get("not-a-snowflake", 0) == 0
+        with pytest.raises(KeyError):
+            view[str(MEMBER_B)]
+
+    def test_sessions_view(self, store):
+        """Test that the session view returns timezone-aware datetimes."""
+        store.start_session(MEMBER_A, 1700000000.0)
+
+        start = store.sessions_view[str(MEMBER_A)]
+        assert start.timestamp() == 1700000000.0
+        assert start.tzinfo is not None
+
+    def test_clear(self, store):
+        """Test that clearing removes every member."""
+        store.add_minutes(MEMBER_A, 30)
+        store.start_session(MEMBER_B, 1700000000.0)
+        store.clear()
+
+        assert len(store.minutes_view) == 0
+        assert len(store.sessions_view) == 0
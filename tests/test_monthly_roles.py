@@ -2,8 +2,12 @@
 Unit tests for monthly_roles.py module - Pure function tests only.
 """
 
+import asyncio
 import os
-from unittest.mock import patch
+import sys
+from unittest.mock import AsyncMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pytest
 
@@ -268,3 +272,74 @@ class TestMonthlyRolesUtilities:
         ]
 
         assert role_updates == expected_updates
+
+
+class TestRolePlan:
+    """Test cases for the diff-based monthly role reconciliation."""
+
+    @pytest.fixture
+    def guild(self):
+        """Create a simulated guild with the rank roles and five members."""
+        from config import config
+        from simulator import SimGuild
+
+        guild = SimGuild(900)
+        for role_id in config.roles:
+            guild.add_role(role_id)
+        for member_id in range(1, 5):
+            guild.add_member(member_id)
+        return guild
+
+    def test_only_changed_members_are_updated(self, guild):
+        """Test that members keeping their tier cost no API calls and swaps cost one."""
+        from config import config
+        from monthly_roles import apply_role_change, plan_role_changes
+
+        economy = guild.get_role(config.economy_class_role_id)
+        premium = guild.get_role(config.premium_economy_role_id)
+        business = guild.get_role(config.business_class_role_id)
+        rank_roles = {role_id: guild.get_role(role_id) for role_id in config.roles}
+
+        guild.get_member(1)._add_role(economy)  # Keeps Economy
+        guild.get_member(2)._add_role(economy)  # Moves up to Business
+        guild.get_member(3)._add_role(premium)  # Flew nothing this month
+        flight_hours = {"1": 30, "2": 300, "4": 90, "5": 30}  # Member 5 left
+
+        async def reconcile():
+            plan = await plan_role_changes(guild, rank_roles, flight_hours)
+            for member, add, remove in plan.changes:
+                await apply_role_change(member, add, remove)
+            return plan
+
+        plan = asyncio.run(reconcile())
+        assert plan.unchanged == 1
+        assert plan.missing == [5]
+        assert len(plan.changes) == 3
+        assert plan.api_calls() == 4  # Three changes and the fetch of member 5
+        assert plan.full_reset_calls == 10  # Three removals, four fetches and three adds
+        assert guild.http.requests == {"edit_member": 1, "member_roles": 2, "get_member": 1}
+
+        assert economy.members == [guild.get_member(1)]
+        assert business.members == [guild.get_member(2)]
+        assert premium.members == [guild.get_member(4)]
+        assert plan.role_count[config.economy_class_role_id] == 1
+
+    def test_role_summary_counts_each_role(self, guild):
+        """Test that role changes above the summary threshold are logged as one record of counts."""
+        from config import config
+        from monthly_roles import log_role_summary
+
+        economy = guild.get_role(config.economy_class_role_id)
+        premium = guild.get_role(config.premium_economy_role_id)
+        changes = [
+            (guild.get_member(1), [premium], [economy]),
+            (guild.get_member(2), [premium], [economy]),
+            (guild.get_member(3), [economy], []),
+        ]
+
+        with patch("monthly_roles.logger", info=AsyncMock()) as logger:
+            asyncio.run(log_role_summary(changes))
+
+        logger.info.assert_awaited_once_with(
+            f"Updated the rank roles of 3 members: {premium.name} +2 -0, {economy.name} +1 -2", "roles"
+        )
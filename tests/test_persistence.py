@@ -0,0 +1,93 @@
+"""
+Tests for persistence.py module.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from persistence import PersistenceScheduler
+
+
+class TestPersistenceScheduler:
+    """Test cases for PersistenceScheduler class."""
+
+    @pytest.mark.asyncio
+    async def test_burst_is_coalesced(self):
+        """Test that repeated saves of one file result in a single write."""
+        scheduler = PersistenceScheduler(interval=0.01)
+        scheduler.start()
+        first, latest = MagicMock(), MagicMock()
+
+        scheduler.mark_dirty("/data/current.json", first)
+        scheduler.mark_dirty("/data/current.json", latest)
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+
+        first.assert_not_called()
+        latest.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_write_runs_off_the_event_loop(self):
+        """Test that writes are performed in a worker thread."""
+        scheduler = PersistenceScheduler()
+        threads = []
+
+        scheduler.mark_dirty("/data/current.json", lambda: threads.append(threading.current_thread()))
+        await scheduler.flush()
+
+        assert threads and threads[0] is not threading.main_thread()
+
+    @pytest.mark.asyncio
+    async def test_flush_selected_files(self):
+        """Test that flushing some files writes them and leaves the others pending."""
+        scheduler = PersistenceScheduler()
+        evicted, other = MagicMock(), MagicMock()
+
+        scheduler.mark_dirty("/data/guilds/200/current.snap", evicted)
+        scheduler.mark_dirty("/data/current.snap", other)
+        await scheduler.flush(["/data/guilds/200/current.snap", "/data/guilds/200/settings.json"])
+
+        evicted.assert_called_once()
+        other.assert_not_called()
+        await scheduler.flush()
+        other.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_every_file(self):
+        """Test that flush writes all pending files."""
+        scheduler = PersistenceScheduler(interval=3600)
+        scheduler.start()
+        config_write, hours_write = MagicMock(), MagicMock()
+
+        scheduler.mark_dirty("/data/config.json", config_write)
+        scheduler.mark_dirty("/data/current.json", hours_write)
+        assert await scheduler.flush() is True
+        await scheduler.stop()
+
+        config_write.assert_called_once()
+        hours_write.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_failed_write_is_retried(self):
+        """Test that a failed write stays pending for the next flush."""
+        scheduler = PersistenceScheduler()
+        write = MagicMock(side_effect=[OSError("disk full"), None])
+
+        scheduler.mark_dirty("/data/current.json", write)
+        assert await scheduler.flush() is False
+        assert await scheduler.flush() is True
+
+        assert write.call_count == 2
+
+    def test_not_running_before_start(self):
+        """Test that the scheduler reports it is not running until started."""
+        scheduler = PersistenceScheduler()
+        assert scheduler.running is False
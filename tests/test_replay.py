@@ -0,0 +1,150 @@
+"""
+Tests for replay.py module.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import flight_logs
+from config import partitions
+from replay import (
+    RECORD_VERSION,
+    EventRecorder,
+    ReplayDriver,
+    read_recording,
+    replay_partition,
+)
+
+STARTED = 1700000000.0
+
+
+class TestEventRecorder:
+    """Test cases for the EventRecorder class."""
+
+    def test_anonymize(self, tmp_path):
+        """Test that IDs become small numbers, except the configured ones."""
+        recorder = EventRecorder(str(tmp_path / "night.jsonl"), 1, {42: "log_channel_id"})
+        assert recorder.anonymize(987654321987654321) == 1
+        assert recorder.anonymize(123456789123456789) == 2
+        assert recorder.anonymize(987654321987654321) == 1
+        assert recorder.anonymize(42) == "log_channel_id"
+        assert recorder.anonymize_name("Friday Night Flight") == "Event 1"
+        recorder.close()
+
+    def test_round_trip(self, tmp_path):
+        """Test that recorded voice changes are read back in order, compressed or not."""
+        for name in ("night.jsonl", "night.jsonl.gz"):
+            path = str(tmp_path / name)
+            recorder = EventRecorder(path, 1)
+            member = SimpleNamespace(id=555000000000000001, bot=False)
+            channel = SimpleNamespace(id=777000000000000001)
+            recorder.voice(member, SimpleNamespace(channel=None), SimpleNamespace(channel=channel))
+            recorder.voice(member, SimpleNamespace(channel=channel), SimpleNamespace(channel=None))
+            recorder.close()
+
+            header, records = read_recording(path)
+            assert header["v"] == RECORD_VERSION
+            assert [(r["k"], r["m"], r["b"], r["a"]) for r in records] == [
+                ("voice", 1, None, 2),
+                ("voice", 1, 2, None),
+            ]
+
+    def test_records_are_written_in_the_background(self, tmp_path):
+        """Test that recording only queues, and a background thread writes the records."""
+        path = str(tmp_path / "night.jsonl")
+        recorder = EventRecorder(path, 1)
+        writers = set()
+        write = recorder._file.write
+
+        def tracked(text):
+            writers.add(threading.current_thread().name)
+            return write(text)
+
+        recorder._file.write = tracked
+        member = SimpleNamespace(id=555000000000000001, bot=False)
+        channel = SimpleNamespace(id=777000000000000001)
+        for _ in range(50):
+            recorder.voice(member, SimpleNamespace(channel=None), SimpleNamespace(channel=channel))
+        recorder.flush()
+
+        assert writers == {"gateway-recorder"}
+        assert len(read_recording(path)[1]) == 50
+        recorder.close()
+
+    def test_bot_imports_replay_only_when_recording(self):
+        """Test that the bot does not load the replay tools (and the simulator) unless recording."""
+        code = "import sys, bot; print('replay' in sys.modules, 'simulator' in sys.modules)"
+        environment = {k: v for k, v in os.environ.items() if k != "GATEWAY_RECORD_PATH"}
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=environment,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert result.stdout.splitlines()[-1] == "False False"
+
+    def test_not_a_recording(self, tmp_path):
+        """Test that files of another format are rejected."""
+        path = tmp_path / "other.jsonl"
+        path.write_text(json.dumps({"v": RECORD_VERSION + 1}) + "\n")
+        with pytest.raises(ValueError):
+            read_recording(str(path))
+
+
+class TestReplayDriver:
+    """Test cases for the ReplayDriver class."""
+
+    @pytest.fixture
+    def recording(self):
+        """An event during which one member flies for 30 minutes."""
+        header = {"v": RECORD_VERSION, "started": STARTED}
+        records = [
+            {"k": "event", "t": 0, "e": 1, "n": "Event 1", "s": "active", "c": 5},
+            {"k": "voice", "t": 60, "m": 2, "bot": False, "b": None, "a": 5},
+            {"k": "voice", "t": 90, "m": 3, "bot": True, "b": None, "a": 5},
+            {"k": "voice", "t": 1860, "m": 2, "bot": False, "b": 5, "a": None},
+            {"k": "event", "t": 1900, "e": 1, "n": "Event 1", "s": "ended", "c": 5},
+        ]
+        return header, records
+
+    def replay(self, tmp_path, recording, speed):
+        header, records = recording
+        driver = ReplayDriver(
+            replay_partition(str(tmp_path)),
+            {
+                "voice": flight_logs.on_voice_state_update,
+                "event": flight_logs.on_scheduled_event_update,
+            },
+            lambda name: None,
+            speed=speed,
+        )
+        report = asyncio.run(driver.run(header, records, partitions))
+        return driver, report
+
+    def test_replay_logs_flight_time(self, tmp_path, recording):
+        """Test that a replayed event credits the minutes between the recorded times."""
+        driver, report = self.replay(tmp_path / "a", recording, speed=0)
+
+        assert driver.partition.flight_hours.minutes(2) == 30
+        assert driver.partition.flight_hours.minutes(3) == 0
+        assert report["records"] == 5
+        assert report["errors"] == 0
+        assert report["handlers"]["voice"]["count"] == 3
+        assert driver.partition.guild_id not in [p.guild_id for p in partitions.loaded()]
+
+    def test_same_state_at_any_speed(self, tmp_path, recording):
+        """Test that the final state hash does not depend on the playback speed."""
+        _, fast = self.replay(tmp_path / "a", recording, speed=0)
+        _, paced = self.replay(tmp_path / "b", recording, speed=200000)
+        assert fast["state_hash"] == paced["state_hash"]
@@ -0,0 +1,132 @@
+"""
+Tests for role_executor.py module.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+import pytest
+
+from role_executor import RoleExecutor, RoleOperation, classify
+from simulator import FakeHTTP, SimGuild, SimResponse
+
+ROLE_ID = 10
+
+
+def member(member_id):
+    return SimGuild(900).add_member(member_id)
+
+
+class TestRoleExecutor:
+    """Test cases for the bounded-concurrency role executor."""
+
+    @pytest.fixture
+    def executor(self):
+        """Create an executor that backs off for at most a few milliseconds."""
+        return RoleExecutor(workers=3, max_retries=2, backoff_base=0.001, backoff_cap=0.005)
+
+    def test_classify(self):
+        """Test that rate limits and server errors are retried and client errors are not."""
+        assert classify(discord.RateLimited(1.5)) == (True, 1.5)
+        assert classify(discord.DiscordServerError(SimResponse(503, "Unavailable"), "")) == (True, None)
+        assert classify(discord.NotFound(SimResponse(404, "Not Found"), "Unknown Member")) == (False, None)
+        assert classify(discord.Forbidden(SimResponse(403, "Forbidden"), "Missing Permissions")) == (False, None)
+        assert classify(asyncio.TimeoutError()) == (True, None)
+        assert classify(ValueError()) == (False, None)
+
+    def test_workers_are_bounded(self, executor):
+        """Test that no more than `workers` operations run at once."""
+        running = []
+        peak = []
+
+        async def call():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.001)
+            running.pop()
+
+        operations = [RoleOperation(member(i), call) for i in range(1, 21)]
+        report = asyncio.run(executor.run("Bounded", operations))
+        assert len(report.succeeded) == 20
+        assert max(peak) == 3
+
+    def test_permanent_errors_are_not_retried(self, executor):
+        """Test that a member who left fails once instead of being retried forever."""
+
+        async def call():
+            raise discord.NotFound(SimResponse(404, "Not Found"), "Unknown Member")
+
+        operation = RoleOperation(member(1), call)
+        report = asyncio.run(executor.run("Permanent", [operation]))
+        assert operation.attempts == 1
+        assert report.retries == 0
+        assert "Unknown Member" in report.failed[0][1]
+
+    def test_transient_errors_are_retried_up_to_the_cap(self, executor):
+        """Test that transient errors are retried, and given up on after max_retries."""
+        outcomes = [OSError("reset"), None]
+
+        async def flaky():
+            error = outcomes.pop(0)
+            if error:
+                raise error
+
+        async def broken():
+            raise discord.DiscordServerError(SimResponse(503, "Unavailable"), "")
+
+        recovered, failing = RoleOperation(member(1), flaky), RoleOperation(member(2), broken)
+        report = asyncio.run(executor.run("Transient", [recovered, failing]))
+        assert report.succeeded == [recovered]
+        assert recovered.attempts == 2
+        assert failing.attempts == 3
+        assert report.retries == 3
+
+    def test_rate_limits_pause_and_slow_the_pace(self, executor):
+        """Test that rate limited operations wait as asked and widen the interval."""
+        guild = SimGuild(900, FakeHTTP(limits={"member_roles": (4, 0.05)}, max_wait=0.01))
+        role = guild.add_role(ROLE_ID)
+        for member_id in range(1, 13):
+            guild.add_member(member_id)._add_role(role)
+
+        operations = [
+            RoleOperation(holder, lambda holder=holder: holder.remove_roles(role), f"Removed {holder.mention}")
+            for holder in role.members
+        ]
+        logged = []
+
+        async def log(message):
+            logged.append(message)
+
+        report = asyncio.run(executor.run("Rate Limited", operations, log=log))
+        assert role.members == []
+        assert report.failed == []
+        assert report.rate_limited > 0
+        assert len(logged) == 12
+        assert "12/12 role changes applied" in report.summary()
+
+    def test_empty_buckets_pause_before_a_rate_limit(self, executor):
+        """Test that a bucket whose headers show nothing remaining pauses the workers without a 429."""
+        http = FakeHTTP(limits={"member_roles": (4, 0.05)}, time_scale=1.0)
+        guild = SimGuild(900, http)
+        role = guild.add_role(ROLE_ID)
+        for member_id in range(1, 13):
+            guild.add_member(member_id)._add_role(role)
+
+        remaining = []
+        observe = executor.observe
+        executor.observe = lambda left, reset_after: remaining.append(left) or observe(left, reset_after)
+
+        operations = [
+            RoleOperation(holder, lambda holder=holder: holder.remove_roles(role))
+            for holder in role.members
+        ]
+        report = asyncio.run(executor.run("Paced", operations))
+        assert role.members == []
+        assert 0 in remaining  # The headers showed an empty bucket
+        assert http.rate_limited == {}  # Never sent to an empty bucket
+        assert report.rate_limited == 0
+        assert report.waited > 0
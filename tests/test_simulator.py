@@ -0,0 +1,149 @@
+"""
+Tests for simulator.py module.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+import pytest
+
+from ratelimit import RateWindow
+from simulator import FakeHTTP, SimGuild, run_benchmark
+
+GUILD_ID = 900
+
+
+class TestFakeHTTP:
+    """Test cases for the rate-limited fake HTTP layer."""
+
+    def test_bucket_window(self):
+        """Test that a bucket allows `limit` requests per window."""
+        bucket = RateWindow(2, 10.0)
+        assert bucket.wait(0.0) == 0.0
+        assert bucket.wait(1.0) == 0.0
+        assert bucket.wait(4.0) == 6.0
+        assert bucket.wait(10.0) == 0.0
+
+    def test_waits_are_simulated(self):
+        """Test that rate limit waits move the simulated clock instead of sleeping."""
+        http = FakeHTTP(limits={"member_roles": (5, 10.0)})
+
+        async def change_roles():
+            for _ in range(12):
+                await http.request("member_roles", GUILD_ID)
+
+        asyncio.run(change_roles())
+        assert http.requests == {"member_roles": 12}
+        assert http.rate_limited == {"member_roles": 2}
+        assert http.now() >= 20.0
+        assert http.waited == pytest.approx(20.0, abs=0.5)
+
+    def test_buckets_are_per_major_parameter(self):
+        """Test that each channel has its own message bucket."""
+        http = FakeHTTP(limits={"send_message": (1, 5.0)})
+
+        async def send():
+            await http.request("send_message", 1)
+            await http.request("send_message", 2)
+
+        asyncio.run(send())
+        assert http.rate_limited == {}
+
+    def test_max_wait(self):
+        """Test that waits above max_wait raise discord.RateLimited."""
+        http = FakeHTTP(limits={"send_message": (1, 5.0)}, max_wait=1.0)
+
+        async def send_twice():
+            await http.request("send_message", 1)
+            await http.request("send_message", 1)
+
+        with pytest.raises(discord.RateLimited):
+            asyncio.run(send_twice())
+
+
+class TestSimGuild:
+    """Test cases for the simulated guild."""
+
+    @pytest.fixture
+    def guild(self):
+        guild = SimGuild(GUILD_ID)
+        guild.add_role(10, "Captain")
+        guild.add_voice_channel(20)
+        guild.add_voice_channel(21)
+        for member_id in (1, 2):
+            guild.add_member(member_id)
+        return guild
+
+    def test_roles_track_members(self, guild):
+        """Test that role.members follows add_roles and remove_roles."""
+        role = guild.get_role(10)
+        member = guild.get_member(1)
+
+        asyncio.run(member.add_roles(role))
+        assert role.members == [member]
+        assert member.roles == [guild.default_role, role]
+
+        asyncio.run(member.remove_roles(role))
+        assert role.members == []
+        assert guild.http.requests == {"member_roles": 2}
+
+    def test_voice_channels_track_members(self, guild):
+        """Test that moving members updates the channels' members and the voice states."""
+        member = guild.get_member(1)
+        first, second = guild.get_channel(20), guild.get_channel(21)
+
+        before, after = guild.move_member(member, first)
+        assert before.channel is None and after.channel is first
+        assert first.members == [member]
+
+        before, after = guild.move_member(member, second)
+        assert before.channel is first and member.voice.channel is second
+        assert first.members == [] and second.members == [member]
+
+    def test_closed_direct_messages(self, guild):
+        """Test that members with closed DMs raise discord.Forbidden."""
+        member = guild.get_member(2)
+        member.dm_closed = True
+        with pytest.raises(discord.Forbidden):
+            asyncio.run(member.send("Boarding pass"))
+
+    def test_fetch_unknown_member(self, guild):
+        """Test that fetching a member who left raises discord.NotFound."""
+        with pytest.raises(discord.NotFound):
+            asyncio.run(guild.fetch_member(3))
+
+
+class TestBenchmarks:
+    """Test cases for running the bot's handlers against a simulated guild."""
+
+    def test_event_start(self):
+        """Test that an event start burst logs every member in the channel."""
+        report = asyncio.run(run_benchmark("event_start", 20))
+        assert report["log_messages"] > 0
+        assert report["http"]["requests"]["send_message"] == report["log_messages"]
+
+    def test_checkin(self):
+        """Test that every member checking in receives a pass and the check-in role."""
+        report = asyncio.run(run_benchmark("checkin", 5))
+        assert report["http"]["requests"]["create_dm"] == 5
+        assert report["http"]["requests"]["member_roles"] == 5
+
+    def test_command_line_report_is_clean_json(self):
+        """Test that the command line prints only the JSON report on stdout."""
+        environment = {"PATH": os.environ.get("PATH", ""), "HOME": os.environ.get("HOME", "")}
+        result = subprocess.run(
+            [sys.executable, "simulator.py", "checkin", "--members", "5"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=environment,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        assert result.returncode == 0, result.stderr
+        assert json.loads(result.stdout)["scenario"] == "checkin"
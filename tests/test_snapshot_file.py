@@ -0,0 +1,168 @@
+"""
+Tests for snapshot_file.py module.
+"""
+
+import gzip
+import io
+import json
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from config import FlightHours
+from snapshot_file import (
+    HEADER,
+    MAGIC,
+    SCHEMA_VERSION,
+    SnapshotError,
+    convert,
+    read_snapshot,
+    read_state,
+    write_snapshot,
+)
+from storage import JSONStorage
+
+MEMBER_A = "123456789012345678"
+MEMBER_B = "876543210987654321"
+
+
+class TestSnapshotFile:
+    """Test cases for the binary snapshot format."""
+
+    @pytest.fixture
+    def state(self):
+        """A state in the form of FlightHours.snapshot_state()."""
+        return {
+            "seq": 42,
+            "period": "2025-03",
+            "active_event": "Event B",
+            "voice_channels": ["111", "222"],
+            "active_events": {"Event A": [111], "Event B": [222]},
+            "session_events": {MEMBER_B: "Event B"},
+            "flight_hours": {MEMBER_A: 90, MEMBER_B: 15},
+            "heartbeat": 1700000300.0,
+            "start_time": {MEMBER_B: 1700000000.5},
+            "accrued": {MEMBER_B: 4},
+            "event_history": {"Event A": [MEMBER_A], "Event B": [MEMBER_A, MEMBER_B], "Ünïcode": []},
+        }
+
+    def encode(self, state):
+        file = io.BytesIO()
+        write_snapshot(file, state)
+        return file.getvalue()
+
+    def test_round_trip(self, state):
+        """Test that a snapshot decodes to the state it was written from."""
+        assert read_snapshot(io.BytesIO(self.encode(state))) == state
+
+    def test_smaller_than_json(self, state):
+        """Test that the snapshot is smaller than even minified JSON."""
+        state["flight_hours"] = {str(10**17 + i): i for i in range(1000)}
+        assert len(self.encode(state)) < len(json.dumps(state, separators=(",", ":")))
+
+    def test_checksum_mismatch(self, state):
+        """Test that a flipped payload byte is detected."""
+        data = bytearray(self.encode(state))
+        data[-1] ^= 0xFF
+        with pytest.raises(SnapshotError, match="checksum"):
+            read_snapshot(io.BytesIO(bytes(data)))
+
+    def test_truncated(self, state):
+        """Test that a torn write is detected."""
+        data = self.encode(state)
+        with pytest.raises(SnapshotError, match="truncated"):
+            read_snapshot(io.BytesIO(data[:-5]))
+        with pytest.raises(SnapshotError, match="truncated"):
+            read_snapshot(io.BytesIO(data[:6]))
+
+    def test_unknown_format(self, state):
+        """Test that other files and newer schema versions are rejected."""
+        with pytest.raises(SnapshotError):
+            read_snapshot(io.BytesIO(b"XXXX" + self.encode(state)[4:]))
+
+        header = HEADER.pack(MAGIC, SCHEMA_VERSION + 1, 0, 0, 0)
+        with pytest.raises(SnapshotError, match="version"):
+            read_snapshot(io.BytesIO(header))
+
+    def test_read_state_accepts_legacy_json(self, tmp_path, state):
+        """Test that read_state reads snapshots and JSON, compressed or not."""
+        snapshot_path = str(tmp_path / "current.snap.gz")
+        with gzip.open(snapshot_path, "wb") as file:
+            file.write(self.encode(state))
+        json_path = str(tmp_path / "current.json")
+        with open(json_path, "w") as file:
+            json.dump(state, file)
+
+        assert read_state(snapshot_path) == state
+        assert read_state(json_path) == state
+
+    def test_convert(self, tmp_path):
+        """Test converting a legacy file with ISO session starts."""
+        json_path = str(tmp_path / "current.json")
+        with open(json_path, "w") as file:
+            json.dump(
+                {
+                    "flight_hours": {MEMBER_A: 45},
+                    "start_time": {MEMBER_A: "2023-11-14T22:13:20+00:00"},
+                    "event_history": {"Event A": [MEMBER_A]},
+                },
+                file,
+            )
+
+        snapshot_path = str(tmp_path / "current.snap")
+        convert(json_path, snapshot_path)
+
+        state = read_state(snapshot_path)
+        assert state["start_time"] == {MEMBER_A: 1700000000.0}
+        assert state["flight_hours"] == {MEMBER_A: 45}
+
+
+class TestJSONStorageSnapshots:
+    """Test cases for snapshots written by JSONStorage."""
+
+    def test_upgrades_legacy_json(self, tmp_path):
+        """Test that a JSON snapshot of an older version is converted on load."""
+        legacy_path = str(tmp_path / "current.json")
+        with open(legacy_path, "w") as file:
+            json.dump({"flight_hours": {MEMBER_A: 45}, "event_history": {"Event A": [MEMBER_A]}}, file)
+
+        snapshot_path = str(tmp_path / "current.snap")
+        manager = FlightHours(JSONStorage(snapshot_path))
+        manager.load()
+        manager.storage.close()
+
+        with open(snapshot_path, "rb") as file:
+            assert file.read(len(MAGIC)) == MAGIC
+        restored = FlightHours(JSONStorage(snapshot_path))
+        restored.load()
+        assert restored.flight_hours == {MEMBER_A: 45}
+        assert restored.event_members("Event A") == [MEMBER_A]
+        restored.storage.close()
+
+    def test_damaged_snapshot_uses_previous_version(self, tmp_path):
+        """Test that a snapshot failing its checksum falls back to the .backup copy."""
+        snapshot_path = str(tmp_path / "current.snap")
+        manager = FlightHours(JSONStorage(snapshot_path))
+        manager.load()
+        manager.adjust_flight_time(MEMBER_A, 30)
+        manager.storage.checkpoint(manager)
+        manager.adjust_flight_time(MEMBER_A, 15)
+        manager.storage.checkpoint(manager)
+        manager.storage.close()
+
+        # Corrupt the last byte of the snapshot
+        with open(snapshot_path, "r+b") as file:
+            file.seek(-1, os.SEEK_END)
+            last = file.read(1)
+            file.seek(-1, os.SEEK_END)
+            file.write(struct.pack("B", last[0] ^ 0xFF))
+
+        restored = FlightHours(JSONStorage(snapshot_path))
+        restored.load()
+        assert restored.flight_hours == {MEMBER_A: 30}
+        assert os.path.exists(f"{snapshot_path}.corrupt")
+        restored.storage.close()
@@ -0,0 +1,119 @@
+"""
+Tests for state.py module and versioned snapshots of FlightHours.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from config import FlightHours
+from state import SingleWriter
+from storage import JSONStorage
+
+MEMBER_A = 123456789012345678
+MEMBER_B = 234567890123456789
+
+
+class TestSingleWriter:
+    """Test cases for SingleWriter class."""
+
+    def test_unbound_writer_runs_inline(self):
+        """Test that calls run on the caller until a loop is bound."""
+        writer = SingleWriter()
+        assert writer.call(threading.get_ident) == threading.get_ident()
+
+    @pytest.mark.asyncio
+    async def test_calls_from_threads_run_on_the_loop(self):
+        """Test that worker threads are handed to the event loop."""
+        writer = SingleWriter()
+        writer.bind()
+
+        thread_id = await asyncio.to_thread(writer.call, threading.get_ident)
+        assert thread_id == threading.get_ident()
+
+    @pytest.mark.asyncio
+    async def test_exceptions_reach_the_caller(self):
+        """Test that an exception raised on the writer is re-raised in the thread."""
+        writer = SingleWriter()
+        writer.bind()
+
+        def fail():
+            raise ValueError("bad record")
+
+        with pytest.raises(ValueError):
+            await asyncio.to_thread(writer.call, fail)
+
+
+class TestFlightHoursSnapshot:
+    """Test cases for versioned FlightHours snapshots."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Create a flight hours manager with JSON storage."""
+        manager = FlightHours(JSONStorage(str(tmp_path / "current.snap")))
+        manager.load()
+        return manager
+
+    def test_snapshot_has_the_current_version(self, manager):
+        """Test that a snapshot carries the version of the last mutation."""
+        manager.adjust_flight_time(MEMBER_A, 30)
+        snapshot = manager.snapshot()
+        assert snapshot.version == manager.seq
+
+        manager.adjust_flight_time(MEMBER_A, 15)
+        assert manager.snapshot().version == snapshot.version + 1
+
+    def test_snapshot_is_isolated_from_the_writer(self, manager):
+        """Test that later mutations do not change an existing snapshot."""
+        manager.add_event("Event A")
+        manager.adjust_flight_time(MEMBER_A, 30)
+        snapshot = manager.snapshot()
+
+        manager.adjust_flight_time(MEMBER_A, 15)
+        manager.add_attendance("Event A", MEMBER_A)
+
+        assert snapshot.minutes(MEMBER_A) == 30
+        assert snapshot.to_dict()["event_history"] == {"Event A": []}
+        assert manager.minutes(MEMBER_A) == 45
+
+    def test_snapshot_is_immutable(self, manager):
+        """Test that snapshot attributes cannot be reassigned."""
+        snapshot = manager.snapshot()
+        with pytest.raises(AttributeError):
+            snapshot.period = "2025-01"
+
+    def test_leaderboard_is_cached(self, manager):
+        """Test that the ranking is reused until minutes change."""
+        manager.adjust_flight_time(MEMBER_A, 30)
+        manager.adjust_flight_time(MEMBER_B, 90)
+        assert manager.top_flight_hours(1) == [(str(MEMBER_B), 90)]
+
+        cached = manager.members._top
+        manager.add_event("Event A")
+        manager.top_flight_hours(1)
+        assert manager.members._top is cached
+
+        manager.adjust_flight_time(MEMBER_A, 120)
+        assert manager.top_flight_hours(1) == [(str(MEMBER_A), 150)]
+
+    @pytest.mark.asyncio
+    async def test_mutations_from_threads_run_on_the_writer(self, manager):
+        """Test that a mutation made from a worker thread is applied on the loop."""
+        manager.writer.bind()
+        applied_on = []
+        original = manager.apply_record
+
+        def apply_record(record):
+            applied_on.append(threading.get_ident())
+            original(record)
+
+        manager.apply_record = apply_record
+        await asyncio.to_thread(manager.adjust_flight_time, MEMBER_A, 30)
+
+        assert applied_on == [threading.get_ident()]
+        assert manager.minutes(MEMBER_A) == 30
@@ -0,0 +1,436 @@
+"""
+Tests for storage.py module.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from config import FlightHours
+from storage import JSONStorage, SQLiteStorage, create_storage
+
+MEMBER_A = "123456789012345678"
+MEMBER_B = "223456789012345678"
+
+
+class TestSQLiteStorage:
+    """Test cases for SQLiteStorage class."""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        """Path of the flight hours database."""
+        return str(tmp_path / "flight_hours" / "flight_hours.db")
+
+    @pytest.fixture
+    def manager(self, db_path):
+        """Create a FlightHours manager backed by SQLite."""
+        manager = FlightHours(SQLiteStorage(db_path))
+        manager.load()
+        yield manager
+        manager.storage.close()
+
+    def reload(self, db_path):
+        restored = FlightHours(SQLiteStorage(db_path))
+        restored.load()
+        return restored
+
+    def test_database_uses_wal(self, manager):
+        """Test that the database is opened in WAL mode."""
+        mode = manager.storage._query("PRAGMA journal_mode")[0][0]
+        assert mode == "wal"
+
+    def test_mutations_survive_reload(self, manager, db_path):
+        """Test that committed records rebuild the same state."""
+        manager.add_event("Event A")
+        manager.add_event("Event B")
+        manager.adjust_flight_time(MEMBER_A, 90)
+        manager.add_attendance("Event A", MEMBER_A)
+        manager.add_attendance("Event B", MEMBER_A)
+        manager.add_attendance("Event B", MEMBER_B)
+        manager.remove_attendance("Event B", MEMBER_A)
+        manager.save()
+        manager.storage.close()
+
+        restored = self.reload(db_path)
+        assert restored.flight_hours == {MEMBER_A: 90}
+        assert list(restored.event_history) == ["Event A", "Event B"]
+        assert restored.event_history["Event B"] == {MEMBER_B}
+        assert restored.member_history[MEMBER_A] == {"Event A"}
+        restored.storage.close()
+
+    def test_open_sessions_survive_reload(self, manager, db_path):
+        """Test that open sessions are restored with their start time."""
+        manager.start_event("Event A")
+        manager._record("start", m=MEMBER_A, t=1700000000.0)
+        manager.save()
+        manager.storage.close()
+
+        restored = self.reload(db_path)
+        assert restored.active_event == "Event A"
+        assert restored.start_time[MEMBER_A].timestamp() == 1700000000.0
+        restored.storage.close()
+
+    def test_end_event_closes_sessions(self, manager):
+        """Test that ending an event removes the stored sessions."""
+        manager.start_event("Event A")
+        manager._record("start", m=MEMBER_A, t=1700000000.0)
+        manager._record("end", m=MEMBER_A, min=30, ev="Event A")
+        manager.end_event()
+
+        assert manager.storage._query("SELECT * FROM sessions") == []
+        assert manager.event_members("Event A") == [MEMBER_A]
+
+    def test_bulk_sessions_survive_reload(self, manager, db_path):
+        """Test that sessions started and ended together are one record each."""
+        members = [
+            SimpleNamespace(id=int(MEMBER_A), bot=False),
+            SimpleNamespace(id=int(MEMBER_B), bot=False),
+            SimpleNamespace(id=1, bot=True),
+        ]
+        manager.start_event("Event A")
+        seq = manager.seq
+        assert manager.start_sessions(members) == [int(MEMBER_A), int(MEMBER_B)]
+        assert manager.start_sessions(members) == []
+        assert manager.seq == seq + 1
+
+        # Back-date one session so it counts towards attendance
+        manager._record("start", m=MEMBER_A, t=manager.members.session_start(MEMBER_A) - 600)
+        ended = manager.end_sessions()
+        assert ended == {int(MEMBER_A): 10, int(MEMBER_B): 0}
+        assert manager.end_sessions() == {}
+        manager.save()
+        manager.storage.close()
+
+        restored = self.reload(db_path)
+        assert restored.flight_hours == {MEMBER_A: 10, MEMBER_B: 0}
+        assert restored.event_members("Event A") == [MEMBER_A]
+        assert restored.start_time == {}
+        restored.storage.close()
+
+    def test_reconcile_with_voice_channels(self, manager, db_path):
+        """Test that sessions are matched to the members found in the voice channels."""
+        manager.start_event("Event A")
+        manager._record("start", m=MEMBER_A, t=1700000000.0)
+
+        # Member A left and member B joined while the bot was not watching
+        present = [SimpleNamespace(id=int(MEMBER_B), bot=False), SimpleNamespace(id=1, bot=True)]
+        at = 1700000000.0 + 20 * 60
+        started, ended = manager.reconcile({"Event A": present}, joined_at=at, left_at=at)
+        assert started == [int(MEMBER_B)]
+        assert ended == {int(MEMBER_A): 20}
+        assert manager.reconcile({"Event A": present}) == ([], {})
+        manager.save()
+        manager.storage.close()
+
+        restored = self.reload(db_path)
+        assert restored.flight_hours == {MEMBER_A: 20}
+        assert list(restored.start_time) == [MEMBER_B]
+        assert restored.start_time[MEMBER_B].timestamp() == 1700000000.0 + 20 * 60
+        restored.storage.close()
+
+    def test_concurrent_events(self, manager, db_path):
+        """Test that concurrent events keep their own channels, sessions and attendance."""
+        member_a = SimpleNamespace(id=int(MEMBER_A), bot=False)
+        member_b = SimpleNamespace(id=int(MEMBER_B), bot=False)
+        manager.start_event("Event A", SimpleNamespace(id=111))
+        manager.start_event("Event B", SimpleNamespace(id=222))
+        manager.start_sessions([member_a], at=1700000000.0, event_name="Event A")
+        manager.start_sessions([member_b], at=1700000000.0, event_name="Event B")
+        assert manager.event_for_channel(SimpleNamespace(id=111)) == "Event A"
+        assert manager.event_for_channel(SimpleNamespace(id=222)) == "Event B"
+
+        # Ending one event leaves the other running
+        ended = manager.end_sessions(at=1700000000.0 + 600, event_name="Event A")
+        assert ended == {int(MEMBER_A): 10}
+        manager.end_event("Event A")
+        assert list(manager.events) == ["Event B"]
+        assert manager.open_sessions() == [int(MEMBER_B)]
+        manager.save()
+        manager.storage.close()
+
+        restored = self.reload(db_path)
+        assert restored.events == {"Event B": {222: None}}
+        assert restored.channel_events == {222: "Event B"}
+        assert restored.session_event(MEMBER_B) == "Event B"
+        assert restored.event_members("Event A") == [MEMBER_A]
+
+        # Members leaving count towards the event of their own session
+        restored.log_end_time(MEMBER_B, at=1700000000.0 + 900)
+        assert restored.event_members("Event B") == [MEMBER_B]
+        restored.storage.close()
+
+    def test_reconcile_moves_members_between_events(self, manager):
+        """Test that a member found at another event is moved to it."""
+        member_a = SimpleNamespace(id=int(MEMBER_A), bot=False)
+        manager.start_event("Event A", SimpleNamespace(id=111))
+        manager.start_event("Event B", SimpleNamespace(id=222))
+        manager.start_sessions([member_a], at=1700000000.0, event_name="Event A")
+
+        at = 1700000000.0 + 10 * 60
+        started, ended = manager.reconcile(
+            {"Event A": [], "Event B": [member_a]}, joined_at=at, left_at=at
+        )
+        assert started == [int(MEMBER_A)]
+        assert ended == {int(MEMBER_A): 10}
+        assert manager.session_event(MEMBER_A) == "Event B"
+        assert manager.event_members("Event A") == [MEMBER_A]
+
+    def test_single_event_database_is_upgraded(self, db_path):
+        """Test that a database written before concurrent events keeps its event and sessions."""
+        os.makedirs(os.path.dirname(db_path))
+        conn = sqlite3.connect(db_path)
+        conn.executescript(
+            """
+            CREATE TABLE sessions (member_id INTEGER PRIMARY KEY, start REAL NOT NULL);
+            CREATE TABLE state (key TEXT PRIMARY KEY, value TEXT);
+            INSERT INTO sessions VALUES (123456789012345678, 1700000000.0);
+            INSERT INTO state VALUES ('seq', '5'), ('active_event', '"Event A"'),
+                ('voice_channels', '[111]');
+            """
+        )
+        conn.close()
+
+        restored = self.reload(db_path)
+        assert restored.events == {"Event A": {111: None}}
+        assert restored.session_event(MEMBER_A) == "Event A"
+        restored.start_event("Event B")
+        restored.end_event("Event A")
+        assert restored.storage._query("SELECT event FROM sessions") == []
+        restored.storage.close()
+
+    def test_checkpointed_sessions_survive_reload(self, manager, db_path):
+        """Test that credited minutes and the heartbeat are kept and not credited twice."""
+        manager.start_event("Event A")
+        manager._record("start", m=MEMBER_A, t=1700000000.0)
+        assert manager.accrue_sessions(manager.open_sessions(), at=1700000000.0 + 30 * 60) == 1
+        manager.save()
+        manager.storage.close()
+
+        restored = self.reload(db_path)
+        assert restored.heartbeat == 1700000000.0 + 30 * 60
+        assert restored.flight_hours == {MEMBER_A: 30}
+        assert restored.members.accrued(MEMBER_A) == 30
+
+        # Ending the session credits only the rest and still counts the whole stay
+        assert restored.end_sessions(at=1700000000.0 + 40 * 60) == {int(MEMBER_A): 40}
+        assert restored.flight_hours == {MEMBER_A: 40}
+        assert restored.event_members("Event A") == [MEMBER_A]
+        restored.storage.close()
+
+    def test_adds_accrued_column_to_old_databases(self, db_path):
+        """Test that a sessions table without the accrued column is migrated."""
+        os.makedirs(os.path.dirname(db_path))
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE sessions (member_id INTEGER PRIMARY KEY, start REAL NOT NULL)")
+        conn.execute("INSERT INTO sessions VALUES (?, ?)", (int(MEMBER_A), 1700000000.0))
+        conn.execute("CREATE TABLE state (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT INTO state VALUES ('seq', '1')")
+        conn.commit()
+        conn.close()
+
+        restored = self.reload(db_path)
+        assert restored.start_time[MEMBER_A].timestamp() == 1700000000.0
+        assert restored.members.accrued(MEMBER_A) == 0
+        restored.storage.close()
+
+    def test_indexed_queries(self, manager):
+        """Test leaderboard and attendance queries."""
+        manager.adjust_flight_time(MEMBER_A, 30)
+        manager.adjust_flight_time(MEMBER_B, 120)
+        manager.add_event("Event A")
+        manager.add_attendance("Event A", MEMBER_B)
+
+        assert manager.top_flight_hours(1) == [(MEMBER_B, 120)]
+        assert manager.event_names() == ["Event A"]
+        assert manager.event_members("Event A") == [MEMBER_B]
+        assert manager.member_events(MEMBER_B) == ["Event A"]
+        assert manager.member_events(MEMBER_A) == []
+
+    def test_queries_do_not_wait_on_the_database(self, manager):
+        """Test that attendance queries are answered while a backup holds the connection."""
+        manager.add_event("Event A")
+        manager.add_attendance("Event A", MEMBER_B)
+
+        holding, release = threading.Event(), threading.Event()
+
+        def hold_connection():
+            with manager.storage._conn_lock:
+                holding.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=hold_connection)
+        thread.start()
+        holding.wait(5)
+        try:
+            assert manager.event_names() == ["Event A"]
+            assert manager.event_members("Event A") == [MEMBER_B]
+            assert manager.member_events(MEMBER_B) == ["Event A"]
+        finally:
+            release.set()
+            thread.join()
+
+    def test_remove_event_removes_attendance(self, manager):
+        """Test that removing an event cascades to its attendance."""
+        manager.add_event("Event A")
+        manager.add_attendance("Event A", MEMBER_A)
+        manager.remove_event("Event A")
+
+        assert manager.member_events(MEMBER_A) == []
+        assert manager.storage._query("SELECT * FROM attendance") == []
+
+    def test_adjust_never_goes_negative(self, manager):
+        """Test that removing more time than recorded floors at zero."""
+        manager.adjust_flight_time(MEMBER_A, 10)
+        manager.adjust_flight_time(MEMBER_A, -30)
+
+        assert manager.top_flight_hours(1) == [(MEMBER_A, 0)]
+
+    def test_clear(self, manager):
+        """Test that clearing removes all flight data."""
+        manager.adjust_flight_time(MEMBER_A, 10)
+        manager.add_event("Event A")
+        manager.clear()
+
+        assert manager.top_flight_hours(10) == []
+        assert manager.event_names() == []
+
+    def test_imports_legacy_json(self, tmp_path, db_path):
+        """Test that the JSON snapshot is imported on first start."""
+        legacy_path = str(tmp_path / "flight_hours" / "current.json")
+        os.makedirs(os.path.dirname(legacy_path))
+        with open(legacy_path, "w") as file:
+            json.dump(
+                {
+                    "flight_hours": {MEMBER_A: 45},
+                    "event_history": {"Event A": [MEMBER_A]},
+                    "member_history": {MEMBER_A: ["Event A"]},
+                },
+                file,
+            )
+
+        manager = FlightHours(SQLiteStorage(db_path, legacy_path))
+        manager.load()
+        manager.storage.close()
+
+        restored = self.reload(db_path)
+        assert restored.flight_hours == {MEMBER_A: 45}
+        assert restored.event_members("Event A") == [MEMBER_A]
+        restored.storage.close()
+
+
+class TestPrioritizedLoad:
+    """Test cases for loading the flight state in priority order."""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        """Path of a database with an event in progress."""
+        db_path = str(tmp_path / "flight_hours" / "flight_hours.db")
+        manager = FlightHours(SQLiteStorage(db_path))
+        manager.load()
+        manager.start_event("Event A")
+        manager.adjust_flight_time(MEMBER_A, 90)
+        manager.add_attendance("Event A", MEMBER_A)
+        manager._record("start", m=MEMBER_B, t=1700000000.0)
+        manager.save()
+        manager.storage.close()
+        return db_path
+
+    @pytest.mark.asyncio
+    async def test_core_state_is_restored_first(self, db_path):
+        """Test that logging can resume before the history is loaded."""
+        manager = FlightHours(SQLiteStorage(db_path))
+        manager.load_prioritized()
+
+        assert manager.active_event == "Event A"
+        assert manager.start_time[MEMBER_B].timestamp() == 1700000000.0
+        assert not manager.history_loaded.is_set()
+
+        await manager.wait_until_loaded()
+        assert manager.flight_hours == {MEMBER_A: 90}
+        assert manager.event_members("Event A") == [MEMBER_A]
+        manager.storage.close()
+
+    @pytest.mark.asyncio
+    async def test_records_during_load_are_kept_once(self, db_path):
+        """Test that changes made while the history loads are applied exactly once."""
+        manager = FlightHours(SQLiteStorage(db_path))
+        manager.load_prioritized()
+        manager.adjust_flight_time(MEMBER_A, 30)
+        manager.add_attendance("Event A", MEMBER_B)
+        manager.save()
+
+        await manager.wait_until_loaded()
+        assert manager.flight_hours == {MEMBER_A: 120}
+        assert manager.event_history["Event A"] == {MEMBER_A, MEMBER_B}
+        manager.storage.close()
+
+    @pytest.mark.asyncio
+    async def test_reconnect_keeps_pending_records(self, db_path):
+        """Test that on_ready firing again neither drops nor reuses records not yet written."""
+        manager = FlightHours(SQLiteStorage(db_path))
+        manager.load_prioritized()
+        await manager.wait_until_loaded()
+        manager.adjust_flight_time(MEMBER_A, 30)
+        seq = manager.seq
+
+        # A gateway re-identify runs on_ready again before the write
+        assert manager.load_prioritized() is None
+        assert manager.flight_hours == {MEMBER_A: 120}
+        manager.adjust_flight_time(MEMBER_A, 15)
+        assert manager.seq == seq + 1
+        manager.storage.close()
+
+        restored = FlightHours(SQLiteStorage(db_path))
+        restored.load()
+        assert restored.flight_hours == {MEMBER_A: 135}
+        restored.storage.close()
+
+    def test_core_load_sees_pending_records(self, db_path):
+        """Test that a core load commits the records accepted before it."""
+        storage = SQLiteStorage(db_path)
+        manager = FlightHours(storage)
+        manager.load()
+        manager._record("start", m=MEMBER_A, t=1700000100.0)
+        seq = manager.seq
+
+        assert storage.load_core(manager) is not None
+        assert manager.seq == seq
+        assert manager.start_time[MEMBER_A].timestamp() == 1700000100.0
+        storage.close()
+
+    @pytest.mark.asyncio
+    async def test_json_storage_loads_at_once(self, tmp_path):
+        """Test that backends without a separate core load are ready immediately."""
+        manager = FlightHours(JSONStorage(str(tmp_path / "current.snap")))
+        assert manager.load_prioritized() is None
+        assert manager.history_loaded.is_set()
+        manager.storage.close()
+
+
+class TestCreateStorage:
+    """Test cases for backend selection."""
+
+    def test_default_is_sqlite(self, tmp_path, monkeypatch):
+        """Test that SQLite is the default backend."""
+        monkeypatch.delenv("FLIGHT_STORAGE", raising=False)
+        storage = create_storage(str(tmp_path))
+        assert isinstance(storage, SQLiteStorage)
+        assert storage.legacy_path == str(tmp_path / "current.snap")
+
+    def test_json_backend(self, tmp_path, monkeypatch):
+        """Test selecting the JSON backend."""
+        monkeypatch.setenv("FLIGHT_STORAGE", "json")
+        assert isinstance(create_storage(str(tmp_path)), JSONStorage)
+
+    def test_unknown_backend(self, tmp_path, monkeypatch):
+        """Test that an unknown backend is rejected."""
+        monkeypatch.setenv("FLIGHT_STORAGE", "redis")
+        with pytest.raises(ValueError):
+            create_storage(str(tmp_path))
@@ -0,0 +1,161 @@
+"""
+Tests for voice_queue.py module.
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from config import FlightHours
+from storage import JSONStorage
+from voice_queue import VoiceEvent, VoiceEventQueue
+
+MEMBER_A = 123456789012345678
+EVENT_VC = 111
+OTHER_VC = 222
+
+
+class TestVoiceEventQueue:
+    """Test cases for VoiceEventQueue class."""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        """Create a flight hours manager with an active event."""
+        manager = FlightHours(JSONStorage(str(tmp_path / "current.snap")))
+        manager.load()
+        manager.start_event("Event A", SimpleNamespace(id=EVENT_VC))
+        yield manager
+        manager.storage.close()
+
+    @pytest.fixture
+    def messages(self):
+        """Log messages in the order they were sent."""
+        return []
+
+    @pytest.fixture
+    def queue(self, manager, messages):
+        """Create a queue that logs into the messages list."""
+
+        async def log(message, key=None):
+            messages.append(message)
+
+        return VoiceEventQueue(manager, log)
+
+    @pytest.mark.asyncio
+    async def test_join_and_leave_are_applied_in_order(self, queue, manager, messages):
+        """Test that a join and a leave queued together are applied in order."""
+        queue.submit(MEMBER_A, OTHER_VC, EVENT_VC)
+        queue.submit(MEMBER_A, EVENT_VC, None)
+        await queue.stop()
+
+        assert manager.start_time == {}
+        assert manager.flight_hours == {str(MEMBER_A): 0}
+        assert messages[0] == f"<@{MEMBER_A}> joined <#{EVENT_VC}>. Starting Logging..."
+        assert messages[1] == f"<@{MEMBER_A}> left <#{EVENT_VC}>. Ending Logging..."
+        assert queue.stats()["processed"] == 2
+
+    @pytest.mark.asyncio
+    async def test_sessions_are_timed_from_receipt(self, queue, manager):
+        """Test that session times come from when the change was received."""
+        join = VoiceEvent(MEMBER_A, None, EVENT_VC)
+        leave = VoiceEvent(MEMBER_A, EVENT_VC, None)
+        join.at, leave.at = 1700000000.0, 1700000000.0 + 45 * 60
+
+        await queue.apply(join)
+        assert manager.members.session_start(MEMBER_A) == 1700000000.0
+        await queue.apply(leave)
+        assert manager.minutes(MEMBER_A) == 45
+        assert manager.event_members("Event A") == [str(MEMBER_A)]
+
+    @pytest.mark.asyncio
+    async def test_moving_between_events(self, queue, manager):
+        """Test that moving to another event's channel ends one session and starts another."""
+        manager.start_event("Event B", SimpleNamespace(id=OTHER_VC))
+        join = VoiceEvent(MEMBER_A, None, EVENT_VC)
+        move = VoiceEvent(MEMBER_A, EVENT_VC, OTHER_VC)
+        join.at, move.at = 1700000000.0, 1700000000.0 + 10 * 60
+
+        await queue.apply(join)
+        messages = await queue.apply(move)
+        assert len(messages) == 3
+        assert manager.event_members("Event A") == [str(MEMBER_A)]
+        assert manager.session_event(MEMBER_A) == "Event B"
+        assert manager.members.session_start(MEMBER_A) == move.at
+
+    @pytest.mark.asyncio
+    async def test_slow_log_channel_does_not_delay_mutations(self, manager):
+        """Test that mutations are applied while log messages are still waiting."""
+        release = asyncio.Event()
+        sent = []
+
+        async def log(message, key=None):
+            await release.wait()
+            sent.append(message)
+
+        queue = VoiceEventQueue(manager, log)
+        queue.submit(MEMBER_A, None, EVENT_VC)
+        await asyncio.wait_for(queue._events.join(), 1)
+
+        assert manager.members.session_start(MEMBER_A) is not None
+        assert sent == []
+        release.set()
+        await queue.stop()
+        assert len(sent) == 1
+
+    @pytest.mark.asyncio
+    async def test_changes_outside_the_event_are_ignored(self, queue, manager, messages):
+        """Test that changes are judged against the channels when they are applied."""
+        queue.submit(MEMBER_A, None, EVENT_VC)
+        manager.end_event()
+        await queue.stop()
+
+        assert manager.start_time == {}
+        assert messages == []
+
+    @pytest.mark.asyncio
+    async def test_overflow_is_counted(self, manager, messages):
+        """Test that a full queue drops new events and counts them."""
+
+        async def log(message, key=None):
+            messages.append(message)
+
+        queue = VoiceEventQueue(manager, log, maxsize=1)
+        assert queue.submit(MEMBER_A, None, EVENT_VC)
+        assert not queue.submit(MEMBER_A, EVENT_VC, None)
+        await queue.stop()
+
+        stats = queue.stats()
+        assert stats["dropped"] == 1
+        assert stats["max_depth"] == 1
+        assert stats["depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_switches_share_a_dedupe_key(self, queue):
+        """Test that one member's switches within an event are logged under one key."""
+        await queue.apply(VoiceEvent(MEMBER_A, None, EVENT_VC))
+        queue.manager.start_event("Event A", SimpleNamespace(id=OTHER_VC))
+        first = await queue.apply(VoiceEvent(MEMBER_A, EVENT_VC, OTHER_VC))
+        second = await queue.apply(VoiceEvent(MEMBER_A, OTHER_VC, EVENT_VC))
+        assert first[0][1] == second[0][1] == f"switch:{MEMBER_A}"
+
+    @pytest.mark.asyncio
+    async def test_large_events_are_summarized(self, manager, messages):
+        """Test that changes above the summary threshold are counted per event, not logged per member."""
+
+        async def log(message, key=None):
+            messages.append(message)
+
+        queue = VoiceEventQueue(manager, log, summary_threshold=2)
+        for member_id in range(1, 6):
+            queue.submit(member_id, None, EVENT_VC)
+        queue.submit(1, EVENT_VC, None)
+        await queue.stop()
+
+        # The first three joins are logged, the rest are counted
+        assert len(messages) == 4
+        assert messages[-1] == "Event A: 2 joined, 1 left in the last 60 seconds (4 members flying)"
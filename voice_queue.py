@@ -0,0 +1,230 @@
+# Import Necessary Libraries
+import asyncio
+import time as clock
+from datetime import datetime as time
+
+import pytz
+
+from logger import logger
+
+
+class VoiceEvent:
+    """A voice channel change as the gateway reported it, reduced to IDs"""
+
+    __slots__ = ("member_id", "before_id", "after_id", "at", "received")
+
+    def __init__(self, member_id, before_id, after_id, at=None):
+        self.member_id = member_id
+        self.before_id = before_id  # Channel ID before the change (None if not in a channel)
+        self.after_id = after_id  # Channel ID after the change (None if not in a channel)
+        # When the member actually moved (epoch seconds)
+        self.at = at if at is not None else time.now(pytz.utc).timestamp()
+        self.received = clock.perf_counter()  # For measuring the time spent queued
+
+
+class VoiceEventQueue:
+    """
+    Applies voice channel changes to the flight hours in the order they were
+    received. The gateway handler only enqueues a VoiceEvent; one consumer
+    applies the mutations (a single FIFO consumer keeps every member's joins
+    and leaves in order) and hands the resulting log lines to a second task,
+    so neither gateway dispatch nor session timing waits on the log channel.
+    While more than `summary_threshold` members are flying, joins and leaves
+    are counted per event and logged every `summary_seconds` instead.
+    """
+
+    def __init__(self, manager, log, maxsize=10000, summary_threshold=None, summary_seconds=60.0):
+        self.manager = manager  # FlightHours the changes are applied to
+        self.log = log  # Coroutine function that logs one message: log(message, key=None)
+        self.maxsize = maxsize  # Queued events before new ones are dropped
+        self.summary_threshold = summary_threshold  # Open sessions above which changes are counted, or None
+        self.summary_seconds = summary_seconds  # Seconds between summaries of the counted changes
+
+        self.processed = 0  # Events applied
+        self.dropped = 0  # Events rejected because the queue was full
+        self.max_depth = 0  # Deepest the queue has been
+        self.total_latency = 0.0  # Seconds between receiving and applying, summed
+        self.max_latency = 0.0  # Longest wait between receiving and applying (seconds)
+
+        self._events = None
+        self._messages = None
+        self._tasks = []
+        self._counts = {}  # Key: Event Name | Value: [Joined, Left] since the last summary
+
+    @property
+    def running(self):
+        return bool(self._tasks) and not any(task.done() for task in self._tasks)
+
+    @property
+    def depth(self):
+        return self._events.qsize() if self._events is not None else 0
+
+    def start(self):
+        """Start the consumer and log tasks on the running event loop"""
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        if self._events is None:
+            self._events = asyncio.Queue(self.maxsize)
+            self._messages = asyncio.Queue()
+        self._tasks = [
+            loop.create_task(self._consume()),
+            loop.create_task(self._send_logs()),
+            loop.create_task(self._summarize()),
+        ]
+
+    async def stop(self):
+        """Apply every queued event, send the pending logs and stop both tasks"""
+        if self._events is not None and self.running:
+            await self._events.join()
+            await self._messages.join()
+        await self.log_summary()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def drain(self):
+        """Wait until every event queued so far has been applied"""
+        if self._events is not None and self.running:
+            await self._events.join()
+
+    def submit(self, member_id, before_id, after_id):
+        """Queue a voice channel change and return whether it was accepted"""
+        self.start()
+        try:
+            self._events.put_nowait(
+                VoiceEvent(member_id, before_id, after_id, self.manager.now())
+            )
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.log(
+                "warn", f"Voice event queue is full, dropped a change for member {member_id}", "voice"
+            )
+            return False
+        self.max_depth = max(self.max_depth, self._events.qsize())
+        return True
+
+    def stats(self):
+        """Return the queue depth, processing latency and drop counts"""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "log_backlog": self._messages.qsize() if self._messages is not None else 0,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "avg_latency_ms": self.total_latency / self.processed * 1000 if self.processed else 0.0,
+            "max_latency_ms": self.max_latency * 1000,
+        }
+
+    async def log_summary(self):
+        """Log the joins and leaves counted since the last summary, one line per event"""
+        counts, self._counts = self._counts, {}
+        flying = len(self.manager.session_events)
+        for event_name, (joined, left) in counts.items():
+            try:
+                await self.log(
+                    f"{event_name}: {joined} joined, {left} left in the last "
+                    f"{self.summary_seconds:.0f} seconds ({flying} members flying)"
+                )
+            except Exception as e:
+                await logger.error(f"Failed to log the voice summary of {event_name}: {e}", "voice")
+
+    def summarizing(self):
+        """Return whether enough members are flying to count changes instead of logging each"""
+        return (
+            self.summary_threshold is not None
+            and len(self.manager.session_events) > self.summary_threshold
+        )
+
+    def _count(self, event_name, joined=0, left=0):
+        counts = self._counts.setdefault(event_name, [0, 0])
+        counts[0] += joined
+        counts[1] += left
+
+    async def _consume(self):
+        while True:
+            event = await self._events.get()
+            try:
+                for message in await self.apply(event):
+                    self._messages.put_nowait(message)
+            except Exception as e:
+                await logger.error(f"Failed to apply voice event for member {event.member_id}: {e}", "voice")
+            finally:
+                latency = clock.perf_counter() - event.received
+                self.processed += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                self._events.task_done()
+
+    async def _send_logs(self):
+        while True:
+            message, key = await self._messages.get()
+            try:
+                await self.log(message, key)
+            finally:
+                self._messages.task_done()
+
+    async def _summarize(self):
+        while True:
+            await asyncio.sleep(self.summary_seconds)
+            await self.log_summary()
+
+    async def apply(self, event):
+        """Apply one voice channel change and return the (message, dedupe key) pairs to log"""
+        manager = self.manager
+
+        # Changes are judged against the events and channels as they are now
+        if not manager.events:
+            return []
+        was_at = manager.channel_events.get(event.before_id)  # Event left (if any)
+        is_at = manager.channel_events.get(event.after_id)  # Event joined (if any)
+        mention = f"<@{event.member_id}>"
+        summarizing = self.summarizing()
+
+        # Case 1: Member switches between two VCs of the same event
+        if was_at is not None and was_at == is_at:
+            if summarizing:
+                return []
+            # Repeated switches by one member are logged once with a count
+            return [
+                (
+                    f"{mention} switched from <#{event.before_id}> to <#{event.after_id}>. Resuming Logging...",
+                    f"switch:{event.member_id}",
+                )
+            ]
+
+        messages = []
+
+        # Case 2: Members switches from an event VC to a VC outside that event (Leaving Event)
+        if was_at is not None:
+            elapsed_minutes = manager.log_end_time(event.member_id, at=event.at)
+            manager.save()
+            if summarizing:
+                self._count(was_at, left=1)
+            else:
+                await manager.wait_until_loaded()  # Totals need the month's history
+                messages += [
+                    (f"{mention} left <#{event.before_id}>. Ending Logging...", None),
+                    (
+                        f"{int(elapsed_minutes)} minutes of flight time were added to {mention}. "
+                        f"{mention} has a total flight time of {int(manager.minutes(event.member_id))} minutes.",
+                        None,
+                    ),
+                ]
+
+        # Case 3: Member switches from a VC outside an event to one of its VCs (Joining Event)
+        if is_at is not None and manager.log_start_time(
+            event.member_id, at=event.at, event_name=is_at
+        ):
+            manager.save()
+            if summarizing:
+                self._count(is_at, joined=1)
+            else:
+                messages.append((f"{mention} joined <#{event.after_id}>. Starting Logging...", None))
+
+        return messages